@@ -0,0 +1,241 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from combat import BASE_HP, DAMAGE_VARIANCE
+
+# 搜索型AI：在Unit.attack的伤害分布上做期望极大极小搜索（expectimax）。
+# AI方取最大值，玩家方取最小值，每次攻击的随机伤害是一个机会节点。
+# 搜索按迭代加深进行，在给定的毫秒预算内返回最深一层完整搜索的结果；
+# 根节点的每个候选攻击交给进程池中的一个进程，因此搜索会随CPU核数扩展，游戏循环也不会被阻塞。
+#
+# 等级和经验值不影响攻击力和防御力，所以局面只由双方单位的生命值决定，
+# 置换表以(生命值, 行动方, 剩余深度)为键；生命值<=0统一记为0，使不同的击杀伤害合并为同一局面。
+
+PLAYER = 0
+AI = 1
+NODE_CHECK_INTERVAL = 512  # 每搜索多少个节点检查一次时间
+MAX_ROOT_MOVES = 256  # 候选攻击超过这个数量（大规模战斗）时不搜索，改为随机行动
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchContext:
+    def __init__(self, player_stats, ai_stats, deadline):
+        """
+        一次搜索的静态信息。
+        :param player_stats: 玩家单位的(攻击力, 防御力)元组
+        :param ai_stats: AI单位的(攻击力, 防御力)元组
+        :param deadline: 截止时间（time.time()）
+        """
+        self.player_count = len(player_stats)
+        self.stats = (player_stats, ai_stats)
+        self.deadline = deadline
+        self.table = {}  # 置换表
+        self.nodes = 0
+        # 每对(攻击者, 目标)的伤害分布：[(伤害, 概率)]，被截断为0的伤害已合并
+        self.damage = ({}, {})
+        low, high = DAMAGE_VARIANCE
+        for side in (PLAYER, AI):
+            for a, (atk, _) in enumerate(self.stats[side]):
+                for t, (_, defense) in enumerate(self.stats[1 - side]):
+                    counts = {}
+                    for variance in range(low, high + 1):
+                        damage = max(0, atk - defense + variance)
+                        counts[damage] = counts.get(damage, 0) + 1
+                    total = high - low + 1
+                    self.damage[side][a, t] = [(damage, count / total) for damage, count in counts.items()]
+
+    def team_slice(self, side):
+        return slice(0, self.player_count) if side == PLAYER else slice(self.player_count, None)
+
+    def moves(self, hp, side):
+        """
+        返回行动方所有可能的(攻击者, 目标)组合。
+        """
+        attackers = [i for i, value in enumerate(hp[self.team_slice(side)]) if value > 0]
+        targets = [i for i, value in enumerate(hp[self.team_slice(1 - side)]) if value > 0]
+        return [(a, t) for a in attackers for t in targets]
+
+
+def evaluate(ctx, hp):
+    """
+    局面评估：AI剩余生命值占比减去玩家剩余生命值占比，一方全灭时为±1。
+    """
+    player_hp = sum(hp[:ctx.player_count])
+    ai_hp = sum(hp[ctx.player_count:])
+    if player_hp == 0:
+        return 1.0
+    if ai_hp == 0:
+        return -1.0
+    return 0.5 * (ai_hp / (BASE_HP * (len(hp) - ctx.player_count)) - player_hp / (BASE_HP * ctx.player_count))
+
+
+def search(ctx, hp, side, depth):
+    """
+    期望极大极小搜索。
+    :param hp: 双方单位的生命值（先玩家后AI）
+    :param side: 行动方
+    :param depth: 剩余深度（攻击次数）
+    """
+    player_hp = sum(hp[:ctx.player_count])
+    ai_hp = sum(hp[ctx.player_count:])
+    if depth == 0 or player_hp == 0 or ai_hp == 0:
+        return evaluate(ctx, hp)
+
+    key = (hp, side, depth)
+    value = ctx.table.get(key)
+    if value is not None:
+        return value
+
+    ctx.nodes += 1
+    if ctx.nodes % NODE_CHECK_INTERVAL == 0 and time.time() > ctx.deadline:
+        raise SearchTimeout()
+
+    moves = ctx.moves(hp, side)
+    values = (chance(ctx, hp, side, move, depth) for move in moves)
+    value = max(values) if side == AI else min(values)
+    ctx.table[key] = value
+    return value
+
+
+def chance(ctx, hp, side, move, depth):
+    """
+    机会节点：对一次攻击的所有伤害结果按概率求期望。
+    """
+    attacker, target = move
+    index = target + (ctx.player_count if side == PLAYER else 0)
+    outcomes = {}
+    for damage, probability in ctx.damage[side][attacker, target]:
+        new_hp = max(0, hp[index] - damage)
+        outcomes[new_hp] = outcomes.get(new_hp, 0) + probability
+    total = 0.0
+    for new_hp, probability in outcomes.items():
+        child = hp[:index] + (new_hp,) + hp[index + 1:]
+        total += probability * search(ctx, child, 1 - side, depth - 1)
+    return total
+
+
+def evaluate_moves(player_stats, ai_stats, hp, moves, deadline, max_depth):
+    """
+    对AI的一组候选攻击做迭代加深搜索，直到超时或达到最大深度。可在工作进程中运行。
+    :return: 每个候选攻击的{深度: 期望值}，只包含完整搜索过的深度
+    """
+    ctx = SearchContext(player_stats, ai_stats, deadline)
+    results = [{} for _ in moves]
+    try:
+        for depth in range(1, max_depth + 1):
+            for values, move in zip(results, moves):
+                values[depth] = chance(ctx, hp, AI, move, depth)
+            if time.time() > deadline:
+                break
+    except SearchTimeout:
+        pass
+    return results
+
+
+def canonical_hp(player_team, ai_team):
+    return tuple(max(0, unit.hp) for unit in player_team) + tuple(max(0, unit.hp) for unit in ai_team)
+
+
+def pick_best(moves, results):
+    """
+    在所有候选攻击都完成的最深一层上比较期望值，选出最好的攻击。
+    """
+    common_depth = min((max(values) if values else 0) for values in results)  # 只比较所有候选攻击都搜索完的深度
+    if common_depth == 0:
+        return moves[0]
+    return max(zip(moves, results), key=lambda item: item[1][common_depth])[0]
+
+
+def choose_move(player_team, ai_team, budget_ms, max_depth=8):
+    """
+    在当前进程中同步搜索AI的攻击，适合无界面的工具使用。
+    :param player_team: 玩家单位列表（包含阵亡单位，下标与列表一致）
+    :param ai_team: AI单位列表
+    :param budget_ms: 搜索时间预算（毫秒）
+    :return: (攻击者下标, 目标下标)，均为在ai_team和player_team中的下标
+    """
+    player_stats = tuple((unit.atk, unit.defense) for unit in player_team)
+    ai_stats = tuple((unit.atk, unit.defense) for unit in ai_team)
+    hp = canonical_hp(player_team, ai_team)
+    deadline = time.time() + budget_ms / 1000
+    moves = SearchContext(player_stats, ai_stats, deadline).moves(hp, AI)
+    return pick_best(moves, evaluate_moves(player_stats, ai_stats, hp, moves, deadline, max_depth))
+
+
+class SearchOpponent:
+    def __init__(self, budget_ms, workers=None, max_depth=8):
+        """
+        在进程池中运行搜索的AI对手。start_turn()提交搜索后立即返回，主循环每帧调用poll()取结果。
+        :param budget_ms: 每回合的搜索时间预算（毫秒）
+        :param workers: 工作进程数，默认为CPU核数
+        :param max_depth: 最大搜索深度
+        """
+        self.budget_ms = budget_ms
+        self.max_depth = max_depth
+        self.workers = workers or os.cpu_count()
+        # 使用spawn启动工作进程：游戏进程中有日志、存档等后台线程，fork可能复制到被占用的锁
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.chunks = None
+        self.futures = None
+
+    def warm_up(self):
+        """
+        预先启动所有工作进程，避免第一次搜索时才创建进程。
+        """
+        for _ in range(self.workers):
+            self.executor.submit(os.getpid)
+
+    def start_turn(self, player_team, ai_team):
+        """
+        开始为当前局面搜索AI的攻击。
+        """
+        player_stats = tuple((unit.atk, unit.defense) for unit in player_team)
+        ai_stats = tuple((unit.atk, unit.defense) for unit in ai_team)
+        hp = canonical_hp(player_team, ai_team)
+        deadline = time.time() + self.budget_ms / 1000
+        moves = SearchContext(player_stats, ai_stats, deadline).moves(hp, AI)
+        # 候选攻击轮流分给各个工作进程，每个进程同时加深自己分到的攻击
+        self.chunks = [moves[i::self.workers] for i in range(min(self.workers, len(moves)))]
+        self.futures = [self.executor.submit(evaluate_moves, player_stats, ai_stats, hp, chunk, deadline,
+                                             self.max_depth)
+                        for chunk in self.chunks]
+
+    def busy(self):
+        return self.futures is not None
+
+    def poll(self):
+        """
+        搜索完成时返回(攻击者下标, 目标下标)，否则返回None。
+        """
+        if self.futures is None or not all(future.done() for future in self.futures):
+            return None
+        moves = [move for chunk in self.chunks for move in chunk]
+        results = [values for future in self.futures for values in future.result()]
+        self.futures = None
+        move = pick_best(moves, results)
+        logging.debug("AI search depth %s, move %s.", min(map(len, results)), move)
+        return move
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_opponent = None
+
+
+def get_opponent(budget_ms, workers=None, max_depth=8):
+    """
+    返回共享的搜索AI（进程池只创建一次，在多场对局间复用）。
+    """
+    global _opponent
+    if _opponent is None:
+        _opponent = SearchOpponent(budget_ms, workers, max_depth)
+    else:
+        _opponent.budget_ms = budget_ms
+        _opponent.max_depth = max_depth
+    return _opponent
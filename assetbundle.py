@@ -0,0 +1,177 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+
+import pygame
+
+# 资源包：把所有图片和音效预先解码后打包成一个文件，运行时用mmap映射整个文件，不再读取和解码PNG/WAV。
+#   文件头    MAGIC、版本号和索引长度（HEADER）
+#   索引      JSON：相对于资源包所在目录的路径 -> 数据的位置和格式，以及源文件的大小和修改时间
+#   数据      每个资源一块，按DATA_ALIGN字节对齐，索引中的偏移量相对于数据区的开头
+# 图片保存为32位BGRA的原始像素，即小端机器上最常见的显示格式（XRGB8888/ARGB8888）在内存中的排列，
+# 运行时用pygame.image.frombuffer直接在映射的内存上创建表面，不复制像素；显示器是其他格式时才转换一次。
+# 映射使用ACCESS_COPY（写时复制）：页面在第一次绘制时才从磁盘（或页缓存）读入，未被使用的图片不占内存。
+# 音效保存为混音器格式的PCM数据，混音器的参数与打包时相同时直接交给pygame.mixer.Sound(buffer=...)，省去解码和重采样。
+# 背景音乐是流式播放的，不打包。
+# 源文件比资源包新（大小或修改时间不同）时忽略资源包中的这一项并从文件加载，因此修改图片后忘记重新打包不会显示旧图。
+
+MAGIC = b'GBDL'
+VERSION = 1
+HEADER = struct.Struct('<4sII')  # MAGIC, 版本号, 索引长度
+DATA_ALIGN = 64
+IMAGE_FORMAT = 'BGRA'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+SOUND_EXTENSIONS = ('.wav', '.ogg')
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class AssetBundle:
+    def __init__(self, path):
+        """
+        打开并映射资源包。文件格式不对时抛出ValueError。
+        :param path: 资源包文件路径
+        """
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        with open(path, 'rb') as file:  # 映射建立后文件可以关闭
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, index_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not an asset bundle (version {VERSION})")
+        self.index = json.loads(self.map[HEADER.size:HEADER.size + index_size])
+        self.data_start = HEADER.size + index_size
+        self.data_start += -self.data_start % DATA_ALIGN
+        self.view = memoryview(self.map)
+        self.stale = set()  # 源文件已修改的资源
+
+    def key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.base_dir).replace(os.sep, '/')
+
+    def entry(self, path, kind):
+        """
+        资源在索引中的记录。不在资源包中、类型不符或源文件已修改时返回None。
+        """
+        key = self.key(path)
+        entry = self.index.get(key)
+        if entry is None or entry["kind"] != kind or key in self.stale:
+            return None
+        if os.path.exists(path) and source_stamp(path) != entry["source"]:
+            logging.warning("%s changed since the asset bundle was built; loading it from the file.", path)
+            self.stale.add(key)
+            return None
+        return entry
+
+    def image(self, path):
+        """
+        在映射的内存上创建图片的表面（不复制像素）。返回的表面与资源包共享内存，不应修改。
+        :param path: 图片文件路径
+        :return: 表面，资源包中没有这张图片时返回None
+        """
+        entry = self.entry(path, 'image')
+        if entry is None:
+            return None
+        width, height = entry["size"]
+        offset = self.data_start + entry["offset"]
+        surface = pygame.image.frombuffer(self.view[offset:offset + width * height * 4], (width, height), IMAGE_FORMAT)
+        if not entry["alpha"]:
+            surface.set_alpha(None)  # 不透明的图片按整块复制绘制，不做逐像素混合
+        return surface
+
+    def sound(self, path):
+        """
+        从打包的PCM数据创建音效。混音器的参数与打包时不同时返回None。
+        :param path: 音效文件路径
+        """
+        entry = self.entry(path, 'sound')
+        if entry is None or list(pygame.mixer.get_init() or ()) != entry["mixer"]:
+            return None
+        offset = self.data_start + entry["offset"]
+        return pygame.mixer.Sound(buffer=self.view[offset:offset + entry["length"]])
+
+
+def collect_assets(base_dir, directories):
+    """
+    列出要打包的资源文件。
+    :return: [(相对路径, 类型)]
+    """
+    assets = []
+    for directory in directories:
+        for name in sorted(os.listdir(os.path.join(base_dir, directory))):
+            extension = os.path.splitext(name)[1].lower()
+            if extension in IMAGE_EXTENSIONS:
+                assets.append((f"{directory}/{name}", 'image'))
+            elif extension in SOUND_EXTENSIONS:
+                assets.append((f"{directory}/{name}", 'sound'))
+    return assets
+
+
+def build_bundle(path, base_dir, directories=('images', 'sounds')):
+    """
+    解码资源目录中的所有图片和音效，写入资源包。先写入临时文件再替换，运行中的游戏映射的旧文件不受影响。
+    音效按当前混音器的参数解码，混音器未初始化时只打包图片。
+    :param path: 资源包文件路径
+    :param base_dir: 资源目录所在的目录，索引中的路径相对于它
+    :param directories: 要打包的资源目录
+    :return: 索引
+    """
+    index = {}
+    blocks = []
+    offset = 0
+    for key, kind in collect_assets(base_dir, directories):
+        source = os.path.join(base_dir, key)
+        if kind == 'image':
+            surface = pygame.image.load(source)
+            data = pygame.image.tobytes(surface, IMAGE_FORMAT)  # 不透明的图片补上不透明的alpha字节
+            entry = {"size": list(surface.get_size()), "alpha": bool(surface.get_flags() & pygame.SRCALPHA)}
+        elif pygame.mixer.get_init():
+            data = pygame.mixer.Sound(source).get_raw()
+            entry = {"length": len(data), "mixer": list(pygame.mixer.get_init())}
+        else:
+            continue
+        entry.update(kind=kind, offset=offset, source=source_stamp(source))
+        index[key] = entry
+        padding = -len(data) % DATA_ALIGN
+        blocks.append(data + bytes(padding))
+        offset += len(data) + padding
+
+    encoded = json.dumps(index).encode()
+    padding = -(HEADER.size + len(encoded)) % DATA_ALIGN
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        file.write(encoded)
+        file.write(bytes(padding))
+        for block in blocks:
+            file.write(block)
+    os.replace(temporary, path)
+    return index
+
+
+def main():
+    from settings import ASSET_BUNDLE, BASE_DIR
+
+    parser = argparse.ArgumentParser(description="Pack the game's images and sound effects into one pre-decoded bundle.")
+    parser.add_argument('--output', default=ASSET_BUNDLE, help="bundle to write (default: settings.ASSET_BUNDLE)")
+    parser.add_argument('--no-sounds', action='store_true', help="pack only the images")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')  # 只用混音器解码，不需要声卡
+    if not args.no_sounds:
+        try:
+            pygame.mixer.init()  # 与settings.init_audio()相同的参数
+        except pygame.error as e:
+            logging.error(f"Failed to initialize the mixer, packing only the images: {e}")
+    index = build_bundle(args.output, BASE_DIR)
+    print(f"{len(index)} assets, {os.path.getsize(args.output) / 1e6:.1f} MB -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+
+import pygame
+import logging
+
+from assetbundle import AssetBundle
+from settings import ASSET_BUNDLE
+
+# 资源管理：每个图片只加载一次，并转换为显示器的像素格式，之后所有使用者共享同一个表面
+# 有资源包（见assetbundle.py）时优先从资源包映射预解码的像素，表面直接使用映射的内存；
+# 资源包中没有的图片或没有资源包时，从文件加载并解码
+
+
+class AssetManager:
+    def __init__(self, bundle_path=ASSET_BUNDLE):
+        """
+        初始化资源管理器（资源包在第一次加载资源时才打开）。
+        :param bundle_path: 资源包文件路径，None表示不使用资源包
+        """
+        self.images = {}  # 文件路径 -> 已转换的表面
+        self.sprites = {}  # 文件路径 -> 启用了RLE加速的表面（见load_sprite）
+        self.hits = 0
+        self.misses = 0
+        self.bundled = 0  # 从资源包映射的图片数量
+        self.bundle_path = bundle_path
+        self.bundle = None  # None表示尚未打开，False表示没有可用的资源包
+
+    def get_bundle(self):
+        """
+        返回资源包，没有可用的资源包时返回None。
+        """
+        if self.bundle is None:
+            self.bundle = False
+            if self.bundle_path and os.path.exists(self.bundle_path):
+                try:
+                    self.bundle = AssetBundle(self.bundle_path)
+                    logging.info("Mapped asset bundle %s.", self.bundle_path)
+                except (OSError, ValueError) as e:
+                    logging.error(f"Failed to open asset bundle {self.bundle_path}: {e}")
+        return self.bundle or None
+
+    def load_bundled_image(self, path):
+        """
+        从资源包映射图片。像素格式与显示器相同时直接使用映射的内存，否则转换一次。资源包中没有时返回None。
+        """
+        bundle = self.get_bundle()
+        surface = bundle.image(path) if bundle is not None else None
+        if surface is None:
+            return None
+        display = pygame.display.get_surface()
+        if display is not None and surface.get_masks()[:3] != display.get_masks()[:3]:
+            surface = surface.convert_alpha() if surface.get_flags() & pygame.SRCALPHA else surface.convert()
+        self.bundled += 1
+        return surface
+
+    def load_image(self, path):
+        """
+        加载图片并缓存。带透明通道的图片使用convert_alpha()，其余使用convert()。
+        返回的表面是共享的，使用者不应直接修改它。
+        :param path: 图片文件路径
+        """
+        surface = self.images.get(path)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.load_bundled_image(path)
+        if surface is None:
+            surface = pygame.image.load(path)
+            if pygame.display.get_surface() is not None:  # 只有在显示器初始化后才能转换像素格式
+                if surface.get_flags() & pygame.SRCALPHA:
+                    surface = surface.convert_alpha()
+                else:
+                    surface = surface.convert()
+        self.images[path] = surface
+        logging.debug("Loaded image %s.", path)
+        return surface
+
+    def load_sprite(self, path):
+        """
+        加载大量重复绘制的精灵图片（如单位图像）：在load_image的结果上复制一份并启用RLE加速。
+        精灵大部分像素是透明的，RLE编码后绘制时跳过透明的部分，逐像素混合的像素少得多，绘制结果不变。
+        显示器尚未初始化时不能转换，返回load_image的结果且不缓存。
+        :param path: 图片文件路径
+        """
+        sprite = self.sprites.get(path)
+        if sprite is not None:
+            return sprite
+        surface = self.load_image(path)
+        if pygame.display.get_surface() is None or not surface.get_flags() & pygame.SRCALPHA:
+            return surface
+        sprite = self.sprites[path] = surface.convert_alpha()  # 副本，共享的表面（可能在资源包的映射中）保持不变
+        sprite.set_alpha(255, pygame.RLEACCEL)
+        return sprite
+
+    def load_sound(self, path):
+        """
+        加载音效（混音器必须已经初始化）。资源包中有混音器格式的PCM数据时直接使用，否则解码文件。
+        音效由调用者保存，这里不缓存。
+        :param path: 音效文件路径
+        """
+        bundle = self.get_bundle()
+        sound = bundle.sound(path) if bundle is not None else None
+        if sound is None:
+            sound = pygame.mixer.Sound(path)  # 解码整个文件到内存
+        return sound
+
+    def stats(self):
+        """
+        返回缓存统计信息：图片数量、命中次数、未命中次数、从资源包映射的图片数量和占用的像素内存（字节）。
+        从资源包映射的像素在文件映射中，只有被访问过的页面占用物理内存。
+        """
+        return {
+            "images": len(self.images),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bundled": self.bundled,
+            "bytes": sum(surface.get_pitch() * surface.get_height() for surface in self.images.values()),
+        }
+
+    def clear(self):
+        """
+        清空缓存，例如显示模式改变之后需要重新转换像素格式时。
+        """
+        self.images.clear()
+        self.sprites.clear()
+
+
+assets = AssetManager()
+
+
+def load_image(path):
+    """
+    使用全局资源管理器加载图片。
+    :param path: 图片文件路径
+    """
+    return assets.load_image(path)
+
+
+def load_sprite(path):
+    """
+    使用全局资源管理器加载精灵图片。
+    :param path: 图片文件路径
+    """
+    return assets.load_sprite(path)
@@ -1,43 +1,122 @@
 import pygame
-import time
-from settings import screen, BLACK, WHITE, font
+from settings import get_screen, BLACK, WHITE, FPS, ATTACK_ANIMATION_DURATION
+from text_cache import render_text
+from profiler import profiler
 
 def display_battle_info(text):
     """
     在屏幕底部显示战斗信息，如攻击的描述等。
     :param text: 需要显示的文本信息
     """
-    battle_info = font.render(text, True, WHITE)
+    screen = get_screen()
+    battle_info = render_text(text, WHITE)
     screen.blit(battle_info, (200, 550))
     pygame.display.flip()  # 更新显示内容
 
-def attack_animation(attacker, target, player_team, ai_team, background_img):
+class AttackAnimation:
+    def __init__(self, attacker, target, duration=ATTACK_ANIMATION_DURATION):
+        """
+        攻击动画：攻击者在duration毫秒内从原位移动到目标单位处，结束后回到原位。
+        位置按已经过的时间计算，不受帧率影响，也不会因整数除法产生误差。
+        :param attacker: 发起攻击的单位
+        :param target: 被攻击的目标单位
+        :param duration: 动画时长（毫秒）
+        """
+        self.attacker = attacker
+        self.target = target
+        self.duration = duration
+        self.origin = attacker.position  # 攻击者的初始位置
+        self.destination = target.position
+        self.elapsed = 0
+        self.finished = False
+
+    def update(self, dt):
+        """
+        推进动画并更新攻击者的位置。
+        :param dt: 经过的时间（毫秒）
+        :return: 动画是否已经结束
+        """
+        self.elapsed = min(self.elapsed + dt, self.duration)
+        if self.elapsed >= self.duration:
+            self.attacker.position = self.origin  # 动画结束后恢复攻击者的初始位置
+            self.finished = True
+        else:
+            progress = self.elapsed / self.duration
+            self.attacker.position = (
+                round(self.origin[0] + (self.destination[0] - self.origin[0]) * progress),
+                round(self.origin[1] + (self.destination[1] - self.origin[1]) * progress)
+            )
+        return self.finished
+
+
+class AnimationScheduler:
+    def __init__(self, speed=1):
+        """
+        动画调度器：在主循环中按帧间隔推进所有进行中的动画，多个动画可以同时进行。
+        :param speed: 动画速度倍数，大于1时快进
+        """
+        self.animations = []
+        self.speed = speed
+
+    def start(self, animation):
+        """
+        开始一个动画。
+        :param animation: 带有update(dt)方法的动画对象
+        """
+        self.animations.append(animation)
+        return animation
+
+    def update(self, dt):
+        """
+        推进所有动画。
+        :param dt: 距离上一帧经过的时间（毫秒），通常为clock.tick()的返回值
+        :return: 本帧结束的动画列表，按开始顺序排列
+        """
+        finished = [animation for animation in self.animations if animation.update(dt * self.speed)]
+        if finished:
+            self.animations = [animation for animation in self.animations if not animation.finished]
+        return finished
+
+    def busy(self):
+        """
+        是否还有进行中的动画。
+        """
+        return bool(self.animations)
+
+
+def attack_animation(attacker, target, player_team, ai_team, background_img, renderer=None):
     """
-    执行攻击动画，将攻击者移动到目标单位附近并返回原位。
+    阻塞式地播放一次攻击动画，直到动画结束才返回。主循环应使用AnimationScheduler，
+    本函数保留给需要同步播放动画的场合；播放期间仍会处理系统事件并按FPS限制帧率。
     :param attacker: 发起攻击的单位
     :param target: 被攻击的目标单位
     :param player_team: 玩家单位队伍列表
     :param ai_team: AI单位队伍列表
     :param background_img: 背景图片
+    :param renderer: 脏矩形渲染器，为None时每一帧完整重绘屏幕
     """
-    original_pos = attacker.position  # 保存攻击者的初始位置
-
-    # 攻击动画，分10步进行
-    for i in range(10):
-        # 计算每一步攻击者的新位置
-        attacker.position = (
-            attacker.position[0] + (target.position[0] - original_pos[0]) // 10,
-            attacker.position[1] + (target.position[1] - original_pos[1]) // 10
-        )
+    screen = get_screen()
+    clock = pygame.time.Clock()
+    animation = AttackAnimation(attacker, target)
+    clock.tick()
 
-        # 每一步重新绘制背景和所有单位
-        screen.blit(background_img, (0, 0))  # 绘制背景图片
+    while not animation.update(clock.tick(FPS)):
+        profiler.begin_frame()
+        pygame.event.pump()  # 让系统继续处理窗口事件
 
-        # 绘制玩家和AI单位
-        for unit in player_team + ai_team:
-            unit.draw(screen)
+        with profiler.scope('attack_animation'):
+            if renderer is not None:
+                # 脏矩形模式下只重绘攻击者移动经过的区域
+                renderer.set_unit(attacker)
+                renderer.present()
+            else:
+                # 每一帧重新绘制背景和所有单位
+                screen.blit(background_img, (0, 0))  # 绘制背景图片
 
-        pygame.display.flip()  # 更新显示
-        time.sleep(0.05)  # 控制攻击动画的速度，使动画更平滑
+                # 绘制玩家和AI单位
+                for team in (player_team, ai_team):
+                    for unit in team:
+                        unit.draw(screen)
 
-    attacker.position = original_pos  # 动画结束后恢复攻击者的初始位置
\ No newline at end of file
+                pygame.display.flip()  # 更新显示
+        profiler.end_frame()
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault('GAME_HEADLESS', '1')  # 使用SDL的dummy显示和音频驱动，必须在导入settings之前设置
+# 基准测试（包括启动测试的子进程）使用临时的存档数据库，game_loop的自动存档不会写入游戏的saves.db、覆盖未完成的对局
+_save_directory = tempfile.TemporaryDirectory(prefix='benchmark-saves-')  # 进程退出时删除
+os.environ['GAME_SAVE_DB'] = os.path.join(_save_directory.name, 'saves.db')
+
+import pygame
+
+import main
+import battle
+from unit import Unit
+from team import Team
+from savestore import SaveStore, AutosaveJournal
+
+# 性能基准测试：在无界面模式下用脚本化的输入运行游戏代码，测量启动时间、game_loop每帧耗时、
+# 攻击动画时长、Unit.attack吞吐量和存档/读档延迟。结果写入JSON文件，并与保存的基线比较，
+# 任何一项比基线慢超过阈值时以非0状态退出。所有指标都是"越小越好"的时间，名称的后缀表示单位（_ms或_us）。
+# 基线与运行的机器有关，更换机器后应先用--save-baseline重新生成。
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BASE_DIR, 'benchmark_results.json')
+BASELINE_FILE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.25  # 比基线慢25%以上视为性能退化
+DEFAULT_MIN_DELTA = 0.5  # 同时要求比基线慢这么多（指标单位），避免很小的数值因计时噪声被误报
+TEAM_SIZES = (3, 100, 1000)
+
+
+def make_team(size, unit_type, x, rng):
+    """
+    生成一支单位排成网格的队伍。
+    :param size: 单位数量
+    :param unit_type: 单位类型
+    :param x: 队伍所在区域的左边界
+    :param rng: random.Random
+    """
+    columns = max(1, min(size, 20))
+    return Team.from_units(Unit(f"{unit_type[0]}{i}", unit_type, (x + (i % columns) * 15, 70 + (i // columns) * 25), rng)
+                           for i in range(size))
+
+
+@contextmanager
+def temporary_save_store():
+    """
+    在临时目录中打开存档库并让main使用它，不读写游戏的存档数据库。
+    """
+    previous = main.save_store
+    with tempfile.TemporaryDirectory() as directory:
+        main.save_store = SaveStore(os.path.join(directory, 'saves.db'))
+        try:
+            yield main.save_store
+        finally:
+            main.save_store.close()
+            main.save_store = previous
+
+
+class ScriptedInput:
+    def __init__(self, script, frames):
+        """
+        替换pygame.event.get，按帧号返回预先安排的事件，并在最后一帧发送QUIT。
+        :param script: {帧号: 返回事件列表的函数}
+        :param frames: 运行的总帧数
+        """
+        self.script = script
+        self.frames = frames
+        self.frame = 0
+        self.times = []  # 每次取事件的时间，相邻两次之差就是一帧的耗时
+
+    def frame_times(self):
+        return [b - a for a, b in zip(self.times, self.times[1:])]
+
+    def __call__(self, *args, **kwargs):
+        self.times.append(time.perf_counter())
+        self.frame += 1
+        if self.frame >= self.frames:
+            return [pygame.event.Event(pygame.QUIT)]
+        events = self.script.get(self.frame)
+        return events() if events else []
+
+    def __enter__(self):
+        self.saved = pygame.event.get, pygame.quit
+        pygame.event.get = self
+        pygame.quit = lambda: None  # game_loop收到QUIT时会关闭pygame，基准测试之间需要保留显示器
+        return self
+
+    def __exit__(self, *exc_info):
+        pygame.event.get, pygame.quit = self.saved
+
+
+FIRST_FRAME_CODE = """import time; t = time.perf_counter()
+import pygame, settings, assets
+screen = settings.get_screen()
+for path in (settings.START_SCREEN_IMG1, settings.START_SCREEN_IMG2, settings.LOAD_IMAGE):
+    screen.blit(assets.load_image(path), (0, 0))
+pygame.display.flip(); print(time.perf_counter() - t)"""
+
+
+def bench_startup(repeat):
+    """
+    在新的解释器中导入settings和main，测量导入耗时；以及从启动到画出开始界面第一帧的耗时
+    （有资源包时从资源包映射图片）。
+    """
+    results = {}
+    codes = {f"import_{module}": f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+             for module in ('settings', 'main')}
+    codes["first_frame"] = FIRST_FRAME_CODE
+    for name, code in codes.items():
+        times = [float(subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True,
+                                      check=True).stdout.split()[-1]) for _ in range(repeat)]
+        results[f"startup.{name}_ms"] = statistics.median(times) * 1000
+    return results
+
+
+def bench_frames(size, frames):
+    """
+    运行game_loop并测量每帧耗时的中位数（不限帧率），期间玩家发起一次攻击，AI随机反击。
+    """
+    rng = random.Random(size)
+    player_team = make_team(size, 'Warrior', 20, rng)
+    ai_team = make_team(size, 'Tank', 420, rng)
+    script = {
+        2: lambda: [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=player_team[0].position, button=1)],
+        3: lambda: [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=ai_team[0].position, button=1)],
+    }
+    settings = main.FPS, main.AI_MODE, main.RECORD_REPLAYS, main.ODDS_HINT
+    # 不限帧率，不启动进程池，不写录像，不计算胜率提示（它有自己的每帧预算，开启时测到的是预算而不是游戏循环）
+    main.FPS, main.AI_MODE, main.RECORD_REPLAYS, main.ODDS_HINT = 0, 'random', False, False
+    try:
+        with temporary_save_store(), ScriptedInput(script, frames) as scripted_input:
+            try:
+                main.game_loop(player_team, ai_team, 100, rng=rng)
+            except SystemExit:
+                pass
+    finally:
+        main.FPS, main.AI_MODE, main.RECORD_REPLAYS, main.ODDS_HINT = settings
+    return {f"frame.units_{size}_ms": statistics.median(scripted_input.frame_times()) * 1000}
+
+
+def bench_attack_animation(repeat):
+    """
+    测量阻塞式attack_animation的实际时长（设计时长为ATTACK_ANIMATION_DURATION）。
+    """
+    rng = random.Random(0)
+    player_team = make_team(3, 'Warrior', 150, rng)
+    ai_team = make_team(3, 'Tank', 650, rng)
+    background_img = main.get_background_img()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        battle.attack_animation(player_team[0], ai_team[0], player_team, ai_team, background_img)
+        times.append(time.perf_counter() - start)
+    return {"animation.attack_ms": statistics.median(times) * 1000}
+
+
+def bench_attack(count):
+    """
+    测量Unit.attack（普通单位和列式队伍中的单位）每次调用的耗时，取5轮中最快的一轮。
+    """
+    results = {}
+    rng = random.Random(0)
+    for label, make in (("unit", lambda unit_type: Unit(unit_type, unit_type, (0, 0), rng)),
+                        ("team_view", lambda unit_type: make_team(1, unit_type, 0, rng)[0])):
+        attacker, target = make('Warrior'), make('Tank')
+        rounds = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(count):
+                target.hp = target.max_hp
+                attacker.attack(target, rng)
+            rounds.append((time.perf_counter() - start) / count)
+        results[f"attack.{label}_us"] = min(rounds) * 1e6
+    return results
+
+
+def bench_save_load(size, repeat):
+    """
+    测量save_game在游戏线程中的耗时（生成快照并交给写入线程）、写入线程提交事务的延迟、load_game
+    和每回合自动存档在游戏线程中的耗时。
+    """
+    rng = random.Random(size)
+    player_team = make_team(size, 'Warrior', 20, rng)
+    ai_team = make_team(size, 'Tank', 420, rng)
+    with temporary_save_store() as store:
+        for i in range(100):  # 存档库中已有很多存档槽，读档时间应与存档槽的数量无关
+            store.save_slot(f"other-{i}", main.build_save_data(player_team[:3], ai_team[:3], 100))
+        store.flush()
+        save_times, commit_times, load_times = [], [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            main.save_game(player_team, ai_team, 100, "bench")
+            save_times.append(time.perf_counter() - start)
+            store.flush()
+            commit_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            main.load_game("bench")
+            load_times.append(time.perf_counter() - start)
+
+        autosave = AutosaveJournal(store, "bench-autosave", player_team, ai_team, 100)
+        autosave_times = []
+        for turn in range(1, 20 * repeat + 1):
+            player_team[0].attack(ai_team[turn % len(ai_team)], rng)
+            start = time.perf_counter()
+            autosave.record(turn, 100)
+            autosave_times.append(time.perf_counter() - start)
+            store.flush()  # 不计时：每回合之间写入线程有足够的时间写完
+    return {f"save.units_{size}_ms": statistics.median(save_times) * 1000,
+            f"save_commit.units_{size}_ms": statistics.median(commit_times) * 1000,
+            f"load.units_{size}_ms": statistics.median(load_times) * 1000,
+            f"autosave.units_{size}_us": statistics.median(autosave_times) * 1e6}
+
+
+def run_benchmarks(quick=False):
+    """
+    运行全部基准测试。
+    :param quick: 为True时减少重复次数和帧数，用于快速检查
+    """
+    repeat = 3 if quick else 7
+    frames = 30 if quick else 120
+    results = {}
+    results.update(bench_startup(repeat))
+    for size in TEAM_SIZES:
+        results.update(bench_frames(size, frames))
+    results.update(bench_attack_animation(2 if quick else 3))
+    results.update(bench_attack(1000 if quick else 5000))
+    for size in TEAM_SIZES:
+        results.update(bench_save_load(size, repeat))
+    return results
+
+
+def compare(results, baseline, threshold, min_delta=DEFAULT_MIN_DELTA):
+    """
+    与基线比较，返回退化的指标列表[(名称, 基线值, 当前值)]。基线中没有的指标不参与比较。
+    :param threshold: 允许的相对变慢比例
+    :param min_delta: 允许的绝对变慢量，两个条件都超过才算退化
+    """
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is not None and value > base * (1 + threshold) and value - base > min_delta:
+            regressions.append((name, base, value))
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Headless performance benchmarks for the battle game.")
+    parser.add_argument('--output', default=RESULTS_FILE, help="where to write the results (JSON)")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline results to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown relative to the baseline (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA,
+                        help="also require this absolute slowdown, in the metric's unit")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--quick', action='store_true', help="fewer repetitions, for a fast sanity check")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.quick)
+    report = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "time": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "results": results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    for name, value in results.items():
+        print(f"{name:32s} {value:10.3f}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    for name, base, value in regressions:
+        print(f"REGRESSION {name}: {base:.3f} -> {value:.3f} ({value / base - 1:+.0%})")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main_cli()
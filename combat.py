@@ -0,0 +1,59 @@
+import random
+
+# 战斗规则（纯Python，不依赖pygame），供Unit和无界面的战斗模拟器共用
+
+# 各职业的属性范围（闭区间，与random.randint一致）
+UNIT_STATS = {
+    'Warrior': {'atk': (30, 40), 'defense': (1, 10)},
+    'Tank': {'atk': (20, 30), 'defense': (5, 15)},
+}
+UNIT_TYPES = tuple(UNIT_STATS)
+
+BASE_HP = 100  # 初始生命值和最大生命值
+DAMAGE_VARIANCE = (-5, 10)  # 每次攻击的随机伤害浮动
+EXP_PER_LEVEL = 100  # 升级所需经验值
+
+
+def roll_stat(unit_type, stat, rng=random):
+    """
+    按职业的属性范围随机生成一项属性。
+    :param unit_type: 角色类型（Warrior或Tank）
+    :param stat: 属性名（atk或defense）
+    :param rng: 随机数生成器，默认使用全局random模块
+    """
+    low, high = UNIT_STATS[unit_type][stat]
+    return rng.randint(low, high)
+
+
+def roll_damage(atk, defense, rng=random):
+    """
+    计算一次攻击的伤害：攻击力 - 防御力 + 随机浮动，最低为0。
+    :param atk: 攻击者的攻击力
+    :param defense: 目标的防御力
+    :param rng: 随机数生成器，默认使用全局random模块
+    """
+    return max(0, atk - defense + rng.randint(*DAMAGE_VARIANCE))
+
+
+class Fighter:
+    __slots__ = ('unit_type', 'hp', 'atk', 'defense', 'exp', 'level')
+
+    def __init__(self, unit_type, rng):
+        """
+        无界面对局中的单位（锦标赛和对局服务器使用），属性生成和攻击规则与Unit相同，但不记录日志。
+        """
+        self.unit_type = unit_type
+        self.hp = BASE_HP
+        self.atk = roll_stat(unit_type, 'atk', rng)
+        self.defense = roll_stat(unit_type, 'defense', rng)
+        self.exp = 0
+        self.level = 1
+
+    def attack(self, target, rng):
+        damage = roll_damage(self.atk, target.defense, rng)
+        target.hp -= damage
+        self.exp += damage
+        if self.exp >= EXP_PER_LEVEL:
+            self.level += 1
+            self.exp -= EXP_PER_LEVEL
+        return damage
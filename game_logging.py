@@ -0,0 +1,206 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+from settings import LOG_FILE, LOG_LEVEL, LOG_FORMAT, COMBAT_LOG_FILE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, \
+    LOG_MAX_BYTES, LOG_ROTATE_INTERVAL, LOG_BACKUP_COUNT
+
+# 异步日志：游戏线程只把日志记录放入队列，格式化、去重和文件写入都在后台的QueueListener线程中完成。
+# 战斗事件（攻击、升级）另外以结构化的JSONL格式批量写入COMBAT_LOG_FILE。
+
+combat_logger = logging.getLogger('combat')  # 战斗事件使用的logger
+
+
+# 定义去重过滤器类，用于防止重复日志记录（在后台线程中运行）
+class DeduplicationFilter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self.last_log = ""  # 用于保存最后一条日志信息
+
+    def filter(self, record):
+        current_log = record.getMessage()  # 获取当前日志消息
+        if current_log == self.last_log:  # 如果当前日志与最后一条相同，返回False，表示不记录该日志
+            return False
+        self.last_log = current_log  # 更新最后一条日志消息
+        return True  # 返回True，表示记录该日志
+
+
+class GameQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        """
+        记录在同一进程内传递，不需要序列化，因此不在游戏线程中格式化消息，原样放入队列。
+        """
+        return record
+
+
+SIZE_CHECK_RECORDS = 100  # 文本日志每写入多少条记录检查一次是否超过大小上限
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_INTERVAL, backup_count=LOG_BACKUP_COUNT):
+        """
+        按大小或时间轮转的日志文件，轮转出的旧文件用gzip压缩（在后台日志线程中进行，不影响游戏线程）。
+        :param path: 日志文件路径
+        :param max_bytes: 文件超过这个大小时轮转，0表示不按大小轮转
+        :param interval: 距上次轮转超过这么多秒时轮转，0表示不按时间轮转
+        :param backup_count: 保留的压缩文件数量
+        """
+        super().__init__(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.interval = interval
+        # 已有的日志文件从它的修改时间开始计时（没有文件时从现在开始）
+        self.rollover_at = (os.path.getmtime(path) if os.path.exists(path) else time.time()) + interval
+        self.unchecked = 0  # 上次检查文件大小之后写入的记录数
+
+    def namer(self, name):
+        return name + '.gz'
+
+    def rotator(self, source, dest):
+        with open(source, 'rb') as source_file, gzip.open(dest, 'wb') as dest_file:
+            shutil.copyfileobj(source_file, dest_file)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        # 父类每条记录都要重新格式化一次并查询文件位置，这里按记录时间判断时间轮转，
+        # 每写入SIZE_CHECK_RECORDS条记录才查询一次文件大小
+        if self.interval and record.created >= self.rollover_at:
+            return True
+        self.unchecked += 1
+        if not self.maxBytes or self.unchecked < SIZE_CHECK_RECORDS or self.stream is None:
+            return False
+        self.unchecked = 0
+        self.stream.flush()
+        return os.fstat(self.stream.fileno()).st_size >= self.maxBytes
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class CombatEventHandler(logging.Handler):
+    def __init__(self, path, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL):
+        """
+        把带有event字段的日志记录写成一行紧凑的JSON，攒够batch_size条或超过flush_interval秒后批量写入。
+        :param path: JSONL文件路径
+        :param batch_size: 每批写入的记录数
+        :param flush_interval: 两次写入之间的最长间隔（秒）
+        """
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.file = None
+
+    def emit(self, record):
+        event = getattr(record, 'event', None)
+        if event is None:
+            return
+        fields = {"t": round(record.created, 3), "event": event}
+        fields.update(record.fields)
+        self.buffer.append(json.dumps(fields, separators=(',', ':')))
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                if self.file is None:
+                    self.file = open(self.path, 'a', encoding='utf-8')
+                self.file.write('\n'.join(self.buffer) + '\n')
+                self.file.flush()
+                self.buffer = []
+            self.last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        super().close()
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    def dequeue(self, block):
+        """
+        队列空闲超过LOG_FLUSH_INTERVAL秒时，让结构化日志把未满一批的记录也写入文件。
+        """
+        if not block:
+            return self.queue.get(block)
+        while True:
+            try:
+                return self.queue.get(timeout=LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+
+_listener = None
+
+
+def setup_logging():
+    """
+    配置游戏日志（可重复调用）：根logger只挂一个队列处理器，文本日志（game_log.txt和控制台）
+    和结构化战斗日志由后台线程写入。程序退出时写完队列中剩余的记录。
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    text_handlers = [CompressingRotatingFileHandler(LOG_FILE), logging.StreamHandler()]
+    for handler in text_handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(DeduplicationFilter())
+    combat_handler = CombatEventHandler(COMBAT_LOG_FILE)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(GameQueueHandler(log_queue))
+
+    _listener = FlushingQueueListener(log_queue, *text_handlers, combat_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """
+    停止后台日志线程，写完剩余记录并关闭文件。
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def log_attack(attacker, target, damage, level=None, target_hp=None):
+    """
+    记录一次攻击：文本日志中为"X attacked Y for N damage."，同时输出结构化的attack事件。
+    :param level: 攻击者的等级，调用者已知时传入，省去再读取单位的属性（UnitView的属性读取较慢）
+    :param target_hp: 目标剩余的生命值，同上
+    """
+    combat_logger.info("%s attacked %s for %d damage.", attacker.name, target.name, damage,
+                       extra={"event": "attack", "fields": {
+                           "attacker": attacker.name, "target": target.name, "damage": damage,
+                           "level": attacker.level if level is None else level,
+                           "target_hp": target.hp if target_hp is None else target_hp}})
+
+
+def log_level_up(unit):
+    """
+    记录一次升级：文本日志中为"X leveled up to N!"，同时输出结构化的level_up事件。
+    """
+    combat_logger.info("%s leveled up to %d!", unit.name, unit.level,
+                       extra={"event": "level_up", "fields": {"unit": unit.name, "level": unit.level}})
@@ -0,0 +1,160 @@
+import struct
+
+import numpy as np
+
+# 动画GIF编码：只依赖NumPy。
+# 所有帧共用一个全局调色板：先放入固定的颜色（界面上的纯色），其余位置按第一帧中出现次数最多的颜色填充
+# （每个通道取高5位分组）。像素通过一张32768项的查找表映射到最近的调色板颜色，量化完全是向量化的。
+# 每一帧只编码与上一帧不同的矩形区域，处置方式为"保留"，因此画面大部分不变时（如只有攻击者在移动）
+# 每帧只需编码很小的区域。编码结果是一个个独立的字节块，可以在不同的进程中编码后按顺序拼接。
+
+PALETTE_SIZE = 256
+BIN_BITS = 5  # 查找表中每个通道保留的位数
+MIN_CODE_SIZE = 8
+MAX_CODES = 4096
+TRAILER = b';'
+
+
+def color_keys(pixels):
+    """
+    把形状为(高, 宽, 3)的RGB数组映射为查找表的下标。
+    """
+    shift = 8 - BIN_BITS
+    pixels = pixels.astype(np.uint16) >> shift
+    return (pixels[..., 0] << (2 * BIN_BITS)) | (pixels[..., 1] << BIN_BITS) | pixels[..., 2]
+
+
+def build_palette(pixels, fixed_colors=()):
+    """
+    生成调色板和查找表。
+    :param pixels: 形状为(高, 宽, 3)的RGB数组（uint8），通常是第一帧
+    :param fixed_colors: 必须准确出现在调色板中的颜色
+    :return: (调色板数组(256, 3), 查找表数组(32768,))
+    """
+    fixed = list(dict.fromkeys(tuple(color) for color in fixed_colors))[:PALETTE_SIZE]
+    counts = np.bincount(color_keys(pixels).ravel(), minlength=1 << (3 * BIN_BITS))
+    popular = np.argsort(counts)[::-1][:PALETTE_SIZE - len(fixed)]
+    popular = popular[counts[popular] > 0]
+    mask = (1 << BIN_BITS) - 1
+    half = 1 << (7 - BIN_BITS)
+    centers = np.stack([(popular >> (2 * BIN_BITS)) & mask, (popular >> BIN_BITS) & mask, popular & mask], axis=1)
+    palette = np.zeros((PALETTE_SIZE, 3), dtype=np.int32)
+    colors = np.concatenate([np.array(fixed, dtype=np.int32).reshape(-1, 3), (centers << (8 - BIN_BITS)) + half])
+    palette[:len(colors)] = colors
+
+    # 每个分组的中心映射到最近的调色板颜色（只在已使用的颜色中查找）
+    bins = np.arange(1 << (3 * BIN_BITS))
+    bin_colors = np.stack([(bins >> (2 * BIN_BITS)) & mask, (bins >> BIN_BITS) & mask, bins & mask], axis=1)
+    bin_colors = (bin_colors << (8 - BIN_BITS)) + half
+    lut = np.empty(len(bins), dtype=np.uint8)
+    used = palette[:len(colors)]
+    for start in range(0, len(bins), 4096):  # 分块计算距离，限制临时数组的大小
+        block = bin_colors[start:start + 4096]
+        distances = ((block[:, None, :] - used[None, :, :]) ** 2).sum(axis=2)
+        lut[start:start + 4096] = distances.argmin(axis=1)
+    for index, color in enumerate(fixed):  # 固定颜色所在的分组直接映射到它自己
+        lut[color_keys(np.array(color, dtype=np.uint8))] = index
+    return palette.astype(np.uint8), lut
+
+
+def quantize(pixels, lut):
+    """
+    把RGB数组量化为调色板下标，返回形状为(高, 宽)的uint8数组。
+    """
+    return lut[color_keys(pixels)]
+
+
+def header(width, height, palette, loop=0):
+    """
+    文件头：逻辑屏幕描述、全局调色板和循环播放的扩展块。
+    :param loop: 循环次数，0表示无限循环
+    """
+    return (b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0) + palette.tobytes() +
+            b'\x21\xff\x0bNETSCAPE2.0' + struct.pack('<BBHB', 3, 1, loop, 0))
+
+
+def sub_blocks(data):
+    """
+    把数据分成最长255字节的子块，以长度为0的块结束。
+    """
+    out = bytearray()
+    for start in range(0, len(data), 255):
+        chunk = data[start:start + 255]
+        out.append(len(chunk))
+        out += chunk
+    out.append(0)
+    return bytes(out)
+
+
+def lzw_encode(data, min_code_size=MIN_CODE_SIZE):
+    """
+    GIF格式的LZW压缩（可变码长，低位在前）。码表满时发送清除码并重新开始。
+    :param data: 调色板下标的字节串
+    """
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    bits = 0  # 尚未写出的位
+    bit_count = 0
+    code_size = min_code_size + 1
+    next_code = end + 1
+    table = {}
+
+    bits |= clear << bit_count
+    bit_count += code_size
+    prefix = data[0]
+    for byte in data[1:]:
+        key = prefix << 8 | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << bit_count
+        bit_count += code_size
+        while bit_count >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            bit_count -= 8
+        if next_code < MAX_CODES:
+            table[key] = next_code
+            next_code += 1
+            if next_code > (1 << code_size) and code_size < 12:  # 解码器比编码器晚一步加入码表
+                code_size += 1
+        else:
+            bits |= clear << bit_count
+            bit_count += code_size
+            table.clear()
+            code_size = min_code_size + 1
+            next_code = end + 1
+        prefix = byte
+    for code in (prefix, end):
+        bits |= code << bit_count
+        bit_count += code_size
+    while bit_count > 0:
+        out.append(bits & 0xFF)
+        bits >>= 8
+        bit_count -= 8
+    return bytes(out)
+
+
+def frame_block(indices, previous, delay):
+    """
+    编码一帧：图形控制扩展和只包含变化区域的图像块。
+    :param indices: 这一帧的调色板下标数组(高, 宽)
+    :param previous: 上一帧的下标数组，None表示这是第一帧（编码整帧）
+    :param delay: 这一帧的显示时间（1/100秒）
+    """
+    if previous is None:
+        top, left, bottom, right = 0, 0, indices.shape[0], indices.shape[1]
+    else:
+        changed = indices != previous
+        rows = np.flatnonzero(changed.any(axis=1))
+        if len(rows):
+            columns = np.flatnonzero(changed.any(axis=0))
+            top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+        else:  # 画面没有变化，编码一个像素以保持帧的时间
+            top, left, bottom, right = 0, 0, 1, 1
+    region = np.ascontiguousarray(indices[top:bottom, left:right])
+    control = b'\x21\xf9\x04' + struct.pack('<BHBB', 1 << 2, delay, 0, 0)  # 处置方式1：保留这一帧
+    descriptor = b'\x2c' + struct.pack('<HHHHB', left, top, right - left, bottom - top, 0)
+    return control + descriptor + bytes([MIN_CODE_SIZE]) + sub_blocks(lzw_encode(region.tobytes()))
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+from combat import UNIT_TYPES
+from match_server import (TEAM_SIZE, NEW_MATCH, ATTACK, STARTED, TURN, ERROR, STATUS_ONGOING, STATUS_PLAYER_WON,
+                          NO_UNIT, ERROR_NAMES, NEW_MATCH_BODY, ATTACK_BODY, STARTED_BODY, UNIT_BODY, TURN_BODY, ERROR_BODY,
+                          WRITE_HIGH_WATER, encode, split_frames, add_address_arguments)
+from stats import percentile
+from tournament import parse_team
+
+# 对局服务器的负载生成器：建立若干个连接，在每个连接上同时进行多场对局，玩家一方随机选择存活的攻击者和目标，
+# 直到完成指定数量的对局。最后报告每秒完成的对局数和攻击数，以及开局和每次攻击的往返延迟的百分位数。
+
+READ_SIZE = 64 * 1024
+
+
+class MatchError(Exception):
+    def __init__(self, code):
+        super().__init__(ERROR_NAMES.get(code, str(code)))
+        self.code = code
+
+
+class MatchClient:
+    def __init__(self, reader, writer):
+        """
+        一个到服务器的连接，可以同时进行多场对局。请求按到达顺序合并后写出，回复由read_loop分发给等待的请求。
+        """
+        self.reader = reader
+        self.writer = writer
+        self.pending_starts = {}  # tag -> 等待STARTED的Future
+        self.pending_turns = {}  # 对局编号 -> 等待TURN的Future
+        self.outgoing = []
+        self.next_tag = 0
+        self.timeouts = 0  # 服务器因超时结束的对局数
+
+    def send(self, frame):
+        if not self.outgoing:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.outgoing.append(frame)
+
+    def flush(self):
+        self.writer.write(b''.join(self.outgoing))
+        self.outgoing.clear()
+
+    async def read_loop(self):
+        buffer = bytearray()
+        try:
+            while True:
+                data = await self.reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                bodies, used = split_frames(buffer)
+                del buffer[:used]
+                for body in bodies:
+                    self.dispatch(body)
+        except ConnectionError:
+            pass
+        finally:
+            error = ConnectionError("connection closed")
+            for future in list(self.pending_starts.values()) + list(self.pending_turns.values()):
+                if not future.done():
+                    future.set_exception(error)
+
+    def dispatch(self, body):
+        kind = body[0]
+        if kind == TURN:
+            fields = TURN_BODY.unpack(body)
+            future = self.pending_turns.pop(fields[1], None)
+            if future is not None:
+                future.set_result(fields[2:])
+        elif kind == STARTED:
+            _, tag, match_id, players, ais = STARTED_BODY.unpack_from(body)
+            units = [UNIT_BODY.unpack_from(body, STARTED_BODY.size + i * UNIT_BODY.size) for i in range(players + ais)]
+            future = self.pending_starts.pop(tag, None)
+            if future is not None:
+                future.set_result((match_id, units[:players], units[players:]))
+        elif kind == ERROR:
+            _, request, identifier, code = ERROR_BODY.unpack(body)
+            pending = self.pending_starts if request == NEW_MATCH else self.pending_turns
+            future = pending.pop(identifier, None)
+            if future is not None:
+                future.set_exception(MatchError(code))
+            elif request == 0:
+                self.timeouts += 1
+
+    async def wait_writable(self):
+        if self.writer.transport.get_write_buffer_size() > WRITE_HIGH_WATER:
+            await self.writer.drain()
+
+    async def start_match(self, types):
+        """
+        开始一场对局。
+        :param types: 玩家单位的类型列表
+        :return: (对局编号, 玩家单位[(类型下标, 攻击力, 防御力)], AI单位)
+        """
+        self.next_tag = (self.next_tag + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.pending_starts[self.next_tag] = future
+        self.send(encode(NEW_MATCH_BODY.pack(NEW_MATCH, self.next_tag, len(types)) +
+                         bytes(UNIT_TYPES.index(unit_type) for unit_type in types)))
+        await self.wait_writable()
+        return await future
+
+    async def attack(self, match_id, attacker, target):
+        """
+        进行一次攻击。
+        :return: (伤害, AI攻击者下标, AI目标下标, AI造成的伤害, 对局状态)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending_turns[match_id] = future
+        self.send(encode(ATTACK_BODY.pack(ATTACK, match_id, attacker, target)))
+        await self.wait_writable()
+        return await future
+
+
+class LoadStats:
+    def __init__(self):
+        self.start_latencies = []
+        self.move_latencies = []
+        self.matches = 0
+        self.player_wins = 0
+        self.errors = Counter()
+
+
+async def play_match(client, team, rng, stats):
+    """
+    进行一场完整的对局，记录每次请求的往返延迟。
+    """
+    start = time.perf_counter()
+    match_id, players, ais = await client.start_match(team)
+    stats.start_latencies.append(time.perf_counter() - start)
+    player_hp = [100] * len(players)
+    ai_hp = [100] * len(ais)
+    while True:
+        attacker = rng.choice([i for i, hp in enumerate(player_hp) if hp > 0])
+        target = rng.choice([i for i, hp in enumerate(ai_hp) if hp > 0])
+        start = time.perf_counter()
+        damage, ai_attacker, ai_target, ai_damage, status = await client.attack(match_id, attacker, target)
+        stats.move_latencies.append(time.perf_counter() - start)
+        ai_hp[target] -= damage
+        if ai_attacker != NO_UNIT:
+            player_hp[ai_target] -= ai_damage
+        if status != STATUS_ONGOING:
+            stats.matches += 1
+            stats.player_wins += status == STATUS_PLAYER_WON
+            return
+
+
+async def worker(client, remaining, team_spec, rng, stats):
+    """
+    不断开始新对局，直到完成的对局数达到目标。
+    """
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        team = [rng.choice(UNIT_TYPES) for _ in range(TEAM_SIZE)] if team_spec == 'random' else team_spec.split(',')
+        try:
+            await play_match(client, team, rng, stats)
+        except MatchError as e:
+            stats.errors[str(e)] += 1
+
+
+async def run_load(args):
+    stats = LoadStats()
+    remaining = [args.matches]
+    clients = []
+    for _ in range(args.connections):
+        if args.unix:
+            reader, writer = await asyncio.open_unix_connection(args.unix)
+        else:
+            reader, writer = await asyncio.open_connection(args.host, args.port)
+        clients.append(MatchClient(reader, writer))
+    readers = [asyncio.create_task(client.read_loop()) for client in clients]
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(clients[i % len(clients)], remaining, args.team, random.Random(rng.random()), stats)
+                           for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.writer.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+    timeouts = sum(client.timeouts for client in clients)
+    return stats, elapsed, timeouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the match server.")
+    add_address_arguments(parser)
+    parser.add_argument('-n', '--matches', type=int, default=10000, help="matches to play in total")
+    parser.add_argument('-c', '--concurrency', type=int, default=1000, help="matches in flight at once")
+    parser.add_argument('--connections', type=int, default=8, help="connections the matches are spread over")
+    parser.add_argument('--team', type=parse_team, default='Warrior,Warrior,Tank',
+                        help="player team, e.g. W,W,T or 'random'")
+    parser.add_argument('--seed', type=int, default=None, help="seed for the player's choices")
+    args = parser.parse_args()
+
+    stats, elapsed, timeouts = asyncio.run(run_load(args))
+    moves = len(stats.move_latencies)
+    print(f"{stats.matches} matches, {moves} moves in {elapsed:.2f}s: {stats.matches / elapsed:.0f} matches/s, "
+          f"{moves / elapsed:.0f} moves/s, player win rate {stats.player_wins / max(1, stats.matches):.3f}")
+    for name, samples in (("start", stats.start_latencies), ("move", stats.move_latencies)):
+        ordered = sorted(samples)
+        print(f"{name:5s} latency ms: p50 {percentile(ordered, 50) * 1000:.2f}  "
+              f"p90 {percentile(ordered, 90) * 1000:.2f}"
+              f"  p99 {percentile(ordered, 99) * 1000:.2f}  max {(ordered[-1] if ordered else 0) * 1000:.2f}")
+    if stats.errors or timeouts:
+        print(f"errors: {dict(stats.errors)}, server timeouts: {timeouts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+import argparse
+import gzip
+import mmap
+import os
+import re
+import time
+
+import numpy as np
+
+from combat import UNIT_TYPES
+
+# 游戏日志索引：把game_log.txt（以及轮转出的.gz文件）中的战斗记录
+#   "2024-08-22 14:25:40,123 - INFO - X attacked Y for N damage."
+#   "2024-08-22 14:25:40,123 - INFO - X leveled up to N!"
+# 解析为按列存放的NumPy数组（时间、事件类型、单位、目标、数值、单位类型），可按单位、单位类型、
+# 时间范围和事件类型查询，也可以保存为.npz文件以后直接加载。
+#
+# 解析时不逐行运行Python代码：文件用mmap映射为字节数组，换行位置、固定格式的时间戳、行尾的数字
+# 和分隔词都用向量化的比较和取值得到；单位名称所在的字段按内容哈希分组，每种不同的名称组合只在Python中
+# 解码一次。单位类型来自"Name=X, Type=T."格式的创建/读档日志（取事件发生前最近的一条）。
+#
+# 吞吐量：在单核的测试环境中，100 MB的日志约80 MB/s；同一环境中只找换行位置（np.flatnonzero(buf == 10)）
+# 就只有约860 MB/s。每行还要做二十多次按位置取值（在未对齐的8字节视图上，比对齐的数组慢约4倍），
+# 因此纯NumPy的单进程解析达不到"每秒几百MB"，预期目标是换行扫描速度的十分之一左右。
+# 更高的速度需要多进程并行解析各个块，或者编译型的扫描代码。
+
+EVENT_ATTACK = 0
+EVENT_LEVEL_UP = 1
+EVENT_NAMES = ('attack', 'level_up')
+
+CHUNK_BYTES = 16 * 1024 * 1024  # 每次解析的最大字节数，大文件分块处理以限制内存
+TIMESTAMP_WIDTH = 23  # "2024-08-22 14:25:40,123"
+INFO_PREFIX = b' - INFO - '  # 战斗记录都是INFO级别
+MESSAGE_OFFSET = TIMESTAMP_WIDTH + len(INFO_PREFIX)
+ATTACK_SUFFIX = b' damage.'
+ATTACK_FOR = b' for '
+ATTACKED = ' attacked '
+LEVEL_INFIX = b' leveled up to '
+LEVEL_SUFFIX = b'!'
+MAX_DIGITS = 9
+UNIT_RECORD_PREFIXES = (b'Created ', b'Loaded unit')
+UNIT_RECORD_RE = re.compile(rb'Name=(.*), Type=(\w+)\.')
+BYTE_MASKS = np.array([(1 << (8 * k)) - 1 for k in range(9)], dtype=np.uint64)  # 保留低k个字节
+TIME_DIGIT_WEIGHTS = np.array([0, 0, 0, 0, 0, 0, 600000, 60000, 0, 10000, 1000, 0, 100, 10, 1, 0], dtype=np.float64)
+TIME_DIGIT_OFFSET = 48 * TIME_DIGIT_WEIGHTS.sum()
+SLOT_BITS = 20  # group_slices中散列表的大小（2的幂次）
+HASH_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93],
+                            dtype=np.uint64)
+
+COLUMNS = ('time', 'event', 'unit', 'target', 'value', 'unit_type')
+
+
+class NameTable:
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def id(self, name):
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+
+def word_view(buf):
+    """
+    返回buf中从每个字节开始的8字节小端整数（共享buf的内存，不复制），一次取值就能比较或读取8个字节。
+    """
+    return np.ndarray(shape=(len(buf) - 7,), dtype='<u8', buffer=buf, strides=(1,))
+
+
+def matches_at(words, positions, literal):
+    """
+    返回每个位置开始的字节是否等于literal。
+    :param words: word_view()的结果
+    """
+    positions = np.minimum(positions, len(words) - 1)
+    if len(literal) <= 8:
+        value = int.from_bytes(literal, 'little')
+        return (words[positions] & BYTE_MASKS[len(literal)]) == np.uint64(value)
+    mask = None
+    for offset in list(range(0, len(literal) - 8, 8)) + [len(literal) - 8]:  # 最后一段与前一段可以重叠
+        hit = words[positions + offset] == np.uint64(int.from_bytes(literal[offset:offset + 8], 'little'))
+        mask = hit if mask is None else mask & hit
+    return mask
+
+
+def digits_before(buf, ends, lower):
+    """
+    读取每行在ends之前的十进制整数。
+    :param lower: 数字最多向前延伸到的位置（不包含）
+    :return: (数值, 数字的起始位置)，没有数字的行起始位置等于ends
+    """
+    values = np.zeros(len(ends), dtype=np.int64)
+    count = np.zeros(len(ends), dtype=np.int64)
+    active = np.ones(len(ends), dtype=bool)
+    scale = 1
+    for k in range(1, MAX_DIGITS + 1):
+        position = ends - k
+        digit = buf[np.maximum(position, 0)] - np.uint8(48)  # 不是数字的字节减去'0'后（回绕）大于9
+        active &= (digit < 10) & (position >= lower)
+        if not active.any():
+            break
+        values += (digit * active).astype(np.int64) * scale
+        count += active
+        scale *= 10
+    return values, ends - count
+
+
+def word_digit(word, k):
+    return ((word >> np.uint64(8 * k)) & np.uint64(0xFF)).astype(np.int64) - 48
+
+
+def parse_timestamps(words, starts):
+    """
+    把每行开头的本地时间戳（asctime格式）转换为Unix时间（秒）。
+    日期和小时在相邻的行之间很少变化，只对每段相同前缀的第一行按公历算出"当作UTC"的秒数，
+    再用time.mktime求一次本地时区的偏移；小时之内的分、秒、毫秒对所有行一起用矩阵乘法算出。
+    """
+    if not len(starts):
+        return np.zeros(0, dtype=np.float64)
+    # "2024-08-22 14:25:27,650"正好由三个8字节的字读出
+    w0, w1 = words[starts], words[starts + 8]
+    hour_word = w1 & BYTE_MASKS[5]  # "22 14"
+    change = np.empty(len(starts), dtype=bool)
+    change[0] = True
+    change[1:] = (w0[1:] != w0[:-1]) | (hour_word[1:] != hour_word[:-1])
+    heads = np.flatnonzero(change)
+    run = np.cumsum(change) - 1
+
+    h0, h1 = w0[heads], w1[heads]
+    year = word_digit(h0, 0) * 1000 + word_digit(h0, 1) * 100 + word_digit(h0, 2) * 10 + word_digit(h0, 3)
+    month = word_digit(h0, 5) * 10 + word_digit(h0, 6)
+    day = word_digit(h1, 0) * 10 + word_digit(h1, 1)
+    hour = word_digit(h1, 3) * 10 + word_digit(h1, 4)
+    # 公历日期到1970-01-01的天数
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    naive = (era * 146097 + doe - 719468) * 86400 + hour * 3600
+    hour_start = np.array([time.mktime(time.gmtime(int(value))[:8] + (-1,)) for value in naive], dtype=np.float64)
+
+    # 第8到23个字节"22 14:25:27,650 "中分、秒、毫秒各位数字的权重（毫秒）
+    fields = np.empty((len(starts), 2), dtype=np.uint64)
+    fields[:, 0] = w1
+    fields[:, 1] = words[starts + 16]
+    millis = fields.view(np.uint8).astype(np.float64) @ TIME_DIGIT_WEIGHTS - TIME_DIGIT_OFFSET
+    return hour_start[run] + millis / 1000
+
+
+def group_slices(buf, words, starts, lengths):
+    """
+    按内容对变长的字节片段分组。每个片段按8字节的字读取，最后一个字与片段的结尾对齐（与前一个字可以重叠），
+    不需要逐行屏蔽多余的字节；长度相同的两个片段读出的字相同当且仅当内容相同。
+    不足8字节的片段读到的是它前面的字节，因此要求所有片段前的8个字节相同（这里都是INFO_PREFIX的结尾）。
+    :return: (每组的片段内容列表, 每个片段所属的组号)
+    """
+    width = max(1, -(-int(lengths.max()) // 8))
+    last = starts + lengths - 8  # 最后一个字的位置
+    matrix = np.empty((len(starts), width), dtype=np.uint64)
+    for j in range(width):
+        matrix[:, j] = words[np.minimum(starts + 8 * j, last)]
+    hashes = lengths.astype(np.uint64)
+    for j in range(width):
+        hashes = (hashes ^ matrix[:, j]) * HASH_MULTIPLIERS[j % len(HASH_MULTIPLIERS)]
+        hashes ^= hashes >> np.uint64(29)
+    # 不排序：把哈希值散列到一张表中，同一个槽中最后写入的片段作为代表，哈希值与代表相同的片段属于同一组。
+    # 与代表的哈希值不同的片段（不同的内容落入了同一个槽）换一个散列函数再放一轮，每轮至少确定每个槽的代表
+    representative = np.empty(len(hashes), dtype=np.intp)
+    table = np.empty(1 << SLOT_BITS, dtype=np.intp)
+    pending = np.arange(len(hashes))
+    round_ = 0
+    while len(pending):
+        multiplier = HASH_MULTIPLIERS[round_ % len(HASH_MULTIPLIERS)] + np.uint64(2 * round_)  # 奇数
+        slots = ((hashes[pending] * multiplier) >> np.uint64(64 - SLOT_BITS)).astype(np.intp)
+        table[slots] = pending
+        candidate = table[slots]
+        hit = hashes[candidate] == hashes[pending]
+        representative[pending[hit]] = candidate[hit]
+        pending = pending[~hit]
+        round_ += 1
+    is_first = representative == np.arange(len(hashes))
+    first = np.flatnonzero(is_first)
+    inverse = (np.cumsum(is_first) - 1)[representative]
+    same = first[inverse]
+    if not ((matrix == matrix[same]).all() and (lengths == lengths[same]).all()):  # 哈希冲突（极少见）时按完整内容分组
+        full = np.column_stack([matrix, lengths.astype(np.uint64)])
+        _, first, inverse = np.unique(full.view(f'V{8 * (width + 1)}').ravel(), return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    keys = [buf[starts[i]:starts[i] + lengths[i]].tobytes().decode('utf-8', 'replace') for i in first]
+    return keys, inverse
+
+
+def parse_buffer(buf, names):
+    """
+    解析一段以换行结尾的日志。
+    :param buf: uint8数组
+    :param names: NameTable，在多段之间共享
+    :return: (事件列字典, 单位记录列表[(时间, 名称编号, 类型名称)])
+    """
+    buf = np.concatenate([buf, np.zeros(8, dtype=np.uint8)]) if len(buf) < 64 else buf  # 保证word_view不为空
+    words = word_view(buf)
+    ends = np.flatnonzero(buf == 10)
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    if len(ends) and ends[0] > 0 and buf[ends[0] - 1] == 13:  # Windows换行，去掉行尾的\r
+        ends = ends - 1
+    keep = ends - starts > MESSAGE_OFFSET
+    starts, ends = starts[keep], ends[keep]
+    keep = matches_at(words, starts + TIMESTAMP_WIDTH, INFO_PREFIX)
+    starts, ends = starts[keep], ends[keep]
+    message = starts + MESSAGE_OFFSET
+
+    columns = {column: [] for column in COLUMNS}
+
+    # 攻击："X attacked Y for N damage."
+    attack = (ends - message > len(ATTACK_SUFFIX) + len(ATTACK_FOR)) & \
+        matches_at(words, np.maximum(ends - len(ATTACK_SUFFIX), 0), ATTACK_SUFFIX)
+    a_starts, a_message, a_ends = starts[attack], message[attack], ends[attack] - len(ATTACK_SUFFIX)
+    damage, number = digits_before(buf, a_ends, a_message)
+    for_pos = number - len(ATTACK_FOR)
+    valid = (number < a_ends) & (for_pos > a_message) & matches_at(words, np.maximum(for_pos, 0), ATTACK_FOR)
+    a_starts, a_message, for_pos, damage = a_starts[valid], a_message[valid], for_pos[valid], damage[valid]
+    if len(a_starts):
+        keys, inverse = group_slices(buf, words, a_message, for_pos - a_message)
+        pairs = [key.split(ATTACKED, 1) if ATTACKED in key else None for key in keys]
+        attacker_ids = np.array([names.id(pair[0]) if pair else -1 for pair in pairs], dtype=np.int32)[inverse]
+        target_ids = np.array([names.id(pair[1]) if pair else -1 for pair in pairs], dtype=np.int32)[inverse]
+        if None in pairs:  # 名称部分不含" attacked "的行不是攻击记录
+            known = attacker_ids >= 0
+            a_starts, damage, attacker_ids, target_ids = \
+                a_starts[known], damage[known], attacker_ids[known], target_ids[known]
+        columns['time'].append(parse_timestamps(words, a_starts))
+        columns['event'].append(np.full(len(a_starts), EVENT_ATTACK, dtype=np.uint8))
+        columns['unit'].append(attacker_ids)
+        columns['target'].append(target_ids)
+        columns['value'].append(damage.astype(np.int32))
+
+    # 升级："X leveled up to N!"
+    level = (ends - message > len(LEVEL_INFIX) + len(LEVEL_SUFFIX)) & (buf[ends - 1] == LEVEL_SUFFIX[0])
+    l_starts, l_message, l_ends = starts[level], message[level], ends[level] - len(LEVEL_SUFFIX)
+    value, number = digits_before(buf, l_ends, l_message)
+    infix = number - len(LEVEL_INFIX)
+    valid = (number < l_ends) & (infix > l_message) & matches_at(words, np.maximum(infix, 0), LEVEL_INFIX)
+    l_starts, l_message, infix, value = l_starts[valid], l_message[valid], infix[valid], value[valid]
+    if len(l_starts):
+        keys, inverse = group_slices(buf, words, l_message, infix - l_message)
+        unit_ids = np.array([names.id(key) for key in keys], dtype=np.int32)[inverse]
+        columns['time'].append(parse_timestamps(words, l_starts))
+        columns['event'].append(np.full(len(l_starts), EVENT_LEVEL_UP, dtype=np.uint8))
+        columns['unit'].append(unit_ids)
+        columns['target'].append(np.full(len(l_starts), -1, dtype=np.int32))
+        columns['value'].append(value.astype(np.int32))
+
+    # 单位记录："Created character N: Name=X, Type=T." / "Created AI unit N: ..." / "Loaded unit: ..."（数量很少，逐行解析）
+    record = np.zeros(len(starts), dtype=bool)
+    for prefix in UNIT_RECORD_PREFIXES:
+        record |= (ends - message >= len(prefix)) & matches_at(words, message, prefix)
+    units = []
+    r_starts, r_message, r_ends = starts[record], message[record], ends[record]
+    if len(r_starts):
+        times = parse_timestamps(words, r_starts)
+        for when, begin, end in zip(times, r_message, r_ends):
+            match = UNIT_RECORD_RE.search(buf[begin:end].tobytes())
+            if match:
+                units.append((when, names.id(match.group(1).decode('utf-8', 'replace')),
+                              match.group(2).decode('ascii')))
+    return columns, units
+
+
+def iter_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """
+    按块读取日志文件，每块以换行结尾。普通文件使用mmap，不复制数据；.gz文件边解压边读取。
+    """
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as file:
+            rest = b''
+            while True:
+                data = file.read(chunk_bytes)
+                if not data:
+                    break
+                data = rest + data
+                cut = data.rfind(b'\n') + 1
+                rest = data[cut:]
+                if cut:
+                    yield np.frombuffer(data, dtype=np.uint8, count=cut)
+            if rest:
+                yield np.frombuffer(rest + b'\n', dtype=np.uint8)
+        return
+
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as file:
+        # 不显式关闭映射：产出的数组仍引用它，最后一个引用释放时自动解除映射
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    size = len(mapped)
+    offset = 0
+    while offset < size:
+        end = min(size, offset + chunk_bytes)
+        if end < size:
+            end = mapped.rfind(b'\n', offset, end) + 1 or end
+        if end == size and mapped[size - 1] != 10:  # 最后一行没有换行
+            yield np.frombuffer(mapped[offset:size] + b'\n', dtype=np.uint8)
+        else:
+            yield np.frombuffer(mapped, dtype=np.uint8, count=end - offset, offset=offset)
+        offset = end
+
+
+class LogStore:
+    def __init__(self, names, columns):
+        """
+        按列存放的战斗事件，行按时间排序。
+        :param names: 单位名称列表，unit和target列是其中的下标
+        :param columns: 列名 -> 数组，见COLUMNS
+        """
+        self.names = list(names)
+        self.name_ids = {name: i for i, name in enumerate(self.names)}
+        for column in COLUMNS:
+            setattr(self, column, columns[column])
+        self.unit_order = None
+        self.unit_bounds = None
+
+    def build_unit_index(self):
+        """
+        建立按单位的索引（第一次按单位查询时调用）：unit_order中同一单位的行连续存放，组内仍按时间排序。
+        """
+        if self.unit_order is None:
+            self.unit_order = np.argsort(self.unit, kind='stable')
+            self.unit_bounds = np.searchsorted(self.unit[self.unit_order], np.arange(len(self.names) + 1))
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def from_logs(cls, paths):
+        """
+        解析日志文件（可以包含轮转出的.gz文件，顺序任意）。
+        """
+        names = NameTable()
+        parts = {column: [] for column in COLUMNS}
+        units = []
+        for path in paths:
+            for buf in iter_chunks(path):
+                columns, chunk_units = parse_buffer(buf, names)
+                for column in ('time', 'event', 'unit', 'target', 'value'):
+                    parts[column].extend(columns[column])
+                units.extend(chunk_units)
+
+        dtypes = {'time': np.float64, 'event': np.uint8, 'unit': np.int32, 'target': np.int32, 'value': np.int32}
+        columns = {column: np.concatenate(parts[column]) if parts[column] else np.zeros(0, dtype=dtypes[column])
+                   for column in dtypes}
+        order = np.argsort(columns['time'], kind='stable')
+        columns = {column: values[order] for column, values in columns.items()}
+        columns['unit_type'] = resolve_types(columns['unit'], columns['time'], units)
+        return cls(names.names, columns)
+
+    def save(self, path):
+        np.savez(path, names=np.array(self.names, dtype=str), **{column: getattr(self, column) for column in COLUMNS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['names'].tolist(), {column: data[column] for column in COLUMNS})
+
+    def query(self, unit=None, unit_type=None, event=None, start=None, end=None):
+        """
+        查询满足条件的行。
+        :param unit: 单位名称（攻击者或升级的单位）
+        :param unit_type: 单位类型（Warrior或Tank）
+        :param event: 'attack'或'level_up'
+        :param start: 起始时间（Unix时间，包含）
+        :param end: 结束时间（Unix时间，不包含）
+        :return: 行号数组（按时间排序）
+        """
+        if unit is not None:
+            unit_id = self.name_ids.get(unit)
+            if unit_id is None:
+                return np.zeros(0, dtype=np.int64)
+            self.build_unit_index()
+            rows = self.unit_order[self.unit_bounds[unit_id]:self.unit_bounds[unit_id + 1]]
+            times = self.time[rows]
+            low = 0 if start is None else np.searchsorted(times, start, 'left')
+            high = len(rows) if end is None else np.searchsorted(times, end, 'left')
+            rows = rows[low:high]
+        else:
+            low = 0 if start is None else np.searchsorted(self.time, start, 'left')
+            high = len(self.time) if end is None else np.searchsorted(self.time, end, 'left')
+            rows = np.arange(low, high)
+        mask = np.ones(len(rows), dtype=bool)
+        if event is not None:
+            mask &= self.event[rows] == EVENT_NAMES.index(event)
+        if unit_type is not None:
+            mask &= self.unit_type[rows] == UNIT_TYPES.index(unit_type)
+        return rows[mask]
+
+
+def resolve_types(unit_ids, times, units):
+    """
+    确定每个事件中单位的类型：取同名单位在事件发生时或之前最近的一条创建/读档记录，
+    事件早于该名称的所有记录时（例如记录在已删除的旧日志中）取最早的一条，没有任何记录时为-1。
+    """
+    result = np.full(len(unit_ids), -1, dtype=np.int8)
+    units = [(when, name_id, UNIT_TYPES.index(unit_type)) for when, name_id, unit_type in units
+             if unit_type in UNIT_TYPES]
+    if not units or not len(unit_ids):
+        return result
+    record_times, record_names, record_types = (np.array(column) for column in zip(*units))
+    count = max(int(unit_ids.max()), int(record_names.max())) + 1
+    lowest = np.full(count, len(UNIT_TYPES), dtype=np.int8)
+    highest = np.full(count, -1, dtype=np.int8)
+    np.minimum.at(lowest, record_names, record_types)
+    np.maximum.at(highest, record_names, record_types)
+    # 大多数名称的所有记录类型相同，直接按名称查表
+    valid = unit_ids >= 0
+    result[valid] = highest[unit_ids[valid]]
+    mixed = valid & (lowest != highest)[np.maximum(unit_ids, 0)] & (highest >= 0)[np.maximum(unit_ids, 0)]
+    if not mixed.any():
+        return result
+
+    # 同名单位有过不同类型时按时间查找：把(名称编号, 毫秒时间)合成一个整数键，一次searchsorted完成
+    origin = min(record_times.min(), times.min())
+    span = int(round((max(record_times.max(), times.max()) - origin) * 1000)) + 2
+    record_keys = record_names.astype(np.int64) * span + np.round((record_times - origin) * 1000).astype(np.int64)
+    order = np.argsort(record_keys, kind='stable')
+    record_keys, record_names, record_types = record_keys[order], record_names[order], record_types[order]
+    ids = unit_ids[mixed].astype(np.int64)
+    keys = ids * span + np.round((times[mixed] - origin) * 1000).astype(np.int64)
+    index = np.searchsorted(record_keys, keys, 'right') - 1
+    first = np.searchsorted(record_names, ids, 'left')
+    result[mixed] = record_types[np.maximum(index, first)]
+    return result
+
+
+def parse_time(text):
+    """
+    解析命令行中的时间：Unix时间或"YYYY-MM-DD[ HH:MM[:SS]]"格式的本地时间。
+    """
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Invalid time: {text}")
+
+
+def open_store(sources):
+    if len(sources) == 1 and sources[0].endswith('.npz'):
+        return LogStore.load(sources[0])
+    return LogStore.from_logs(sources)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query combat events in game logs.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="parse log files into a columnar index (.npz)")
+    build.add_argument('logs', nargs='+', help="log files, rotated .gz files included")
+    build.add_argument('-o', '--output', default='game_log.index.npz', help="index file to write")
+    query = commands.add_parser('query', help="query an index or log files")
+    query.add_argument('sources', nargs='+', help="an index (.npz) or log files")
+    query.add_argument('--unit', help="unit name")
+    query.add_argument('--type', choices=UNIT_TYPES, help="unit type of the attacker / leveled unit")
+    query.add_argument('--event', choices=EVENT_NAMES, default='attack')
+    query.add_argument('--since', type=parse_time, help="start time (inclusive)")
+    query.add_argument('--until', type=parse_time, help="end time (exclusive)")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        size = sum(os.path.getsize(path) for path in args.logs)
+        start = time.perf_counter()
+        store = LogStore.from_logs(args.logs)
+        elapsed = time.perf_counter() - start
+        store.save(args.output)
+        print(f"Indexed {len(store)} events from {size / 1e6:.1f} MB in {elapsed:.2f}s "
+              f"({size / 1e6 / max(elapsed, 1e-9):.0f} MB/s) -> {args.output}")
+        return
+
+    store = open_store(args.sources)
+    rows = store.query(args.unit, args.type, args.event, args.since, args.until)
+    values = store.value[rows]
+    print(f"{len(rows)} {args.event} events")
+    if len(rows):
+        if args.event == 'attack':
+            print(f"Damage: total {values.sum()}, mean {values.mean():.2f}, max {values.max()}")
+        else:
+            print(f"Levels reached: max {values.max()}, mean {values.mean():.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,205 +1,409 @@
+import gc  # 引入gc库，用于在对局结束后回收内存
 import pygame  # 引入pygame库，用于游戏开发
 import random  # 引入random库，用于生成随机数
 import sys  # 引入sys库，用于退出程序
 import logging  # 引入logging库，用于记录日志
-import json  # 引入json库，用于保存和加载游戏数据
-from settings import screen, BLACK, WHITE, font, background_img, attack_sound, SAVE_FILE  # 从settings文件中导入游戏设置
-from screens import start_screen, setup_screen, game_over_screen  # 从screens文件中导入不同的游戏界面
-from battle import attack_animation  # 从battle文件中导入攻击动画函数
+from functools import partial  # 引入partial，用于绑定绘制函数的参数
+from settings import GameState, get_screen, get_background_img, BLACK, WHITE, SAVE_FILE, SAVE_DB, AUTOSAVE_SLOT, LOAD_SCREEN_ROWS, PROFILE_TRACE_FILE, SCREEN_WIDTH, SCREEN_HEIGHT, DIRTY_RECT_RENDERING, FPS, FAST_FORWARD_SPEED, RECORD_REPLAYS, REPLAY_DIR, MATCH_SEED, ODDS_HINT, ODDS_CHILDREN_PER_FRAME, ODDS_HINT_MAX_CHILDREN, ODDS_HINT_MAX_UNITS, AI_MODE, AI_TIME_BUDGET_MS, AI_WORKERS, AI_MAX_DEPTH  # 从settings文件中导入游戏设置
+from screens import start_screen, setup_screen, load_screen, game_over_screen  # 从screens文件中导入不同的游戏界面
+from battle import AttackAnimation, AnimationScheduler  # 从battle文件中导入攻击动画和动画调度器
 from unit import Unit  # 从unit文件中导入Unit类
+from text_cache import render_text  # 从text_cache文件中导入带缓存的文字渲染函数
+from renderer import DirtyRectRenderer  # 从renderer文件中导入脏矩形渲染器
+from savefile import build_save_data, read_save_data  # 从savefile文件中导入存档数据的生成和旧存档文件的读取
+from savestore import SaveStore, AutosaveJournal  # 从savestore文件中导入SQLite存档库和自动存档
+from game_logging import setup_logging  # 从game_logging文件中导入日志配置函数
+from replay import MatchRecorder, new_seed, replay_path  # 从replay文件中导入对局录像功能
+from ai import get_opponent, MAX_ROOT_MOVES  # 从ai文件中导入搜索型AI
+from spatial import SpatialGrid  # 从spatial文件中导入单位位置的网格索引
+from team import Team  # 从team文件中导入列式存储的队伍
+from profiler import profiler  # 从profiler文件中导入逐帧性能分析器
+from sound import sound_bank  # 从sound文件中导入音效库
+from odds import OddsHint, PLAYER, AI  # 从odds文件中导入胜率提示
 
-# 日志设置，配置日志记录的级别、格式和处理程序
-logging.basicConfig(
-    level=logging.INFO,  # 设置日志级别为INFO
-    format='%(asctime)s - %(levelname)s - %(message)s',  # 设置日志格式，包括时间、日志级别和消息
-    handlers=[
-        logging.FileHandler("game_log.txt"),  # 将日志保存到文件game_log.txt中
-        logging.StreamHandler()  # 在控制台输出日志
-    ]
-)
-
-# 定义去重过滤器类，用于防止重复日志记录
-class DeduplicationFilter(logging.Filter):
-    last_log = ""  # 用于保存最后一条日志信息
-
-    # 定义过滤器的filter方法
-    def filter(self, record):
-        current_log = record.getMessage()  # 获取当前日志消息
-        if current_log == DeduplicationFilter.last_log:  # 如果当前日志与最后一条相同，返回False，表示不记录该日志
-            return False
-        DeduplicationFilter.last_log = current_log  # 更新最后一条日志消息
-        return True  # 返回True，表示记录该日志
-
-# 获取logger对象并添加去重过滤器
-logger = logging.getLogger()
-logger.addFilter(DeduplicationFilter())
+
+# 为新对局生成种子和随机数生成器，设置了GAME_SEED时使用固定种子
+def new_match_rng():
+    seed = MATCH_SEED if MATCH_SEED is not None else new_seed()
+    logging.info("Match seed: %s.", seed)
+    return seed, random.Random(seed)
 
 # 定义游戏设置函数，用于初始化玩家和AI的队伍
-def game_setup():
-    player_team = setup_screen()  # 调用setup_screen函数获取玩家队伍
+def game_setup(rng=random):
+    player_team = setup_screen(rng)  # 调用setup_screen函数获取玩家队伍
     ai_team = []  # 初始化AI队伍为空列表
     for i in range(3):  # 生成三个AI单位
-        name = f"AI{random.randint(10, 99)}"  # 随机生成AI的名字
-        unit_type = random.choice(['Warrior', 'Tank'])  # 随机选择单位类型
+        name = f"AI{rng.randint(10, 99)}"  # 随机生成AI的名字
+        unit_type = rng.choice(['Warrior', 'Tank'])  # 随机选择单位类型
         position = (650, 100 + i * 200)  # 设置AI单位的位置
-        ai_team.append(Unit(name, unit_type, position))  # 将生成的AI单位添加到AI队伍中
-    return player_team, ai_team  # 返回玩家队伍和AI队伍
+        ai_team.append(Unit(name, unit_type, position, rng))  # 将生成的AI单位添加到AI队伍中
+        logging.info(f"Created AI unit {i + 1}: Name={name}, Type={unit_type}.")  # 日志索引根据这一行确定单位的类型
+    return Team.from_units(player_team), Team.from_units(ai_team)  # 返回玩家队伍和AI队伍（列式存储）
+
+save_store = None  # 存档库，第一次使用时打开
+
 
-# 定义保存游戏函数，将当前游戏状态保存到文件中
-def save_game(player_team, ai_team, player_gold):
+# 返回存档库，第一次调用时打开数据库；数据库中还没有存档时导入旧的单一存档文件
+def get_save_store():
+    global save_store
+    if save_store is None:
+        save_store = SaveStore(SAVE_DB)
+        if not save_store.list_slots(1):
+            import_legacy_save(save_store)
+    return save_store
+
+# 把旧的save_file.json导入为一个存档槽
+def import_legacy_save(store):
     try:
-        # 构建保存数据的字典
-        save_data = {
-            "player_team": [
-                {"name": unit.name, "type": unit.unit_type, "position": list(unit.position), "hp": unit.hp}
-                for unit in player_team
-            ],
-            "ai_team": [
-                {"name": unit.name, "type": unit.unit_type, "position": list(unit.position), "hp": unit.hp}
-                for unit in ai_team
-            ],
-            "player_gold": player_gold  # 保存玩家的金币数量
-        }
-        # 将数据写入保存文件中
-        with open(SAVE_FILE, "w") as file:
-            json.dump(save_data, file)
-        logging.info("Game saved successfully to %s.", SAVE_FILE)  # 记录保存成功的日志
+        player_team, ai_team, player_gold = teams_from_save_data(read_save_data(SAVE_FILE))
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        logging.error(f"Failed to import {SAVE_FILE}: {e}")
+        return
+    store.save_slot("save_file", build_save_data(player_team, ai_team, player_gold))
+    logging.info("Imported %s into the save database.", SAVE_FILE)
+
+# 定义保存游戏函数，将当前游戏状态保存到存档库的指定存档槽中
+def save_game(player_team, ai_team, player_gold, slot, turn=0):
+    try:
+        save_data = build_save_data(player_team, ai_team, player_gold)  # 生成存档快照
+        get_save_store().save_slot(slot, save_data, turn)  # 快照交给后台写入线程，在一个事务中写入元数据和内容，同名存档槽被覆盖
     except Exception as e:
         logging.error(f"Failed to save game: {e}")  # 如果保存失败，记录错误日志
 
-# 定义加载游戏函数，从文件中加载保存的游戏状态
-def load_game():
+# 根据旧格式（版本1）的存档数据重建单位，旧存档中只有名称、类型、位置和生命值
+def load_legacy_unit(unit_data):
+    unit = Unit(unit_data["name"], unit_data["type"], (0, 0))  # 缺少的属性由构造函数随机生成
+    unit.position = tuple(unit_data["position"])  # 存档中的位置已经偏移过，直接使用
+    unit.hp = unit_data["hp"]  # 恢复单位的生命值
+    return unit
+
+# 根据存档数据重建玩家队伍和AI队伍
+def teams_from_save_data(save_data):
+    if save_data["version"] >= 2:
+        player_team = Team.from_dicts(save_data["player_team"])
+        ai_team = Team.from_dicts(save_data["ai_team"])
+    else:
+        player_team = Team.from_units(load_legacy_unit(unit_data) for unit_data in save_data["player_team"])
+        ai_team = Team.from_units(load_legacy_unit(unit_data) for unit_data in save_data["ai_team"])
+    player_gold = save_data.get("player_gold", 100)  # 获取玩家的金币数量，默认为100
+    return player_team, ai_team, player_gold
+
+# 定义加载游戏函数，从存档库的指定存档槽中加载保存的游戏状态
+def load_game(slot):
     try:
-        # 从保存文件中读取数据
-        with open(SAVE_FILE, "r") as file:
-            save_data = json.load(file)
-            # 重建玩家队伍和AI队伍
-            player_team = [Unit(unit_data["name"], unit_data["type"], tuple(unit_data["position"])) for unit_data in save_data["player_team"]]
-            for unit, unit_data in zip(player_team, save_data["player_team"]):
-                unit.hp = unit_data["hp"]  # 恢复单位的生命值
-            ai_team = [Unit(unit_data["name"], unit_data["type"], tuple(unit_data["position"])) for unit_data in save_data["ai_team"]]
-            for unit, unit_data in zip(ai_team, save_data["ai_team"]):
-                unit.hp = unit_data["hp"]  # 恢复AI单位的生命值
-            player_gold = save_data.get("player_gold", 100)  # 获取玩家的金币数量，默认为100
-            return player_team, ai_team, player_gold  # 返回加载的队伍和金币
-    except FileNotFoundError:
-        logging.error("No save file found.")  # 如果没有找到保存文件，记录错误日志
-        return None, None, None  # 返回空值
+        save_data, turn = get_save_store().load_slot(slot)  # 按名称取出存档槽，自动存档会应用尚未合并的增量
+        player_team, ai_team, player_gold = teams_from_save_data(save_data)  # 重建玩家队伍和AI队伍
+        for unit in list(player_team) + list(ai_team):
+            logging.info(f"Loaded unit: Name={unit.name}, Type={unit.unit_type}.")  # 日志索引根据这一行确定单位的类型
+        return player_team, ai_team, player_gold, turn  # 返回加载的队伍、金币和回合数
+    except KeyError:
+        logging.error(f"No save slot named {slot}.")  # 如果没有找到存档槽，记录错误日志
+        return None, None, None, 0  # 返回空值
     except Exception as e:
         logging.error(f"Failed to load game: {e}")  # 如果加载失败，记录错误日志
-        return None, None, None  # 返回空值
+        return None, None, None, 0  # 返回空值
+
+# 计算金币文本在屏幕上的位置
+def get_gold_text_rect(player_gold):
+    gold_text = render_text(f"Gold: {player_gold}", (255, 215, 0))
+    return gold_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100))
+
+# 绘制玩家金币文本
+def draw_gold_text(surface, player_gold):
+    gold_text = render_text(f"Gold: {player_gold}", (255, 215, 0))
+    surface.blit(gold_text, get_gold_text_rect(player_gold))
+
+# 计算胜率提示文本在屏幕上的位置（金币文本下方）
+def get_odds_text_rect(odds):
+    odds_text = render_text(f"Win chance: {odds.win:.0%}", WHITE)
+    return odds_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 70))
+
+# 绘制胜率提示文本
+def draw_odds_text(surface, odds):
+    odds_text = render_text(f"Win chance: {odds.win:.0%}", WHITE)
+    surface.blit(odds_text, get_odds_text_rect(odds))
+
+# 绘制带居中文字的按钮
+def draw_button(surface, rect, color, text, text_color):
+    pygame.draw.rect(surface, color, rect)
+    button_text = render_text(text, text_color)
+    surface.blit(button_text, button_text.get_rect(center=(rect.centerx, rect.centery)))
 
 # 定义游戏主循环函数，控制游戏的主要逻辑
-def game_loop(player_team, ai_team, player_gold):
+def game_loop(player_team, ai_team, player_gold, seed=None, rng=random, turn=0):
+    # 队伍使用列式存储，单位的数值保存在NumPy数组中，队伍里的单位是兼容Unit的视图；传入普通的单位列表时先转换
+    if not isinstance(player_team, Team):
+        player_team = Team.from_units(player_team)
+    if not isinstance(ai_team, Team):
+        ai_team = Team.from_units(ai_team)
     current_turn = 'Player'  # 初始化当前回合为玩家
     selected_unit = None  # 初始化选中的单位为空
     running = True  # 控制游戏循环的标志位
     clock = pygame.time.Clock()  # 创建时钟对象，用于控制帧率
+    screen = get_screen()  # 获取屏幕对象（第一次使用时才创建窗口）
+    background_img = get_background_img()  # 获取战斗背景图片
     recruit_button = pygame.Rect(screen.get_width() // 2 - 75, screen.get_height() // 2 - 25, 150, 50)  # 定义复活单位按钮的位置和大小
     save_button = pygame.Rect((screen.get_width() // 2) - 70, 20, 140, 50)  # 定义保存按钮的位置和大小
+    animator = AnimationScheduler()  # 动画调度器，动画在主循环中逐帧推进，不会阻塞事件处理
+    dt = 0  # 上一帧经过的时间（毫秒）
+    opponent = None  # 搜索型AI，为None时AI随机行动
+    if AI_MODE == 'search':
+        opponent = get_opponent(AI_TIME_BUDGET_MS, AI_WORKERS, AI_MAX_DEPTH)
+        opponent.warm_up()  # 预先启动工作进程
+    recorder = None  # 对局录像，记录每一次操作
+    if RECORD_REPLAYS:
+        recorder = MatchRecorder(replay_path(REPLAY_DIR, seed), seed, player_team, ai_team, player_gold)
+    autosave = AutosaveJournal(get_save_store(), AUTOSAVE_SLOT, player_team, ai_team, player_gold, turn)  # 自动存档，每回合追加一行增量
+    save_slot = f"match-{seed}"  # 这局手动存档使用的存档槽，多次保存时覆盖
+    save_requested = False  # 点击了保存按钮、等待进行中的攻击结束
+    odds_hint = OddsHint(player_team, ai_team, ODDS_CHILDREN_PER_FRAME, ODDS_HINT_MAX_CHILDREN, ODDS_HINT_MAX_UNITS) if ODDS_HINT else None  # 胜率提示，每帧计算一小部分
 
-    while running:  # 游戏主循环
-        screen.blit(background_img, (0, 0))  # 绘制背景图像
-        gold_text = font.render(f"Gold: {player_gold}", True, (255, 215, 0))  # 绘制玩家金币文本
-        gold_text_rect = gold_text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 - 100))  # 设置金币文本的位置
-        screen.blit(gold_text, gold_text_rect)  # 将金币文本绘制到屏幕上
+    renderer = None  # 默认每帧完整重绘
+    if DIRTY_RECT_RENDERING:  # 脏矩形模式：预先合成背景和保存按钮，只重绘变化的区域
+        static_layer = background_img.copy()
+        draw_button(static_layer, save_button, (0, 128, 0), "Save", WHITE)
+        renderer = DirtyRectRenderer(screen, static_layer)
 
-        alive_player_team = [unit for unit in player_team if unit.hp > 0]  # 获取存活的玩家单位
-        alive_ai_team = [unit for unit in ai_team if unit.hp > 0]  # 获取存活的AI单位
-        dead_units = [unit for unit in player_team if unit.hp <= 0]  # 获取已死亡的玩家单位
+    # 存活和阵亡单位列表只在单位阵亡或复活时更新，不在每帧重建
+    alive_player_team = player_team.alive()  # 获取存活的玩家单位
+    alive_ai_team = ai_team.alive()  # 获取存活的AI单位
+    dead_units = player_team.dead()  # 获取已死亡的玩家单位
+    player_grid = SpatialGrid(player_team)  # 存活玩家单位的位置索引，用于点击拾取
+    ai_grid = SpatialGrid(ai_team)  # 存活AI单位的位置索引
 
+    while running:  # 游戏主循环
+        profiler.begin_frame()
+        sound_bank.new_frame()  # 每帧重置音效的播放限制
         # 根据条件设置复活按钮的颜色（如果玩家金币足够且有死亡单位）
         button_color = (255, 0, 0) if player_gold >= 150 and dead_units else (128, 128, 128)
-        pygame.draw.rect(screen, button_color, recruit_button)  #R绘制复活按钮
-        recruit_text = font.render("Recruit (150g)", True, BLACK)  # 生成招募按钮的文本
-        recruit_text_rect = recruit_text.get_rect(center=(recruit_button.centerx, recruit_button.centery))  # 设置复活按钮文本的位置
-        screen.blit(recruit_text, recruit_text_rect)  # 将复活按钮文本绘制到屏幕上
-
-        pygame.draw.rect(screen, (0, 128, 0), save_button)  # 绘制保存按钮
-        save_text = font.render("Save", True, WHITE)  # 生成保存按钮的文本
-        save_text_rect = save_text.get_rect(center=(save_button.centerx, save_button.centery))  # 设置保存按钮文本的位置
-        screen.blit(save_text, save_text_rect)  # 将保存按钮文本绘制到屏幕上
-
-        for event in pygame.event.get():  # 事件循环
-            if event.type == pygame.QUIT:  # 如果接收到退出事件
-                running = False  # 结束游戏循环
-                pygame.quit()  # 关闭pygame
-                sys.exit()  # 退出程序
-            elif event.type == pygame.MOUSEBUTTONDOWN:  # 如果检测到鼠标点击事件
-                mouse_pos = event.pos  # 获取鼠标点击的位置
-                if current_turn == 'Player':  # 如果当前是玩家的回合
-                    if selected_unit is None:  # 如果没有选中单位
-                        for unit in alive_player_team:  # 检查鼠标点击是否选中了玩家单位
-                            if (mouse_pos[0] - unit.position[0]) ** 2 + (
-                                    mouse_pos[1] - unit.position[1]) ** 2 <= 30 ** 2:
-                                selected_unit = unit  # 将该单位设为选中
-                                break
-                    else:  # 如果已有选中的单位
-                        for unit in alive_ai_team:  # 检查鼠标点击是否在AI单位范围内
-                            if (mouse_pos[0] - unit.position[0]) ** 2 + (
-                                    mouse_pos[1] - unit.position[1]) ** 2 <= 30 ** 2:
-                                attack_sound.play()  # 播放攻击音效
-                                attack_animation(selected_unit, unit, alive_player_team, alive_ai_team, background_img)  # 播放攻击动画
-                                pygame.time.delay(1)  # 延迟1毫秒
-                                selected_unit.attack(unit)  # 让选中的单位攻击目标单位
-                                if unit.hp <= 0:  # 如果AI单位被击败
-                                    player_gold += 50  # 玩家获得50金币奖励
-                                    alive_ai_team.remove(unit)  # 从AI队伍中移除该单位
-                                current_turn = 'AI'  # 切换回合至AI
+        odds = None  # 当前局面的胜率，尚未算出时为None
+        if odds_hint is not None:
+            with profiler.scope('odds'):
+                odds = odds_hint.update(PLAYER if current_turn == 'Player' else AI)
+
+        if renderer is None:
+            with profiler.scope('background'):
+                screen.blit(background_img, (0, 0))  # 绘制背景图像
+            with profiler.scope('hud'):
+                draw_gold_text(screen, player_gold)  # 绘制玩家金币文本
+                if odds is not None:
+                    draw_odds_text(screen, odds)  # 绘制胜率提示
+                draw_button(screen, recruit_button, button_color, "Recruit (150g)", BLACK)  # 绘制复活按钮
+                draw_button(screen, save_button, (0, 128, 0), "Save", WHITE)  # 绘制保存按钮
+        else:  # 脏矩形模式下，背景和保存按钮已在静态图层中，只登记会变化的项目
+            with profiler.scope('hud'):
+                renderer.set_item('gold', player_gold, partial(get_gold_text_rect, player_gold),
+                                  partial(draw_gold_text, player_gold=player_gold))
+                if odds is not None:
+                    label = f"{odds.win:.0%}"  # 显示的文字不变时不重绘
+                    renderer.set_item('odds', label, partial(get_odds_text_rect, odds), partial(draw_odds_text, odds=odds))
+                else:
+                    renderer.remove_item('odds')
+                renderer.set_item('recruit', button_color, recruit_button.copy,
+                                  partial(draw_button, rect=recruit_button, color=button_color,
+                                          text="Recruit (150g)", text_color=BLACK))
+
+        # 推进进行中的动画，攻击在动画结束时结算
+        with profiler.scope('animation'):
+            finished = animator.update(dt)
+            for animation in animator.animations + finished:  # 攻击者的位置发生了变化，更新位置索引
+                attacker = animation.attacker
+                (player_grid if attacker in player_grid else ai_grid).update(attacker)
+            for animation in finished:
+                attacker, target = animation.attacker, animation.target
+                damage = attacker.attack(target, rng)  # 攻击目标单位
+                if recorder is not None:
+                    recorder.record_attack(attacker, target, damage)  # 记录攻击
+                if attacker in player_grid:  # 玩家的攻击
+                    if target.hp <= 0:  # 如果AI单位被击败
+                        player_gold += 50  # 玩家获得50金币奖励
+                        alive_ai_team.remove(target)  # 从AI队伍中移除该单位
+                        ai_grid.remove(target)
+                    current_turn = 'AI'  # 切换回合至AI
+                else:  # AI的攻击
+                    if target.hp <= 0:  # 如果目标单位被击败
+                        alive_player_team.remove(target)  # 从玩家队伍中移除该单位
+                        player_grid.remove(target)
+                        dead_units = player_team.dead()  # 按队伍顺序更新阵亡单位列表
+                    current_turn = 'Player'  # 切换回合至玩家
+                turn += 1
+                autosave.record(turn, player_gold)  # 自动存档这一回合
+
+        with profiler.scope('events'):
+            for event in pygame.event.get():  # 事件循环
+                if event.type == pygame.QUIT:  # 如果接收到退出事件
+                    running = False  # 结束游戏循环
+                    pygame.quit()  # 关闭pygame
+                    sys.exit()  # 退出程序
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:  # 按F键切换动画快进
+                    animator.speed = 1 if animator.speed != 1 else FAST_FORWARD_SPEED
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:  # 按F3开关性能分析和浮层
+                    profiler.toggle()
+                    if renderer is not None and not profiler.enabled:
+                        renderer.remove_item('profiler')
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:  # 按F4导出Chrome trace文件
+                    count = profiler.export_chrome_trace(PROFILE_TRACE_FILE)
+                    logging.info("Exported %d trace events to %s.", count, PROFILE_TRACE_FILE)
+                elif event.type == pygame.MOUSEBUTTONDOWN:  # 如果检测到鼠标点击事件
+                    mouse_pos = event.pos  # 获取鼠标点击的位置
+                    if current_turn == 'Player' and not animator.busy():  # 如果当前是玩家的回合且没有进行中的攻击
+                        if selected_unit is None:  # 如果没有选中单位
+                            selected_unit = player_grid.pick(mouse_pos)  # 检查鼠标点击是否选中了玩家单位
+                        else:  # 如果已有选中的单位
+                            unit = ai_grid.pick(mouse_pos)  # 检查鼠标点击是否在AI单位范围内
+                            if unit is not None:
+                                sound_bank.play('attack')  # 播放攻击音效
+                                animator.start(AttackAnimation(selected_unit, unit))  # 开始攻击动画，结束时结算攻击
                                 selected_unit = None  # 重置选中的单位
-                                break
-                    if recruit_button.collidepoint(mouse_pos) and player_gold >= 150 and dead_units:  # 检查是否点击了复活按钮
-                        player_gold -= 150  # 扣除150金币
-                        revived_unit = dead_units.pop(0)  # 从死亡单位列表中取出一个单位
-                        revived_unit.hp = revived_unit.max_hp  # 恢复该单位的生命值
-                if save_button.collidepoint(mouse_pos):  # 检查是否点击了保存按钮
-                    save_game(player_team, ai_team, player_gold)  # 调用保存游戏函数
-
-        for unit in alive_player_team:  # 绘制存活的玩家单位
-            unit.draw(screen)
-        for unit in alive_ai_team:  # 绘制存活的AI单位
-            unit.draw(screen)
-
-        pygame.display.flip()  # 更新屏幕显示
-        clock.tick(60)  # 控制帧率为60帧每秒
-
-        if current_turn == 'AI' and alive_ai_team:  # 如果当前回合为AI且AI单位存活
-            attacker = random.choice(alive_ai_team)  # 随机选择一个AI单位作为攻击者
-            target = random.choice(alive_player_team)  # 随机选择一个玩家单位作为目标
-            attack_sound.play()  # 播放攻击音效
-            attack_animation(attacker, target, alive_player_team, alive_ai_team, background_img)  # 播放攻击动画
-            pygame.time.delay(1)  # 延迟1毫秒
-            attacker.attack(target)  # 攻击目标单位
-            if target.hp <= 0:  # 如果目标单位被击败
-                alive_player_team.remove(target)  # 从玩家队伍中移除该单位
-            current_turn = 'Player'  # 切换回合至玩家
+                        if recruit_button.collidepoint(mouse_pos) and player_gold >= 150 and dead_units:  # 检查是否点击了复活按钮
+                            player_gold -= 150  # 扣除150金币
+                            revived_unit = dead_units.pop(0)  # 从死亡单位列表中取出一个单位
+                            revived_unit.hp = revived_unit.max_hp  # 恢复该单位的生命值
+                            player_grid.update(revived_unit)  # 重新加入位置索引
+                            alive_player_team = player_team.alive()  # 按队伍顺序更新存活单位列表
+                            if recorder is not None:
+                                recorder.record_recruit(revived_unit, 150)  # 记录复活
+                            turn += 1
+                            autosave.record(turn, player_gold)
+                    if save_button.collidepoint(mouse_pos):  # 检查是否点击了保存按钮
+                        save_requested = True
+            if save_requested and not animator.busy():  # 攻击动画中攻击者不在原位、伤害尚未结算，等动画结束后再保存
+                save_game(player_team, ai_team, player_gold, save_slot, turn)  # 调用保存游戏函数
+                save_requested = False
+
+        if renderer is None:
+            with profiler.scope('units'):
+                player_team.draw(screen)  # 绘制存活的玩家单位（整列读取，一次提交全部绘制）
+                ai_team.draw(screen)  # 绘制存活的AI单位
+            if profiler.enabled:
+                profiler.draw_overlay(screen)  # 绘制性能浮层
+
+            with profiler.scope('flip'):
+                pygame.display.flip()  # 更新屏幕显示
+        else:
+            with profiler.scope('units'):
+                for team in (player_team, ai_team):  # 登记存活单位，移除阵亡单位
+                    for unit, state in team.unit_states():
+                        if state is not None:
+                            renderer.set_unit(unit, state)
+                        else:
+                            renderer.remove_unit(unit)
+            if profiler.enabled:
+                renderer.set_item('profiler', tuple(profiler.overlay_lines), profiler.get_overlay_rect,
+                                  profiler.draw_overlay)
+            with profiler.scope('flip'):
+                renderer.present()  # 只提交变化的区域
+        sound_bank.start_music()  # 第一帧显示之后才开始播放背景音乐（只执行一次）
+        with profiler.scope('idle'):
+            dt = clock.tick(FPS)  # 控制帧率为60帧每秒，并记录本帧经过的时间
+
+        with profiler.scope('ai'):
+            if current_turn == 'AI' and alive_ai_team and alive_player_team and not animator.busy():  # 如果当前回合为AI且没有进行中的攻击
+                attacker = target = None
+                if opponent is not None and len(alive_ai_team) * len(alive_player_team) <= MAX_ROOT_MOVES:  # 搜索型AI在进程池中思考，结果就绪前游戏循环照常运行
+                    if not opponent.busy():
+                        opponent.start_turn(player_team, ai_team)  # 开始搜索
+                    move = opponent.poll()  # 取搜索结果，尚未完成时为None
+                    if move is not None:
+                        attacker, target = ai_team[move[0]], player_team[move[1]]
+                else:
+                    attacker = rng.choice(alive_ai_team)  # 随机选择一个AI单位作为攻击者
+                    target = rng.choice(alive_player_team)  # 随机选择一个玩家单位作为目标
+                if attacker is not None:
+                    sound_bank.play('attack')  # 播放攻击音效
+                    animator.start(AttackAnimation(attacker, target))  # 开始攻击动画，结束时结算攻击
 
         if not alive_player_team or not alive_ai_team:  # 如果任意一方的队伍全灭
             running = False  # 结束游戏循环
+        profiler.end_frame()
+
+    if recorder is not None:
+        recorder.close()
+    autosave.finish()  # 对局正常结束，不再需要自动存档
 
     if alive_player_team:  # 如果玩家队伍仍有存活单位
         winner = "Player"  # 玩家获胜
     else:  # 否则
         winner = "AI"  # AI获胜
+    return winner, player_gold  # 返回胜者和玩家剩余的金币，结束界面由场景管理器显示
+
+
+# 场景管理器：用GameState驱动开始界面、设置、战斗和结束界面，场景之间迭代切换而不是递归调用
+# （game_loop不再在结束时自己调用game_setup和game_loop重新开局，每次重玩不会多一层栈帧）
+class SceneManager:
+    def __init__(self):
+        """
+        每个场景是一个方法，返回下一个状态（None表示退出）。一局结束后释放这局的队伍和随机数生成器；
+        图片、文字和音效等共享资源保存在各自的缓存中，切换场景和重新开局时不会重新加载。
+        """
+        self.state = GameState.START
+        self.scenes = {
+            GameState.START: self.start_scene,
+            GameState.SETUP: self.setup_scene,
+            GameState.BATTLE: self.battle_scene,
+            GameState.GAME_OVER: self.game_over_scene,
+            GameState.LOAD: self.load_scene,
+        }
+        self.player_gold = 100  # 玩家金币，重试时保留上一局剩余的金币
+        self.seed = self.rng = None  # 本局的种子和随机数生成器
+        self.player_team = self.ai_team = None
+        self.turn = 0  # 对局已进行的回合数，读档继续的对局从存档中的回合数开始
+        self.winner = None
+
+    def run(self):
+        while self.state is not None:
+            logging.info("Entering scene: %s.", self.state)
+            self.state = self.scenes[self.state]()
+
+    def start_scene(self):
+        choice = start_screen()  # 获取用户在开始界面上的选择（新游戏或加载游戏）
+        self.player_gold = 100  # 初始化玩家金币为100
+        if choice == "load_game":  # 如果用户选择加载游戏
+            return GameState.LOAD
+        return GameState.SETUP  # 新游戏
+
+    def load_scene(self):
+        slot = load_screen(get_save_store().list_slots(LOAD_SCREEN_ROWS))  # 列出最近的存档槽供玩家选择
+        if slot is None:  # 返回开始界面
+            return GameState.START
+        player_team, ai_team, player_gold, turn = load_game(slot)  # 尝试加载选中的存档
+        if player_team is None or ai_team is None:  # 加载失败时重新开始
+            return GameState.SETUP
+        self.player_team, self.ai_team, self.player_gold, self.turn = player_team, ai_team, player_gold, turn
+        return GameState.BATTLE
+
+    def setup_scene(self):
+        self.seed, self.rng = new_match_rng()  # 每局使用新的种子
+        self.player_team, self.ai_team = game_setup(self.rng)  # 创建玩家和AI的队伍
+        return GameState.BATTLE
+
+    def battle_scene(self):
+        if self.rng is None:  # 读档开始的对局
+            self.seed, self.rng = new_match_rng()
+        self.winner, self.player_gold = game_loop(self.player_team, self.ai_team, self.player_gold, self.seed,
+                                                  self.rng, self.turn)
+        # 释放这一局的状态，队伍中单位之间的引用环由垃圾回收立即清理，长时间连续对局时内存不会增长
+        self.player_team = self.ai_team = None
+        self.turn = 0
+        self.seed = self.rng = None
+        gc.collect()
+        return GameState.GAME_OVER
+
+    def game_over_scene(self):
+        result = game_over_screen(self.winner)  # 显示游戏结束界面并获取结果（选择退出时直接结束程序）
+        if result == "retry":  # 如果玩家选择重试
+            return GameState.SETUP  # 重新设置游戏
+        return None
+
 
-    result = game_over_screen(winner)  # 显示游戏结束界面并获取结果
-    if result == "retry":  # 如果玩家选择重试
-        player_team, ai_team = game_setup()  # 重新设置游戏
-        game_loop(player_team, ai_team, player_gold)  # 重新进入游戏循环
 def main():
+    setup_logging()  # 配置日志，日志在后台线程中写入
     logging.info("Game started.")  # 记录游戏启动的信息日志
-    choice = start_screen()  # 获取用户在开始界面上的选择（新游戏或加载游戏）
-
-    if choice == "load_game":  # 如果用户选择加载游戏
-        player_team, ai_team, player_gold = load_game()  # 尝试加载之前的游戏进度
-        if player_team is None or ai_team is None:  # 如果没有找到保存的进度或加载失败
-            player_team, ai_team = game_setup()  # 进入新的游戏设置
-            player_gold = 100  # 初始化玩家金币为100
-    else:  # 如果用户选择新游戏
-        player_team, ai_team = game_setup()  # 设置新的游戏，创建玩家和AI的队伍
-        player_gold = 100  # 初始化玩家金币为100
-
-    game_loop(player_team, ai_team, player_gold)  # 开始游戏循环，传入玩家队伍、AI队伍和玩家金币
+    SceneManager().run()  # 依次运行开始界面、设置、战斗和结束界面
+    if save_store is not None:
+        save_store.close()  # 关闭存档库
     pygame.quit()  # 退出pygame
     sys.exit()  # 退出程序
 
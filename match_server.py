@@ -0,0 +1,351 @@
+import argparse
+import asyncio
+import os
+import random
+import signal
+import struct
+import time
+from collections import OrderedDict
+
+from combat import UNIT_TYPES, Fighter
+
+# 无界面的对局服务器：在一个进程中用asyncio同时进行成千上万场对局，规则与game_loop一致
+# （玩家先手，双方轮流各攻击一次，一方全灭即结束；AI随机选择攻击者和目标；没有金币和复活）。
+# 客户端通过TCP或Unix套接字连接，一个连接上可以同时进行多场对局。
+#
+# 消息格式：2字节长度（网络字节序，不含长度本身）+ 消息体，消息体的第一个字节是消息类型。
+#   客户端 -> 服务器
+#     NEW_MATCH  tag:u32 count:u8 types:u8*count   开始新对局，types是玩家单位在UNIT_TYPES中的下标
+#     ATTACK     match:u32 attacker:u8 target:u8   玩家的一次攻击
+#     QUIT       match:u32                         放弃对局（没有回复）
+#   服务器 -> 客户端
+#     STARTED    tag:u32 match:u32 players:u8 ais:u8，之后每个单位(type:u8 atk:u8 defense:u8)，先玩家后AI
+#     TURN       match:u32 damage:u16 ai_attacker:u8 ai_target:u8 ai_damage:u16 status:u8
+#                玩家攻击造成的伤害和AI随后的反击（玩家获胜时AI不再行动，攻击者和目标为NO_UNIT）
+#     ERROR      request:u8 id:u32 code:u8         request是出错的请求类型，id是对局编号（NEW_MATCH为tag）
+# 对局超过idle_timeout秒没有收到攻击时结束，服务器主动发送request为0的ERROR_TIMEOUT。
+#
+# 背压：每次读取后处理缓冲区中所有完整的消息，回复合并为一次写入；发送缓冲区超过WRITE_HIGH_WATER时
+# 等待数据写出后再继续读取，因此不读取回复的客户端会被TCP流量控制限速，服务器的内存不会无限增长。
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+TEAM_SIZE = 3  # AI队伍的人数，与game_setup一致
+MAX_TEAM_SIZE = 16  # 玩家队伍的人数上限
+MAX_MATCHES = 100000  # 同时进行的对局数上限
+MATCH_IDLE_TIMEOUT = 30.0  # 对局无操作的超时时间（秒）
+SWEEP_INTERVAL = 1.0  # 检查超时对局的间隔（秒）
+READ_SIZE = 64 * 1024
+WRITE_HIGH_WATER = 256 * 1024  # 发送缓冲区的上限（字节）
+
+# 消息类型
+NEW_MATCH = 1
+ATTACK = 2
+QUIT = 3
+STARTED = 0x81
+TURN = 0x82
+ERROR = 0x83
+
+# 对局状态
+STATUS_ONGOING = 0
+STATUS_PLAYER_WON = 1
+STATUS_AI_WON = 2
+
+# 错误码
+ERROR_BAD_MESSAGE = 1
+ERROR_UNKNOWN_MATCH = 2
+ERROR_INVALID_MOVE = 3
+ERROR_SERVER_FULL = 4
+ERROR_TIMEOUT = 5
+ERROR_NAMES = {ERROR_BAD_MESSAGE: 'bad_message', ERROR_UNKNOWN_MATCH: 'unknown_match',
+               ERROR_INVALID_MOVE: 'invalid_move', ERROR_SERVER_FULL: 'server_full', ERROR_TIMEOUT: 'timeout'}
+
+NO_UNIT = 255
+
+LENGTH = struct.Struct('!H')
+NEW_MATCH_BODY = struct.Struct('!BIB')
+ATTACK_BODY = struct.Struct('!BIBB')
+QUIT_BODY = struct.Struct('!BI')
+STARTED_BODY = struct.Struct('!BIIBB')
+UNIT_BODY = struct.Struct('!BBB')
+TURN_BODY = struct.Struct('!BIHBBHB')
+ERROR_BODY = struct.Struct('!BBIB')
+
+
+def encode(body):
+    """
+    给消息体加上长度前缀。
+    """
+    return LENGTH.pack(len(body)) + body
+
+
+def split_frames(buffer):
+    """
+    从缓冲区开头取出所有完整的消息。
+    :return: (消息体列表, 已使用的字节数)，剩下的字节是不完整的消息
+    """
+    bodies = []
+    offset = 0
+    end = len(buffer)
+    while end - offset >= LENGTH.size:
+        (length,) = LENGTH.unpack_from(buffer, offset)
+        if end - offset - LENGTH.size < length:
+            break
+        offset += LENGTH.size
+        bodies.append(bytes(buffer[offset:offset + length]))
+        offset += length
+    return bodies, offset
+
+
+def error_frame(request, identifier, code):
+    return encode(ERROR_BODY.pack(ERROR, request, identifier, code))
+
+
+class Match:
+    __slots__ = ('match_id', 'connection', 'players', 'ais', 'rng', 'last_active')
+
+    def __init__(self, match_id, connection, player_types, rng):
+        """
+        一场对局。
+        :param player_types: 玩家单位的类型列表
+        :param rng: 本局的random.Random，决定双方属性、伤害和AI的选择
+        """
+        self.match_id = match_id
+        self.connection = connection
+        self.rng = rng
+        self.players = [Fighter(unit_type, rng) for unit_type in player_types]
+        self.ais = [Fighter(rng.choice(UNIT_TYPES), rng) for _ in range(TEAM_SIZE)]  # 与game_setup一样随机选择类型
+        self.last_active = 0.0
+
+    def describe(self):
+        """
+        返回STARTED消息中的单位部分。
+        """
+        return b''.join(UNIT_BODY.pack(UNIT_TYPES.index(unit.unit_type), unit.atk, unit.defense)
+                        for unit in self.players + self.ais)
+
+    def play_turn(self, attacker, target):
+        """
+        进行一个回合：玩家攻击，AI还有存活单位时随机反击。
+        :return: (玩家造成的伤害, AI攻击者下标, AI目标下标, AI造成的伤害, 对局状态)，攻击无效时返回None
+        """
+        if attacker >= len(self.players) or target >= len(self.ais):
+            return None
+        unit, enemy = self.players[attacker], self.ais[target]
+        if unit.hp <= 0 or enemy.hp <= 0:
+            return None
+        damage = unit.attack(enemy, self.rng)
+        alive_ais = [i for i, ai in enumerate(self.ais) if ai.hp > 0]
+        if not alive_ais:
+            return damage, NO_UNIT, NO_UNIT, 0, STATUS_PLAYER_WON
+        ai_attacker = self.rng.choice(alive_ais)
+        ai_target = self.rng.choice([i for i, player in enumerate(self.players) if player.hp > 0])
+        ai_damage = self.ais[ai_attacker].attack(self.players[ai_target], self.rng)
+        status = STATUS_ONGOING if any(player.hp > 0 for player in self.players) else STATUS_AI_WON
+        return damage, ai_attacker, ai_target, ai_damage, status
+
+
+class Connection:
+    __slots__ = ('writer', 'matches')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.matches = set()  # 这个连接上进行中的对局编号
+
+
+class MatchServer:
+    def __init__(self, max_matches=MAX_MATCHES, idle_timeout=MATCH_IDLE_TIMEOUT, seed=None):
+        """
+        :param max_matches: 同时进行的对局数上限，超过时拒绝新对局
+        :param idle_timeout: 对局无操作的超时时间（秒）
+        :param seed: 总种子，每场对局的随机数由总种子和对局编号决定
+        """
+        self.max_matches = max_matches
+        self.idle_timeout = idle_timeout
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.matches = OrderedDict()  # 对局编号 -> Match，按最近一次操作的时间排序，超时检查只需看开头
+        self.next_id = 1
+        self.stats = {"connections": 0, "started": 0, "finished": 0, "timed_out": 0, "abandoned": 0, "moves": 0,
+                      "errors": 0}
+
+    def start_match(self, connection, body, now):
+        if len(body) < NEW_MATCH_BODY.size:
+            return error_frame(NEW_MATCH, 0, ERROR_BAD_MESSAGE)
+        _, tag, count = NEW_MATCH_BODY.unpack_from(body)
+        types = body[NEW_MATCH_BODY.size:]
+        if not 0 < count <= MAX_TEAM_SIZE or len(types) != count or max(types) >= len(UNIT_TYPES):
+            return error_frame(NEW_MATCH, tag, ERROR_BAD_MESSAGE)
+        if len(self.matches) >= self.max_matches:
+            return error_frame(NEW_MATCH, tag, ERROR_SERVER_FULL)
+        match_id = self.next_id
+        self.next_id = (self.next_id + 1) & 0xFFFFFFFF or 1
+        match = Match(match_id, connection, [UNIT_TYPES[index] for index in types],
+                      random.Random(self.seed * 0x100000000 + match_id))
+        match.last_active = now
+        self.matches[match_id] = match
+        connection.matches.add(match_id)
+        self.stats["started"] += 1
+        return encode(STARTED_BODY.pack(STARTED, tag, match_id, len(match.players), len(match.ais)) +
+                      match.describe())
+
+    def attack(self, connection, body, now):
+        if len(body) != ATTACK_BODY.size:
+            return error_frame(ATTACK, 0, ERROR_BAD_MESSAGE)
+        _, match_id, attacker, target = ATTACK_BODY.unpack(body)
+        match = self.matches.get(match_id)
+        if match is None or match.connection is not connection:
+            return error_frame(ATTACK, match_id, ERROR_UNKNOWN_MATCH)
+        result = match.play_turn(attacker, target)
+        if result is None:
+            return error_frame(ATTACK, match_id, ERROR_INVALID_MOVE)
+        self.stats["moves"] += 1
+        if result[-1] == STATUS_ONGOING:
+            match.last_active = now
+            self.matches.move_to_end(match_id)
+        else:
+            self.end_match(match)
+            self.stats["finished"] += 1
+        return encode(TURN_BODY.pack(TURN, match_id, *result))
+
+    def end_match(self, match):
+        del self.matches[match.match_id]
+        match.connection.matches.discard(match.match_id)
+
+    def handle_message(self, connection, body, now):
+        """
+        处理一条消息，返回要发送的回复（可能为空）。
+        """
+        kind = body[0] if body else 0
+        if kind == ATTACK:
+            reply = self.attack(connection, body, now)
+        elif kind == NEW_MATCH:
+            reply = self.start_match(connection, body, now)
+        elif kind == QUIT and len(body) == QUIT_BODY.size:
+            match = self.matches.get(QUIT_BODY.unpack(body)[1])
+            if match is not None and match.connection is connection:
+                self.end_match(match)
+                self.stats["abandoned"] += 1
+            return b''
+        else:
+            reply = error_frame(kind, 0, ERROR_BAD_MESSAGE)
+        if reply[2] == ERROR:
+            self.stats["errors"] += 1
+        return reply
+
+    async def handle_connection(self, reader, writer):
+        connection = Connection(writer)
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        self.stats["connections"] += 1
+        loop = asyncio.get_running_loop()
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                bodies, used = split_frames(buffer)
+                del buffer[:used]
+                now = loop.time()
+                writer.write(b''.join([self.handle_message(connection, body, now) for body in bodies]))
+                await writer.drain()  # 发送缓冲区超过上限时在这里等待，暂停读取这个连接
+        except ConnectionError:
+            pass
+        finally:
+            for match_id in list(connection.matches):  # 断开连接的对局视为放弃
+                self.end_match(self.matches[match_id])
+                self.stats["abandoned"] += 1
+            self.stats["connections"] -= 1
+            writer.close()
+
+    async def expire_matches(self):
+        """
+        定期结束超时的对局。对局按最近一次操作的时间排序，只需从开头检查到第一场未超时的对局。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            deadline = loop.time() - self.idle_timeout
+            while self.matches:
+                match = next(iter(self.matches.values()))
+                if match.last_active > deadline:
+                    break
+                self.end_match(match)
+                self.stats["timed_out"] += 1
+                writer = match.connection.writer
+                if not writer.is_closing():
+                    writer.write(error_frame(0, match.match_id, ERROR_TIMEOUT))
+
+    async def report(self, interval):
+        """
+        每隔interval秒打印一次服务器状态。
+        """
+        last_moves, last_time = self.stats["moves"], time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            moves = self.stats["moves"]
+            print(f"active {len(self.matches)}  {(moves - last_moves) / (now - last_time):.0f} moves/s  "
+                  + "  ".join(f"{name} {value}" for name, value in self.stats.items()), flush=True)
+            last_moves, last_time = moves, now
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, stats_interval=0):
+        """
+        开始监听并一直运行。
+        :param unix_path: 不为None时监听这个Unix套接字，否则监听host:port
+        :param stats_interval: 打印状态的间隔（秒），0表示不打印
+        """
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path, backlog=1024)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        tasks = [asyncio.create_task(self.expire_matches())]
+        if stats_interval:
+            tasks.append(asyncio.create_task(self.report(stats_interval)))
+        stop = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal_number, stop.set)
+            except (NotImplementedError, RuntimeError):  # Windows不支持，按Ctrl+C时照常抛出KeyboardInterrupt
+                pass
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def add_address_arguments(parser):
+    """
+    服务器和负载生成器共用的地址参数。
+    """
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', default=None, help="use this Unix socket instead of TCP")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless asyncio server hosting many concurrent matches.")
+    add_address_arguments(parser)
+    parser.add_argument('--max-matches', type=int, default=MAX_MATCHES, help="concurrent match limit")
+    parser.add_argument('--idle-timeout', type=float, default=MATCH_IDLE_TIMEOUT,
+                        help="end matches idle for this many seconds")
+    parser.add_argument('--seed', type=int, default=None, help="server seed (per-match RNGs derive from it)")
+    parser.add_argument('--stats-interval', type=float, default=5.0, help="print stats every N seconds (0: never)")
+    args = parser.parse_args()
+
+    server = MatchServer(args.max_matches, args.idle_timeout, args.seed)
+    address = args.unix or f"{args.host}:{args.port}"
+    print(f"Serving matches on {address} (seed {server.seed})", flush=True)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+    print("Stopped: " + "  ".join(f"{name} {value}" for name, value in server.stats.items()))
+
+
+if __name__ == "__main__":
+    main()
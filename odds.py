@@ -0,0 +1,388 @@
+import argparse
+import time
+from collections import OrderedDict, namedtuple
+
+from combat import BASE_HP, DAMAGE_VARIANCE, UNIT_STATS
+
+# 精确胜率计算：game_loop中双方都随机行动时（AI的策略；玩家一方也按随机策略计算），
+# 对局是以双方单位生命值为状态的马尔可夫链。每回合行动方等概率选择一个存活的攻击者和一个存活的目标，
+# 伤害为max(0, 攻击力 - 防御力 + 随机浮动)，随机浮动在DAMAGE_VARIANCE中均匀分布。
+# 用记忆化的动态规划求出每个局面下玩家最终获胜的概率和对局还要进行的期望攻击次数。
+#
+# 与ai.py相同，等级和经验值不影响攻击力和防御力，所以局面只由双方单位的生命值决定：
+#   - 生命值<=0统一记为0，不同的击杀伤害合并为同一局面；
+#   - 攻击力和防御力相同的单位可以互换，它们的生命值按从大到小排列，对称的局面只计算一次。
+# 状态是(局面, 行动方)。伤害可能为0时，攻击后局面不变、只交换行动方，同一局面的两种行动方互相依赖，
+# 一起求解（一个二元一次方程组）；其余的后继局面生命值总和更小，先计算。
+# 双方都无法造成伤害的局面（所有存活单位的攻击力加上最大浮动都不超过对方的防御力）是僵局，
+# 对局永远不会结束：玩家获胜的概率为0，期望攻击次数为无穷大。
+#
+# 状态数随生命值的乘积增长：满血的1v1有几千到几万个状态，2v2以上的满血对局有上千万个状态，
+# 因此求解有预算（访问的后继局面数），超出时solve()抛出OddsBudgetExceeded，Solver则保留进度、下次继续。
+# 已经算出的局面保存在阵容的表中，阵容（双方单位的攻击力和防御力）的表按LRU保留，
+# 同一阵容的后续查询（如对局中每回合的胜率提示）只需计算新增的局面，重复查询直接命中。
+
+PLAYER = 0
+AI = 1
+CACHE_BOARDS = 64  # LRU中保留的阵容数量
+TABLE_LIMIT = 1_000_000  # 一个阵容的表超过这么多局面时清空（每个局面约300字节），限制长时间对局中的内存占用
+HP_BITS = 8  # 局面编码中每个单位的生命值所占的位数
+HP_MASK = (1 << HP_BITS) - 1
+
+Odds = namedtuple('Odds', ['win', 'turns'])  # 玩家获胜的概率，对局还要进行的期望攻击次数
+STALEMATE = (0.0, float('inf'))  # 僵局的(玩家获胜的概率, 期望攻击次数)
+
+
+class OddsBudgetExceeded(Exception):
+    pass
+
+
+def damage_counts(atk, defense):
+    """
+    一次攻击的伤害分布：{伤害: 出现次数}，每种随机浮动出现一次，被截断为0的伤害已合并。
+    """
+    low, high = DAMAGE_VARIANCE
+    counts = {}
+    for variance in range(low, high + 1):
+        damage = max(0, atk - defense + variance)
+        counts[damage] = counts.get(damage, 0) + 1
+    return counts
+
+
+class Board:
+    def __init__(self, player_stats, ai_stats):
+        """
+        一个阵容的局面表。局面编码为一个整数，每个单位的生命值占HP_BITS位（先玩家后AI），
+        攻击后的后继局面只需减去一个预先算好的差值。
+        :param player_stats: 玩家单位的(攻击力, 防御力)元组
+        :param ai_stats: AI单位的(攻击力, 防御力)元组
+        """
+        self.stats = (player_stats, ai_stats)
+        self.player_count = len(player_stats)
+        self.shifts = [i * HP_BITS for i in range(len(player_stats) + len(ai_stats))]
+        self.table = {}  # 局面编码 << 1 | 行动方 -> (玩家获胜的概率, 期望攻击次数)
+        self.cache = {}  # (行动方, 存活攻击者的下标, 目标下标, 目标生命值) -> transitions()的结果
+        # 攻击力和防御力相同的单位的下标组（在整个生命值元组中的下标）
+        groups = {}
+        for side, offset in ((PLAYER, 0), (AI, self.player_count)):
+            for i, unit_stats in enumerate(self.stats[side]):
+                groups.setdefault((side, unit_stats), []).append(offset + i)
+        self.symmetric = [group for group in groups.values() if len(group) > 1]
+
+    def encode(self, hp):
+        """
+        局面的规范编码：生命值<=0记为0，可互换的单位按生命值从大到小排列。
+        """
+        hp = [max(0, value) for value in hp]
+        for group in self.symmetric:
+            for index, value in zip(group, sorted((hp[i] for i in group), reverse=True)):
+                hp[index] = value
+        return sum(value << shift for value, shift in zip(hp, self.shifts))
+
+    def decode(self, state):
+        return [(state >> shift) & HP_MASK for shift in self.shifts]
+
+    def transitions(self, side, attackers, target, current):
+        """
+        从attackers中等概率选出攻击者攻击生命值为current的target后的结果。
+        :return: (伤害为0的概率, [(局面编码的减少量, 概率, 目标是否阵亡)])，被截断为0的生命值已合并
+        """
+        key = (side, attackers, target, current)
+        result = self.cache.get(key)
+        if result is None:
+            low, high = DAMAGE_VARIANCE
+            total = len(attackers) * (high - low + 1)
+            defense = self.stats[1 - side][target][1]
+            shift = self.shifts[target + (self.player_count if side == PLAYER else 0)]
+            stay = 0
+            counts = {}
+            for attacker in attackers:
+                for damage, count in damage_counts(self.stats[side][attacker][0], defense).items():
+                    if damage == 0:
+                        stay += count
+                    else:
+                        new_hp = max(0, current - damage)
+                        counts[new_hp] = counts.get(new_hp, 0) + count
+            result = self.cache[key] = (stay / total, [((current - new_hp) << shift, count / total, new_hp == 0)
+                                                       for new_hp, count in counts.items()])
+        return result
+
+    def outcomes(self, state, hp, side):
+        """
+        行动方攻击一次后的局面分布。
+        :param state: 局面编码
+        :param hp: 解码后的生命值列表
+        :return: (伤害为0的概率, [(后继局面, 概率, 对方是否全灭)])
+        """
+        count = self.player_count
+        if side == PLAYER:
+            own, enemies, offset = hp[:count], hp[count:], count
+        else:
+            own, enemies, offset = hp[count:], hp[:count], 0
+        attackers = tuple(i for i, value in enumerate(own) if value > 0)
+        targets = [i for i, value in enumerate(enemies) if value > 0]
+        weight = 1 / len(targets)
+        last = len(targets) == 1  # 只剩一个敌人时，它阵亡即对方全灭
+        stay = 0.0
+        children = []
+        for target in targets:
+            target_stay, results = self.transitions(side, attackers, target, enemies[target])
+            stay += target_stay * weight
+            children.extend((state - delta, probability * weight, last and killed)
+                            for delta, probability, killed in results)
+        if self.symmetric:  # 可互换的单位换成规范形式后，不同的后继可能是同一个局面，合并它们
+            merged = {}
+            for child, probability, terminal in children:
+                child = self.encode(self.decode(child))
+                previous = merged.get(child)
+                merged[child] = (probability + (previous[0] if previous else 0.0), terminal)
+            children = [(child, probability, terminal) for child, (probability, terminal) in merged.items()]
+        return stay, children
+
+    def solve(self, hp, side, max_children=None):
+        """
+        计算局面的胜率和期望攻击次数。
+        :param hp: 双方单位的生命值（先玩家后AI），双方都至少有一个存活单位
+        :param side: 行动方
+        :param max_children: 最多访问的后继局面数，None表示不限，超出时抛出OddsBudgetExceeded
+        :return: (玩家获胜的概率, 期望攻击次数)
+        """
+        result = Solver(self, hp, side).run(max_children)
+        if result is None:
+            raise OddsBudgetExceeded(f"more than {max_children} child states")
+        return result
+
+
+class Solver:
+    def __init__(self, board, hp, side):
+        """
+        一个局面的求解过程（不使用递归，局面很深时也不会超过递归深度限制）。
+        待处理的局面栈和已展开的局面保存在对象中，run()用完预算后返回，下次调用从中断处继续。
+        :param board: 阵容的局面表
+        :param hp: 双方单位的生命值（先玩家后AI），双方都至少有一个存活单位
+        :param side: 行动方
+        """
+        self.board = board
+        if len(board.table) > TABLE_LIMIT:
+            board.table.clear()
+        self.root = board.encode(hp) << 1 | side
+        self.stack = [self.root]
+        self.pending = {}  # 等待后继局面的局面 -> 展开的结果，避免重复展开
+        self.visited = 0  # 累计访问的后继局面数
+
+    def run(self, max_children=None):
+        """
+        继续求解。一次展开要对每个攻击者和目标计算伤害分布，开销与后继局面的数量成正比，
+        因此预算按访问的后继局面数（展开时生成的和汇总时读取的）计算，而不是按局面数。
+        :param max_children: 本次最多访问的后继局面数，None表示不限
+        :return: (玩家获胜的概率, 期望攻击次数)，预算用完时返回None
+        """
+        board = self.board
+        table = board.table
+        stack = self.stack
+        pending = self.pending
+        visited = 0
+        while stack:
+            if max_children is not None and visited >= max_children:
+                self.visited += visited
+                return None
+            key = stack[-1]
+            if key in table:
+                stack.pop()
+                continue
+            moves = pending.get(key)
+            if moves is None:
+                state, mover = key >> 1, key & 1
+                decoded = board.decode(state)
+                moves = [(mover, *board.outcomes(state, decoded, mover))]
+                if moves[0][1] > 0 and key ^ 1 not in table:  # 伤害可能为0：局面不变、轮到对方，两种行动方一起求解
+                    moves.append((1 - mover, *board.outcomes(state, decoded, 1 - mover)))
+                pending[key] = moves
+                visited += sum(len(children) for _, _, children in moves)
+            # 每种行动方：伤害不为0的部分的胜率a和期望攻击次数b；有后继局面尚未计算时先计算它们
+            missing = []
+            sums = []
+            for mover, stay, children in moves:
+                visited += len(children)
+                a = b = 0.0
+                for child, probability, terminal in children:
+                    if terminal:  # 对方全灭：玩家行动时玩家获胜，AI行动时玩家失败
+                        if mover == PLAYER:
+                            a += probability
+                        continue
+                    child_key = child << 1 | (1 - mover)
+                    entry = table.get(child_key)
+                    if entry is None:
+                        missing.append(child_key)
+                    elif not missing:
+                        a += probability * entry[0]
+                        b += probability * entry[1]
+                sums.append((stay, a, b + 1))
+            if missing:
+                stack.extend(missing)
+                continue
+            stay, a, b = sums[0]
+            if len(sums) == 1:
+                if stay > 0:  # 对方行动的同一局面已经算出
+                    other = table.get(key ^ 1)
+                    if other is None:  # 求解中断期间局面表被清空过，重新展开（两种行动方一起求解）
+                        del pending[key]
+                        continue
+                    a += stay * other[0]
+                    b += stay * other[1]
+                table[key] = (a, b)
+            elif not moves[0][2] and not moves[1][2]:  # 双方都无法造成伤害：僵局，方程组无解
+                table[key] = table[key ^ 1] = STALEMATE
+            else:  # 二元一次方程组：x = a + stay * y，y = a_other + stay_other * x
+                stay_other, a_other, b_other = sums[1]
+                denominator = 1 - stay * stay_other
+                win = (a + stay * a_other) / denominator
+                turns = (b + stay * b_other) / denominator
+                table[key] = (win, turns)
+                table[key ^ 1] = (a_other + stay_other * win, b_other + stay_other * turns)
+            stack.pop()
+            del pending[key]
+        self.visited += visited
+        return table[self.root]
+
+
+_boards = OrderedDict()
+
+
+def get_board(player_stats, ai_stats):
+    """
+    返回阵容的局面表，按LRU保留最近使用的CACHE_BOARDS个阵容。
+    """
+    key = (tuple(player_stats), tuple(ai_stats))
+    board = _boards.get(key)
+    if board is None:
+        board = _boards[key] = Board(*key)
+        if len(_boards) > CACHE_BOARDS:
+            _boards.popitem(last=False)
+    else:
+        _boards.move_to_end(key)
+    return board
+
+
+def board_for(player_team, ai_team):
+    return get_board(((unit.atk, unit.defense) for unit in player_team),
+                     ((unit.atk, unit.defense) for unit in ai_team))
+
+
+def win_odds(player_team, ai_team, side=PLAYER, max_children=None):
+    """
+    计算当前局面下玩家获胜的精确概率和期望的剩余攻击次数（双方都随机行动）。
+    :param player_team: 玩家单位列表（包含阵亡单位），单位需要有atk、defense和hp属性
+    :param ai_team: AI单位列表
+    :param side: 行动方，PLAYER或AI
+    :param max_children: 最多访问的后继局面数，超出时抛出OddsBudgetExceeded（已算出的局面保留在表中）
+    :return: Odds
+    """
+    hp = tuple(unit.hp for unit in player_team) + tuple(unit.hp for unit in ai_team)
+    if all(value <= 0 for value in hp[:len(player_team)]):
+        return Odds(0.0, 0.0)
+    if all(value <= 0 for value in hp[len(player_team):]):
+        return Odds(1.0, 0.0)
+    return Odds(*board_for(player_team, ai_team).solve(hp, side, max_children))
+
+
+class OddsHint:
+    def __init__(self, player_team, ai_team, children_per_frame, max_children, max_units):
+        """
+        对局中的胜率提示。每帧最多访问children_per_frame个后继局面，求解进度保留到下一帧继续，不会让一帧变长；
+        同一局面累计超过max_children个仍未算完时放弃，直到局面变化（下一次攻击或复活）后再试。
+        状态数和每次展开的开销都随单位数迅速增长，任何一方存活单位超过max_units个时不计算。
+        :param player_team: 玩家队伍（Team）
+        :param ai_team: AI队伍（Team）
+        """
+        self.player_team = player_team
+        self.ai_team = ai_team
+        self.children_per_frame = children_per_frame
+        self.max_children = max_children
+        self.max_units = max_units
+        self.key = None  # 当前局面的(生命值, 行动方)
+        self.odds = None
+        self.solver = None  # 当前局面未完成的求解
+
+    def update(self, side):
+        """
+        推进当前局面的计算。
+        :param side: 行动方，PLAYER或AI
+        :return: 当前局面的Odds，尚未算出、已放弃或单位太多时返回None
+        """
+        player_hp, ai_hp = self.player_team.hp, self.ai_team.hp
+        key = (player_hp.tobytes(), ai_hp.tobytes(), side)
+        if key == self.key:
+            if self.solver is not None:
+                self.advance()
+            return self.odds
+        self.key, self.odds, self.solver = key, None, None
+        player_alive, ai_alive = int((player_hp > 0).sum()), int((ai_hp > 0).sum())
+        if not player_alive or not ai_alive:
+            self.odds = Odds(float(ai_alive == 0), 0.0)
+        elif player_alive <= self.max_units and ai_alive <= self.max_units:
+            hp = tuple(player_hp.tolist()) + tuple(ai_hp.tolist())
+            self.solver = Solver(board_for(self.player_team, self.ai_team), hp, side)
+            self.advance()
+        return self.odds
+
+    def advance(self):
+        solver = self.solver
+        result = solver.run(min(self.children_per_frame, self.max_children - solver.visited))
+        if result is not None:
+            self.odds, self.solver = Odds(*result), None
+        elif solver.visited >= self.max_children:
+            self.solver = None
+
+
+UnitSpec = namedtuple('UnitSpec', ['atk', 'defense', 'hp'])
+
+
+def parse_unit(spec):
+    """
+    解析单位：攻击力/防御力[/生命值]，如35/5或35/5/60。
+    """
+    try:
+        values = [int(value) for value in spec.split('/')]
+    except ValueError:
+        values = []
+    if len(values) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"Expected atk/defense[/hp], got {spec}")
+    unit = UnitSpec(values[0], values[1], values[2] if len(values) == 3 else BASE_HP)
+    if not 0 < unit.hp <= HP_MASK:
+        raise argparse.ArgumentTypeError(f"hp must be between 1 and {HP_MASK}, got {unit.hp}")
+    return unit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact win probability and expected length of a board when both "
+                                                 "sides attack at random.")
+    parser.add_argument('--player', nargs='+', type=parse_unit, required=True, help="player units, atk/defense[/hp]")
+    parser.add_argument('--ai', nargs='+', type=parse_unit, required=True, help="AI units, atk/defense[/hp]")
+    parser.add_argument('--ai-first', action='store_true', help="the AI attacks next")
+    parser.add_argument('--max-children', type=int, default=50_000_000,
+                        help="give up after visiting this many child states")
+    args = parser.parse_args()
+
+    for unit in args.player + args.ai:
+        for stat, value in (('atk', unit.atk), ('defense', unit.defense)):
+            if not any(low <= value <= high for low, high in (ranges[stat] for ranges in UNIT_STATS.values())):
+                print(f"note: {stat} {value} is outside every unit type's range")
+
+    start = time.perf_counter()
+    try:
+        odds = win_odds(args.player, args.ai, AI if args.ai_first else PLAYER, args.max_children)
+    except OddsBudgetExceeded as e:
+        parser.exit(1, f"Board too large for an exact answer ({e}); lower some hp or use simulator.py.\n")
+    elapsed = time.perf_counter() - start
+    board = board_for(args.player, args.ai)
+    print(f"Player win probability: {odds.win:.6f}")
+    if odds.turns == float('inf'):
+        print("Stalemate: neither side can deal damage, the match never ends")
+    else:
+        print(f"Expected attacks until the end: {odds.turns:.3f}")
+    print(f"{len(board.table)} states in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pygame
+
+from settings import WHITE, PROFILE_ENABLED, PROFILE_WINDOW, PROFILE_MAX_TRACE_EVENTS
+from stats import percentile
+from text_cache import render_text
+
+# 逐帧性能分析：用带名字的计时区间包住game_loop的各个阶段（事件处理、背景、HUD、单位绘制、AI回合等），
+# 统计最近PROFILE_WINDOW帧中每个阶段耗时的p50和p99，可以显示在屏幕左上角的浮层中，
+# 也可以把每个区间导出为Chrome trace事件（在chrome://tracing或Perfetto中打开）。
+# 关闭时scope()返回一个什么都不做的共享对象，每个区间的开销只有一次方法调用。
+
+OVERLAY_REFRESH_FRAMES = 30  # 浮层每隔多少帧刷新一次数字
+OVERLAY_POSITION = (10, 10)
+OVERLAY_LINE_HEIGHT = 22
+
+
+class NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, enabled=PROFILE_ENABLED, window=PROFILE_WINDOW, max_trace_events=PROFILE_MAX_TRACE_EVENTS):
+        """
+        初始化分析器。
+        :param enabled: 是否开启计时
+        :param window: 统计百分位数时使用最近多少帧
+        :param max_trace_events: 保留的trace事件数量上限，超过后丢弃最早的事件
+        """
+        self.enabled = enabled
+        self.window = window
+        self.phases = {}  # 阶段名称 -> 最近window帧中每帧的耗时（毫秒）
+        self.current = {}  # 当前帧中各阶段累计的耗时（纳秒）
+        self.trace_events = deque(maxlen=max_trace_events)
+        self.origin = time.perf_counter_ns()
+        self.frame_start = None
+        self.frame_count = 0
+        self.overlay_lines = []  # 浮层上显示的文字，每隔OVERLAY_REFRESH_FRAMES帧更新
+        self.panel = None  # 浮层的半透明底板，大小不变时重复使用
+        self.thread_id = threading.get_ident()
+
+    def toggle(self):
+        """
+        开启或关闭计时；重新开启时清空之前的统计。
+        """
+        self.enabled = not self.enabled
+        self.phases.clear()
+        self.current.clear()
+        self.frame_start = None
+        self.overlay_lines = []
+
+    def scope(self, name):
+        """
+        返回包住一个阶段的计时区间，用法为 with profiler.scope('units'): ...
+        同一帧中同名的区间耗时累加。
+        """
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def record(self, name, start, end):
+        self.current[name] = self.current.get(name, 0) + end - start
+        self.trace_events.append((name, start, end))
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        """
+        结束一帧：把本帧各阶段的耗时加入统计窗口。
+        """
+        if not self.enabled or self.frame_start is None:
+            return
+        self.record('frame', self.frame_start, time.perf_counter_ns())
+        for name, duration in self.current.items():
+            samples = self.phases.get(name)
+            if samples is None:
+                samples = self.phases[name] = deque(maxlen=self.window)
+            samples.append(duration / 1e6)
+        self.current.clear()
+        self.frame_start = None
+        self.frame_count += 1
+        if self.frame_count % OVERLAY_REFRESH_FRAMES == 0 or not self.overlay_lines:
+            self.overlay_lines = [f"{name:10s} p50 {p50:6.2f}  p99 {p99:6.2f} ms" for name, p50, p99 in self.summary()]
+
+    def summary(self):
+        """
+        返回每个阶段在统计窗口内的(名称, p50, p99)，单位为毫秒，frame排在最前。
+        """
+        rows = []
+        for name, samples in self.phases.items():
+            ordered = sorted(samples)
+            rows.append((name, percentile(ordered, 50), percentile(ordered, 99)))
+        rows.sort(key=lambda row: (row[0] != 'frame', row[0]))
+        return rows
+
+    def get_overlay_rect(self):
+        x, y = OVERLAY_POSITION
+        return pygame.Rect(x, y, 360, OVERLAY_LINE_HEIGHT * max(1, len(self.overlay_lines)) + 8)
+
+    def draw_overlay(self, surface):
+        """
+        在屏幕左上角绘制半透明的性能浮层。
+        :param surface: 要绘制到的表面
+        """
+        rect = self.get_overlay_rect()
+        if self.panel is None or self.panel.get_size() != rect.size:
+            self.panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+            self.panel.fill((0, 0, 0, 160))
+        surface.blit(self.panel, rect.topleft)
+        for i, line in enumerate(self.overlay_lines or ["profiling..."]):
+            surface.blit(render_text(line, WHITE), (rect.x + 6, rect.y + 4 + i * OVERLAY_LINE_HEIGHT))
+
+    def export_chrome_trace(self, path):
+        """
+        把记录的计时区间导出为Chrome trace事件格式的JSON文件。
+        :param path: 输出文件路径
+        :return: 导出的事件数量
+        """
+        pid = os.getpid()
+        events = [{"name": name, "cat": "frame" if name == 'frame' else "phase", "ph": "X", "pid": pid,
+                   "tid": self.thread_id, "ts": (start - self.origin) / 1000, "dur": (end - start) / 1000}
+                  for name, start, end in list(self.trace_events)]
+        with open(path, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        return len(events)
+
+
+profiler = FrameProfiler()  # 游戏使用的全局分析器
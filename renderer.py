@@ -0,0 +1,112 @@
+import pygame
+
+# 脏矩形渲染：静态图层（背景、按钮、固定文字）预先合成到一张表面上，
+# 只重绘发生变化的区域，并用pygame.display.update(rects)只提交这些区域。
+
+
+class DirtyRectRenderer:
+    def __init__(self, screen, static_layer):
+        """
+        初始化渲染器。
+        :param screen: Pygame屏幕对象
+        :param static_layer: 预先合成好的静态图层，大小与屏幕相同
+        """
+        self.screen = screen
+        self.static_layer = static_layer
+        self.items = {}  # 项目ID -> (状态, 区域, 绘制函数)，按加入顺序绘制
+        self.dirty_rects = []
+        self.full_redraw = True  # 第一帧需要完整绘制
+
+    def invalidate(self):
+        """
+        标记整个屏幕需要重绘，例如从其他界面切换回来时。
+        """
+        self.full_redraw = True
+
+    def set_item(self, item_id, state, get_rect, draw):
+        """
+        添加或更新一个动态项目，状态或区域变化时将新旧区域标记为脏。
+        :param item_id: 项目的唯一标识
+        :param state: 项目的状态，状态不变时不会重绘
+        :param get_rect: 返回项目所占区域的函数，只在状态变化时调用
+        :param draw: 绘制项目的函数，参数为屏幕对象
+        """
+        previous = self.items.get(item_id)
+        if previous is not None and previous[0] == state:
+            return
+        rect = pygame.Rect(get_rect())
+        if previous is not None:
+            self.dirty_rects.append(previous[1])
+        self.dirty_rects.append(rect)
+        self.items[item_id] = (state, rect, draw)
+
+    def set_unit(self, unit, state=None):
+        """
+        添加或更新一个单位，位置、生命值、等级或经验值变化时重绘。
+        :param unit: 要绘制的单位
+        :param state: 单位的(位置, 生命值, 最大生命值, 等级, 经验值, 名称)，省略时从单位读取（见Team.unit_states）
+        """
+        if state is None:
+            state = (unit.position, unit.hp, unit.max_hp, unit.level, unit.exp, unit.name)
+        self.set_item(id(unit), state, unit.get_bounds, unit.draw)
+
+    def remove_item(self, item_id):
+        """
+        移除一个动态项目（例如阵亡的单位），并将其区域标记为脏。
+        :param item_id: 项目的唯一标识
+        """
+        previous = self.items.pop(item_id, None)
+        if previous is not None:
+            self.dirty_rects.append(previous[1])
+
+    def remove_unit(self, unit):
+        """
+        移除一个单位。
+        :param unit: 要移除的单位
+        """
+        self.remove_item(id(unit))
+
+    def present(self):
+        """
+        重绘脏区域并提交到显示器。没有变化时不做任何事。
+        """
+        if self.full_redraw:
+            self.screen.blit(self.static_layer, (0, 0))
+            for state, rect, draw in self.items.values():
+                draw(self.screen)
+            pygame.display.flip()
+            self.full_redraw = False
+            self.dirty_rects = []
+            return
+
+        if not self.dirty_rects:
+            return
+
+        screen_rect = self.screen.get_rect()
+        dirty_rects = [rect.clip(screen_rect) for rect in merge_rects(self.dirty_rects)]
+        self.dirty_rects = []
+        for dirty in dirty_rects:
+            # 先用静态图层覆盖脏区域，再在裁剪区域内按顺序重绘与之相交的项目
+            self.screen.set_clip(dirty)
+            self.screen.blit(self.static_layer, dirty, dirty)
+            for state, rect, draw in self.items.values():
+                if rect.colliderect(dirty):
+                    draw(self.screen)
+        self.screen.set_clip(None)
+        pygame.display.update(dirty_rects)
+
+
+def merge_rects(rects):
+    """
+    合并相互重叠的矩形，减少重复绘制和提交的区域。
+    :param rects: 矩形列表
+    """
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
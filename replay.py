@@ -0,0 +1,230 @@
+import argparse
+import bisect
+import json
+import os
+import random
+import time
+from combat import EXP_PER_LEVEL
+
+# 对局录像：每场对局使用一个带种子的random.Random，所有操作按顺序追加到JSONL事件流中。
+# 回放时只根据事件流重建对局状态，不需要pygame，也不需要重新掷随机数。
+#
+# 事件格式（每行一个JSON对象）：
+#   {"type": "start", "seed": 种子, "player_team": [...], "ai_team": [...], "player_gold": 金币}
+#   {"type": "attack", "side": "player"或"ai", "attacker": 下标, "target": 下标, "damage": 伤害}
+#   {"type": "recruit", "unit": 玩家单位下标, "cost": 花费}
+# 单位数据的格式与Unit.to_dict()相同。
+
+REPLAY_VERSION = 1
+SNAPSHOT_INTERVAL = 10  # 每隔多少回合保存一次快照，用于快速跳转
+KILL_REWARD = 50  # 玩家击败AI单位获得的金币，与game_loop一致
+
+
+def new_seed():
+    """
+    生成一个新的对局种子。
+    """
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+class MatchRecorder:
+    def __init__(self, path, seed, player_team, ai_team, player_gold):
+        """
+        开始记录一场对局，立即写入start事件。
+        :param path: 事件流文件路径
+        :param seed: 对局的随机种子
+        :param player_team: 玩家单位队伍列表
+        :param ai_team: AI单位队伍列表
+        :param player_gold: 玩家的初始金币
+        """
+        self.path = path
+        self.player_team = player_team
+        self.ai_team = ai_team
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8')
+        self.write({
+            "type": "start",
+            "version": REPLAY_VERSION,
+            "seed": seed,
+            "player_team": [unit.to_dict() for unit in player_team],
+            "ai_team": [unit.to_dict() for unit in ai_team],
+            "player_gold": player_gold,
+        })
+
+    def write(self, event):
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        self.file.flush()  # 每个事件都立即写出，崩溃时不丢失已发生的操作
+
+    def record_attack(self, attacker, target, damage):
+        """
+        记录一次攻击。
+        :param attacker: 发起攻击的单位
+        :param target: 被攻击的目标单位
+        :param damage: 实际造成的伤害
+        """
+        if attacker in self.player_team:
+            side, attacker_index, target_index = "player", self.player_team.index(attacker), self.ai_team.index(target)
+        else:
+            side, attacker_index, target_index = "ai", self.ai_team.index(attacker), self.player_team.index(target)
+        self.write({"type": "attack", "side": side, "attacker": attacker_index, "target": target_index,
+                    "damage": damage})
+
+    def record_recruit(self, unit, cost):
+        """
+        记录一次复活（招募）。
+        :param unit: 被复活的玩家单位
+        :param cost: 花费的金币
+        """
+        self.write({"type": "recruit", "unit": self.player_team.index(unit), "cost": cost})
+
+    def close(self):
+        self.file.close()
+
+
+def replay_path(replay_dir, seed):
+    """
+    生成新录像文件的路径。
+    :param replay_dir: 录像目录
+    :param seed: 对局的随机种子
+    """
+    return os.path.join(replay_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{seed}.jsonl")
+
+
+def load_events(path):
+    """
+    读取事件流文件。
+    :param path: 事件流文件路径
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class MatchState:
+    def __init__(self, start_event):
+        """
+        根据start事件建立对局的初始状态。单位用与Unit.to_dict()相同格式的字典表示。
+        :param start_event: start事件
+        """
+        self.seed = start_event.get("seed")
+        self.player_team = [dict(unit) for unit in start_event["player_team"]]
+        self.ai_team = [dict(unit) for unit in start_event["ai_team"]]
+        self.player_gold = start_event["player_gold"]
+        self.turn = 0  # 已经进行的攻击次数
+
+    def copy(self):
+        state = MatchState.__new__(MatchState)
+        state.seed = self.seed
+        state.player_team = [dict(unit) for unit in self.player_team]
+        state.ai_team = [dict(unit) for unit in self.ai_team]
+        state.player_gold = self.player_gold
+        state.turn = self.turn
+        return state
+
+    def apply(self, event):
+        """
+        把一个事件应用到状态上，规则与Unit.attack、Unit.level_up和game_loop一致。
+        :param event: attack或recruit事件
+        """
+        if event["type"] == "attack":
+            if event["side"] == "player":
+                attacker, target = self.player_team[event["attacker"]], self.ai_team[event["target"]]
+            else:
+                attacker, target = self.ai_team[event["attacker"]], self.player_team[event["target"]]
+            damage = event["damage"]
+            target["hp"] -= damage
+            attacker["exp"] += damage
+            if attacker["exp"] >= EXP_PER_LEVEL:
+                attacker["level"] += 1
+                attacker["exp"] -= EXP_PER_LEVEL
+            if event["side"] == "player" and target["hp"] <= 0:
+                self.player_gold += KILL_REWARD
+            self.turn += 1
+        elif event["type"] == "recruit":
+            unit = self.player_team[event["unit"]]
+            unit["hp"] = unit["max_hp"]
+            self.player_gold -= event["cost"]
+        else:
+            raise ValueError(f"Unknown replay event type: {event['type']}")
+
+    def winner(self):
+        """
+        返回获胜方（"Player"或"AI"），对局未结束时返回None。
+        """
+        if not any(unit["hp"] > 0 for unit in self.ai_team):
+            return "Player"
+        if not any(unit["hp"] > 0 for unit in self.player_team):
+            return "AI"
+        return None
+
+
+class Replay:
+    def __init__(self, events, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        回放引擎。初始化时完整执行一遍事件流，每隔snapshot_interval回合保存一次快照。
+        :param events: 事件列表，第一个必须是start事件
+        :param snapshot_interval: 快照间隔（回合）
+        """
+        if not events or events[0]["type"] != "start":
+            raise ValueError("Replay must begin with a start event")
+        self.start = events[0]
+        self.events = events[1:]
+        self.snapshots = []  # (回合, 已应用的事件数, 状态)
+        self.snapshot_turns = []
+
+        state = MatchState(self.start)
+        self.add_snapshot(0, state)
+        for index, event in enumerate(self.events):
+            state.apply(event)
+            if event["type"] == "attack" and state.turn % snapshot_interval == 0:
+                self.add_snapshot(index + 1, state)
+        self.final = state
+
+    @classmethod
+    def from_file(cls, path, snapshot_interval=SNAPSHOT_INTERVAL):
+        return cls(load_events(path), snapshot_interval)
+
+    def add_snapshot(self, event_count, state):
+        self.snapshots.append((state.turn, event_count, state.copy()))
+        self.snapshot_turns.append(state.turn)
+
+    @property
+    def seed(self):
+        return self.start.get("seed")
+
+    @property
+    def turns(self):
+        return self.final.turn
+
+    def state_at(self, turn):
+        """
+        返回第turn回合结束后的对局状态：从最近的快照开始，只应用之后的事件。
+        :param turn: 回合数，0表示开局，超过总回合数时返回最终状态
+        """
+        index = bisect.bisect_right(self.snapshot_turns, turn) - 1
+        snapshot_turn, event_count, snapshot = self.snapshots[index]
+        state = snapshot.copy()
+        for event in self.events[event_count:]:
+            if event["type"] == "attack" and state.turn >= turn:
+                break
+            state.apply(event)
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a recorded match from its event stream.")
+    parser.add_argument('path', help="replay file (JSONL event stream)")
+    parser.add_argument('--turn', type=int, default=None, help="show the state after this turn (default: final)")
+    args = parser.parse_args()
+
+    replay = Replay.from_file(args.path)
+    state = replay.final if args.turn is None else replay.state_at(args.turn)
+    print(f"Seed {replay.seed}, {replay.turns} turns, winner: {replay.final.winner() or 'none'}")
+    print(f"Turn {state.turn}, player gold {state.player_gold}")
+    for label, team in (("Player", state.player_team), ("AI", state.ai_team)):
+        for unit in team:
+            print(f"  {label} {unit['name']} ({unit['type']}): HP {unit['hp']}/{unit['max_hp']}, "
+                  f"Level {unit['level']}, EXP {unit['exp']}")
+
+
+if __name__ == "__main__":
+    main()
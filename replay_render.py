@@ -0,0 +1,430 @@
+import argparse
+import multiprocessing
+import os
+import re
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pygame
+
+import gifencoder
+from assets import load_image
+from battle import AttackAnimation
+from combat import BASE_HP
+from main import draw_button, draw_gold_text
+from replay import Replay, load_events
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, BATTLE_BACKGROUND, ATTACK_ANIMATION_DURATION, PLAYER_START_GOLD, \
+    BLACK, WHITE, RED, GREEN, GOLD
+from text_cache import render_text
+from unit import Unit
+
+# 离屏渲染对局录像：根据事件流重建对局，用游戏的Unit.draw和AttackAnimation把每一帧画到内存中的
+# pygame.Surface上（不打开窗口，也不需要显示设备），输出为PNG图片序列或动画GIF。
+# 帧按固定大小分块交给进程池中的工作进程，每个工作进程自己重建对局（Replay按快照跳转到任意回合），
+# PNG由工作进程直接写入文件（用zlib的快速级别自己编码）；GIF由工作进程量化和编码各自的帧，主进程按顺序拼接。
+#
+# 帧的时间线：每次攻击播放一段攻击动画（攻击在动画结束时结算，与game_loop一致），最后停留在终局画面。
+#
+# 输入可以是录像文件（.jsonl，见replay.py），也可以是文本游戏日志game_log.txt。文本日志中只有单位的名称、
+# 类型和每次攻击的伤害，从中重建的对局是近似的：
+#   - 单位的位置按开局的布局推算；读档继续的对局假定所有单位从满血开始；
+#   - 早期的日志没有记录AI单位，AI单位在第一次出现在攻击记录中时加入，类型未知时按Warrior绘制；
+#   - 同一方有重名单位时，选择第一个存活的同名单位；
+#   - 复活不写日志，已阵亡的玩家单位再次攻击时补上一次复活。
+# 需要准确的画面时应使用录像文件。
+
+DEFAULT_FPS = 25  # GIF的帧间隔以1/100秒为单位，25帧每秒可以准确表示
+HOLD_SECONDS = 1.0  # 终局画面停留的时间
+CHUNK_FRAMES = 50  # 每个任务渲染的帧数
+PNG_COMPRESSION = 1  # zlib压缩级别：pygame.image.save的默认级别比这慢得多，文件只小几个百分点
+CAPTION_POSITION = (200, 550)  # 与battle.display_battle_info一致
+RECRUIT_COST = 150
+FIXED_COLORS = (BLACK, WHITE, RED, GREEN, GOLD, (128, 128, 128), (0, 128, 0))  # GIF调色板中必须准确的界面颜色
+
+# 开局的布局，与setup_screen和game_setup一致
+PLAYER_X = 150
+AI_X = 650
+ROW_Y = 100
+ROW_SPACING = 200
+UNKNOWN_TYPE = 'Warrior'
+
+LOG_LINE_RE = re.compile(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3} - \w+ - (.*)$')
+PLAYER_CREATED_RE = re.compile(r'Created character (\d+): Name=(.*), Type=(\w+)\.$')
+AI_CREATED_RE = re.compile(r'Created AI unit (\d+): Name=(.*), Type=(\w+)\.$')
+LOADED_RE = re.compile(r'Loaded unit: Name=(.*), Type=(\w+)\.$')
+ATTACK_RE = re.compile(r'(.*) attacked (.*) for (\d+) damage\.$')
+SEED_RE = re.compile(r'Match seed: (\d+)\.$')
+BATTLE_END_MESSAGES = ('Game started.', 'Entered start screen.')
+
+
+def layout_unit(name, unit_type, x, row):
+    """
+    按开局布局生成单位数据（Unit.to_dict()格式）。攻击力和防御力不影响画面，记为0。
+    """
+    return {"name": name, "type": unit_type, "position": [x, ROW_Y + row * ROW_SPACING + 30],  # 与Unit.__init__一样下移30
+            "hp": BASE_HP, "max_hp": BASE_HP, "atk": 0, "defense": 0, "level": 1, "exp": 0}
+
+
+class LogBattle:
+    def __init__(self, seed=None):
+        """
+        从文本日志中逐行重建的一场对局。
+        :param seed: 日志中记录的对局种子
+        """
+        self.seed = seed
+        self.player_team = []  # 开局时的单位数据
+        self.ai_team = []
+        self.ai_from_log = False  # 日志中是否记录了AI单位（否则在攻击记录中遇到时加入）
+        self.hp = ([], [])  # 双方单位的当前生命值，用于选择重名单位
+        self.events = []
+        self.next_side = "player"  # 双方轮流攻击，名称无法区分攻击方时按轮次判断
+
+    def add_unit(self, side, name, unit_type):
+        team = self.player_team if side == "player" else self.ai_team
+        team.append(layout_unit(name, unit_type, PLAYER_X if side == "player" else AI_X, len(team)))
+        self.hp[side != "player"].append(BASE_HP)
+
+    def find(self, side, name):
+        """
+        返回一方中名为name的单位下标，优先选择存活的单位；没有这个名称时返回None。
+        """
+        team = self.player_team if side == "player" else self.ai_team
+        matches = [index for index, unit in enumerate(team) if unit["name"] == name]
+        if not matches:
+            return None
+        hp = self.hp[side != "player"]
+        return next((index for index in matches if hp[index] > 0), matches[0])
+
+    def can_be_ai(self, name):
+        return self.find("ai", name) is not None or (not self.ai_from_log and self.find("player", name) is None)
+
+    def add_attack(self, attacker, target, damage):
+        """
+        加入一条攻击记录，判断攻击方并找到双方的单位。无法对应到单位的记录被忽略。
+        """
+        sides = []
+        if self.find("player", attacker) is not None and self.can_be_ai(target):
+            sides.append("player")
+        if self.can_be_ai(attacker) and self.find("player", target) is not None:
+            sides.append("ai")
+        if not sides:
+            return
+        side = self.next_side if self.next_side in sides else sides[0]
+        for name, unit_side in ((attacker, side), (target, "ai" if side == "player" else "player")):
+            if unit_side == "ai" and self.find("ai", name) is None:
+                self.add_unit("ai", name, UNKNOWN_TYPE)
+        own, enemies = ("player", "ai") if side == "player" else ("ai", "player")
+        attacker_index, target_index = self.find(own, attacker), self.find(enemies, target)
+        own_hp, enemy_hp = self.hp[own != "player"], self.hp[enemies != "player"]
+        if own_hp[attacker_index] <= 0 and side == "player":  # 复活没有写入日志
+            own_hp[attacker_index] = BASE_HP
+            self.events.append({"type": "recruit", "unit": attacker_index, "cost": RECRUIT_COST})
+        enemy_hp[target_index] -= damage
+        self.events.append({"type": "attack", "side": side, "attacker": attacker_index, "target": target_index,
+                            "damage": damage})
+        self.next_side = enemies
+
+    def to_events(self):
+        """
+        返回录像格式的事件列表。
+        """
+        start = {"type": "start", "seed": self.seed, "player_team": self.player_team, "ai_team": self.ai_team,
+                 "player_gold": PLAYER_START_GOLD}
+        return [start] + self.events
+
+
+def log_battles(path):
+    """
+    从文本游戏日志中重建所有对局（近似，见文件开头的说明）。
+    :param path: 日志文件路径
+    :return: 每场对局的事件列表（与录像文件格式相同），只包含至少有一次攻击的对局
+    """
+    battles = []
+    battle = None
+    seed = None
+    loading = False  # 是否正在读取连续的"Loaded unit"记录
+
+    def finish():
+        if battle is not None and battle.events:
+            battles.append(battle.to_events())
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        for line in file:
+            match = LOG_LINE_RE.match(line.rstrip('\n'))
+            if match is None:
+                continue
+            message = match.group(1)
+            loaded = LOADED_RE.match(message)
+            if loaded:
+                if not loading:  # 读档：前一半是玩家单位，后一半是AI单位
+                    finish()
+                    battle = LogBattle(seed)
+                    loaded_units = []
+                loaded_units.append(loaded.groups())
+                loading = True
+                continue
+            if loading:
+                half = (len(loaded_units) + 1) // 2
+                for index, (name, unit_type) in enumerate(loaded_units):
+                    battle.add_unit("player" if index < half else "ai", name, unit_type)
+                battle.ai_from_log = True
+                loading = False
+
+            created = PLAYER_CREATED_RE.match(message)
+            if created is not None:
+                if created.group(1) == '1' or battle is None:
+                    finish()
+                    battle = LogBattle(seed)
+                battle.add_unit("player", created.group(2), created.group(3))
+                continue
+            if battle is not None:
+                created = AI_CREATED_RE.match(message)
+                if created is not None:
+                    battle.add_unit("ai", created.group(2), created.group(3))
+                    battle.ai_from_log = True
+                    continue
+                attack = ATTACK_RE.match(message)
+                if attack is not None:
+                    battle.add_attack(attack.group(1), attack.group(2), int(attack.group(3)))
+                    continue
+            seeded = SEED_RE.match(message)
+            if seeded is not None:
+                seed = int(seeded.group(1))
+                if battle is not None and not battle.events:
+                    battle.seed = seed
+            elif message in BATTLE_END_MESSAGES:
+                finish()
+                battle = None
+                seed = None
+    finish()
+    return battles
+
+
+class FrameRenderer:
+    def __init__(self, events, fps=DEFAULT_FPS):
+        """
+        对局的离屏渲染器，可以按任意顺序渲染任意一帧。
+        :param events: 录像的事件列表
+        :param fps: 每秒的帧数
+        """
+        self.replay = Replay(events)
+        self.attacks = [event for event in self.replay.events if event["type"] == "attack"]
+        self.frames_per_attack = max(1, round(ATTACK_ANIMATION_DURATION * fps / 1000))
+        self.hold_frames = max(1, round(HOLD_SECONDS * fps))
+        self.surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        # 背景和保存按钮预先合成到静态图层上（没有显示器时图片不能convert，合成时转换一次像素格式）
+        self.static_layer = self.surface.copy()
+        self.static_layer.blit(load_image(BATTLE_BACKGROUND), (0, 0))
+        save_button = pygame.Rect(SCREEN_WIDTH // 2 - 70, 20, 140, 50)
+        draw_button(self.static_layer, save_button, (0, 128, 0), "Save", WHITE)
+        self.recruit_button = pygame.Rect(SCREEN_WIDTH // 2 - 75, SCREEN_HEIGHT // 2 - 25, 150, 50)
+        self.turn = None  # 当前缓存的回合
+        self.state = None
+        self.units = None
+
+    @property
+    def frame_count(self):
+        return len(self.attacks) * self.frames_per_attack + self.hold_frames
+
+    def load_turn(self, turn):
+        """
+        切换到第turn次攻击之前的状态，单位对象在同一回合的各帧之间复用。
+        """
+        if turn != self.turn:
+            self.turn = turn
+            self.state = self.replay.state_at(turn)
+            self.units = ([Unit.from_dict(unit) for unit in self.state.player_team],
+                          [Unit.from_dict(unit) for unit in self.state.ai_team])
+
+    def render(self, index):
+        """
+        渲染第index帧，返回渲染器的表面（下一次渲染时会被覆盖）。
+        """
+        turn, step = divmod(index, self.frames_per_attack)
+        if turn >= len(self.attacks):  # 终局画面
+            turn, step = len(self.attacks), None
+        self.load_turn(turn)
+        player_units, ai_units = self.units
+        animation = None
+        if step is not None:
+            event = self.attacks[turn]
+            own, enemies = (player_units, ai_units) if event["side"] == "player" else (ai_units, player_units)
+            animation = AttackAnimation(own[event["attacker"]], enemies[event["target"]])
+            animation.update(step * ATTACK_ANIMATION_DURATION / self.frames_per_attack)
+            caption = (f"Turn {turn + 1}: {animation.attacker.name} attacked {animation.target.name} "
+                       f"for {event['damage']} damage.")
+        else:
+            caption = f"Winner: {self.state.winner() or 'none'}"
+
+        surface = self.surface
+        surface.blit(self.static_layer, (0, 0))
+        draw_gold_text(surface, self.state.player_gold)
+        dead = any(unit.hp <= 0 for unit in player_units)
+        button_color = (255, 0, 0) if self.state.player_gold >= RECRUIT_COST and dead else (128, 128, 128)
+        draw_button(surface, self.recruit_button, button_color, "Recruit (150g)", BLACK)
+        for unit in player_units + ai_units:
+            if unit.hp > 0:
+                unit.draw(surface)
+        surface.blit(render_text(caption, WHITE), CAPTION_POSITION)
+        if animation is not None:
+            animation.attacker.position = animation.origin  # 同一回合的下一帧从原位重新计算
+        return surface
+
+    def pixels(self, index):
+        """
+        渲染第index帧，返回形状为(高, 宽, 3)的RGB数组。
+        """
+        data = pygame.image.tobytes(self.render(index), 'RGB')
+        return np.frombuffer(data, dtype=np.uint8).reshape(SCREEN_HEIGHT, SCREEN_WIDTH, 3)
+
+
+def frame_path(directory, index):
+    return os.path.join(directory, f"frame_{index:06d}.png")
+
+
+def png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def write_png(path, pixels, level=PNG_COMPRESSION):
+    """
+    把RGB数组写成PNG文件。每行使用Sub过滤（与左边的像素相减），过滤用NumPy完成。
+    :param path: 文件路径
+    :param pixels: 形状为(高, 宽, 3)的RGB数组（uint8）
+    :param level: zlib压缩级别
+    """
+    height, width, _ = pixels.shape
+    raw = pixels.reshape(height, width * 3)
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 1  # 过滤类型Sub
+    rows[:, 1:4] = raw[:, :3]
+    np.subtract(raw[:, 3:], raw[:, :-3], out=rows[:, 4:])  # uint8相减按256取模，与PNG的定义一致
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        file.write(png_chunk(b'IDAT', zlib.compress(rows.tobytes(), level)))
+        file.write(png_chunk(b'IEND', b''))
+
+
+worker = None  # 工作进程中的(渲染器, 输出目录, GIF查找表, GIF帧间隔, 输出的第一帧)
+
+
+def init_worker(events, fps, directory, lut, delay, first):
+    global worker
+    worker = (FrameRenderer(events, fps), directory, lut, delay, first)
+
+
+def render_chunk(start, end):
+    """
+    渲染[start, end)范围内的帧。PNG直接写入输出目录，返回写入的帧数；GIF返回编码好的帧。
+    """
+    renderer, directory, lut, delay, first = worker
+    if lut is None:
+        for index in range(start, end):
+            write_png(frame_path(directory, index), renderer.pixels(index))
+        return end - start
+    # 每一帧只编码与上一帧不同的区域，块的第一帧与它之前的一帧比较，因此各块可以独立编码后直接拼接
+    previous = gifencoder.quantize(renderer.pixels(start - 1), lut) if start > first else None
+    blocks = []
+    for index in range(start, end):
+        indices = gifencoder.quantize(renderer.pixels(index), lut)
+        blocks.append(gifencoder.frame_block(indices, previous, delay))
+        previous = indices
+    return b''.join(blocks)
+
+
+def render_replay(events, output, fps=DEFAULT_FPS, workers=None, start=0, end=None, chunk_frames=CHUNK_FRAMES):
+    """
+    渲染一场对局。
+    :param events: 录像的事件列表
+    :param output: 以.gif结尾时输出动画GIF，否则为存放PNG图片序列的目录
+    :param fps: 每秒的帧数
+    :param workers: 进程数，默认为CPU核数，1表示在当前进程中渲染
+    :param start: 第一帧的编号
+    :param end: 最后一帧之后的编号，None表示到终局画面结束
+    :param chunk_frames: 每个任务渲染的帧数
+    :return: 渲染的帧数
+    """
+    renderer = FrameRenderer(events, fps)
+    end = renderer.frame_count if end is None else min(end, renderer.frame_count)
+    chunks = [(first, min(first + chunk_frames, end)) for first in range(start, end, chunk_frames)]
+    gif = output.lower().endswith('.gif')
+    if gif:  # 调色板根据第一帧在主进程中生成，所有工作进程使用同一个查找表
+        palette, lut = gifencoder.build_palette(renderer.pixels(start), FIXED_COLORS)
+        directory, delay = None, max(2, round(100 / fps))
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    else:
+        lut = delay = None
+        directory = output
+        os.makedirs(directory, exist_ok=True)
+    initargs = (events, fps, directory, lut, delay, start)
+
+    workers = max(1, min(workers or os.cpu_count(), len(chunks)))  # 帧数少时不启动用不上的进程
+    if workers == 1:
+        init_worker(*initargs)
+        results = (render_chunk(*chunk) for chunk in chunks)
+        executor = None
+    else:
+        # 与ai.py一样使用spawn，工作进程不继承主进程中已初始化的pygame状态
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_worker, initargs=initargs)
+        results = executor.map(render_chunk, *zip(*chunks))
+    try:
+        if gif:
+            with open(output, 'wb') as file:
+                file.write(gifencoder.header(SCREEN_WIDTH, SCREEN_HEIGHT, palette))
+                for blocks in results:  # map按提交顺序返回结果
+                    file.write(blocks)
+                file.write(gifencoder.TRAILER)
+        else:
+            for _ in results:
+                pass
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return max(0, end - start)
+
+
+def team_label(team):
+    return ','.join(f"{unit['name']}({unit['type'][0]})" for unit in team)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a recorded match offscreen to PNG frames or an animated GIF.")
+    parser.add_argument('source', help="replay file (.jsonl) or text game log (game_log.txt)")
+    parser.add_argument('output', nargs='?', default='replay_frames',
+                        help="output: a .gif file, or a directory for PNG frames (default: replay_frames)")
+    parser.add_argument('--battle', type=int, default=-1,
+                        help="which battle of a text log to render, counting from 0 (default: the last)")
+    parser.add_argument('--list', action='store_true', help="list the battles found in a text log and exit")
+    parser.add_argument('--fps', type=int, default=DEFAULT_FPS, help="frames per second")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--start', type=int, default=0, help="first frame to render")
+    parser.add_argument('--end', type=int, default=None, help="stop before this frame (default: the last frame)")
+    args = parser.parse_args()
+
+    if args.source.endswith('.jsonl'):
+        battles = [load_events(args.source)]
+    else:
+        battles = log_battles(args.source)
+    if args.list:
+        for index, events in enumerate(battles):
+            state = Replay(events).final
+            print(f"{index:3d}: {team_label(state.player_team)} vs {team_label(state.ai_team)}, {state.turn} attacks, "
+                  f"winner: {state.winner() or 'none'}")
+        return
+    if not battles:
+        parser.error(f"no battles found in {args.source}")
+
+    start = time.perf_counter()
+    frames = render_replay(battles[args.battle], args.output, args.fps, args.workers, args.start, args.end)
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames in {elapsed:.2f}s: {frames / elapsed:.1f} frames/s, "
+          f"{frames / args.fps / elapsed:.1f}x real time -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
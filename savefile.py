@@ -0,0 +1,43 @@
+import json
+
+# 存档格式：存档数据在主线程中生成快照，由savestore的后台写入线程写入存档库；
+# 这里还保留读取旧的单一存档文件的功能，用于把它导入存档库。
+
+SAVE_VERSION = 2  # 存档格式版本；版本1（无version字段）只保存了名称、类型、位置和生命值
+
+
+def unit_dicts(units):
+    """
+    单位的to_dict()列表；列式存储的队伍（team.Team）按列一次生成。
+    """
+    to_dicts = getattr(units, 'to_dicts', None)
+    return to_dicts() if to_dicts is not None else [unit.to_dict() for unit in units]
+
+
+def build_save_data(player_team, ai_team, player_gold):
+    """
+    生成存档数据的快照。快照只包含数字、字符串和列表的副本，之后单位的变化不会影响它。
+    :param player_team: 玩家单位队伍列表
+    :param ai_team: AI单位队伍列表
+    :param player_gold: 玩家的金币数量
+    """
+    return {
+        "version": SAVE_VERSION,
+        "player_team": unit_dicts(player_team),
+        "ai_team": unit_dicts(ai_team),
+        "player_gold": player_gold,
+    }
+
+
+def read_save_data(path):
+    """
+    读取并检查存档文件。
+    :param path: 存档文件路径
+    :return: 存档数据字典，旧格式的存档版本号记为1
+    """
+    with open(path, "r") as file:
+        save_data = json.load(file)
+    version = save_data.setdefault("version", 1)
+    if version > SAVE_VERSION:
+        raise ValueError(f"Unsupported save version {version} (expected at most {SAVE_VERSION})")
+    return save_data
@@ -0,0 +1,364 @@
+import argparse
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from savefile import SAVE_VERSION, build_save_data
+from team import COLUMNS
+
+# SQLite存档库：一个数据库文件中保存任意多个命名的存档槽。
+#   slots      存档槽的元数据（名称、时间、回合数、金币、队伍概况），按名称和保存时间建有索引，
+#              显示存档列表时只读这张表，不读取也不解析存档内容
+#   slot_data  存档内容（build_save_data()格式的JSON），以存档槽编号为主键，读档时按主键直接取出一行
+#   journal    自动存档的逐回合增量日志，主键为(存档槽编号, 回合数)
+#
+# 自动存档：对局开始时把完整状态写入自动存档槽作为基准，之后每回合只追加一行增量（发生变化的单位数值和金币），
+# 不重写整个存档。读取自动存档时在基准上依次应用增量；增量超过JOURNAL_COMPACT_TURNS行时合并进基准并清空日志，
+# 因此恢复时要应用的增量数量有上限。对局正常结束后自动存档被删除，留下的自动存档说明上一局没有正常结束，可以继续。
+#
+# 写入：所有写操作（手动存档、自动存档的基准和增量、删除存档槽）都交给一个后台写入线程，由它独占写连接、
+# 按提交的顺序执行并提交事务。游戏线程只生成快照（存档数据或一回合的增量）放入队列，不等待SQLite，
+# 存档和自动存档不占用游戏帧时间。读取使用游戏线程自己的连接，读之前先等待已提交的写操作完成，
+# 因此总能读到刚保存的内容。
+#
+# 数据库使用WAL模式和synchronous=NORMAL：每次提交只追加WAL，不等待fsync，程序崩溃不会丢失已写入的回合
+# （还在队列中的回合会丢失），断电时最多丢失最后几个回合，数据库本身不会损坏。
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    saved_at REAL NOT NULL,
+    turn INTEGER NOT NULL,
+    gold INTEGER NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slots_saved_at ON slots (saved_at);
+CREATE TABLE IF NOT EXISTS slot_data (
+    slot_id INTEGER PRIMARY KEY REFERENCES slots (id) ON DELETE CASCADE,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    slot_id INTEGER NOT NULL REFERENCES slots (id) ON DELETE CASCADE,
+    turn INTEGER NOT NULL,
+    gold INTEGER NOT NULL,
+    changes TEXT NOT NULL,
+    PRIMARY KEY (slot_id, turn)
+) WITHOUT ROWID;
+"""
+
+JOURNAL_COMPACT_TURNS = 50  # 自动存档的增量超过多少行时合并进基准
+SIDES = ('player_team', 'ai_team')  # 增量中的队伍编号对应的存档字段
+
+SlotInfo = namedtuple('SlotInfo', 'name saved_at turn gold summary')
+
+
+def team_summary(player_units, ai_units):
+    """
+    队伍概况，如"WWT 2/3 vs TWW 1/3"：双方的单位类型首字母和存活数量。
+    :param player_units: 玩家单位的(类型, 生命值)列表
+    :param ai_units: AI单位的(类型, 生命值)列表
+    """
+    def side(units):
+        units = list(units)
+        alive = sum(hp > 0 for _, hp in units)
+        return f"{''.join(unit_type[0] for unit_type, _ in units)} {alive}/{len(units)}"
+    return f"{side(player_units)} vs {side(ai_units)}"
+
+
+def save_data_summary(save_data):
+    return team_summary(((unit["type"], unit["hp"]) for unit in save_data["player_team"]),
+                        ((unit["type"], unit["hp"]) for unit in save_data["ai_team"]))
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    return connection
+
+
+def find_slot_id(connection, name):
+    row = connection.execute("SELECT id FROM slots WHERE name = ?", (name,)).fetchone()
+    return None if row is None else row[0]
+
+
+def write_slot(connection, name, save_data, turn):
+    """
+    写入存档槽的元数据和内容，并清空它的增量日志（调用者负责提交事务）。
+    """
+    connection.execute(
+        "INSERT INTO slots (name, saved_at, turn, gold, summary) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (name) DO UPDATE SET saved_at = excluded.saved_at, turn = excluded.turn, "
+        "gold = excluded.gold, summary = excluded.summary",
+        (name, time.time(), turn, save_data["player_gold"], save_data_summary(save_data)))
+    slot_id = find_slot_id(connection, name)
+    connection.execute("INSERT OR REPLACE INTO slot_data (slot_id, data) VALUES (?, ?)",
+                       (slot_id, json.dumps(save_data, separators=(',', ':'))))
+    connection.execute("DELETE FROM journal WHERE slot_id = ?", (slot_id,))
+
+
+def write_save(connection, name, save_data, turn):
+    write_slot(connection, name, save_data, turn)
+    logging.info("Game saved successfully to slot %s.", name)  # 记录保存成功的日志
+
+
+def append_journal(connection, name, turn, gold, changes, summary):
+    """
+    追加自动存档的一行增量，并更新存档槽的元数据。
+    """
+    slot_id = find_slot_id(connection, name)
+    connection.execute("INSERT OR REPLACE INTO journal (slot_id, turn, gold, changes) VALUES (?, ?, ?, ?)",
+                       (slot_id, turn, gold, json.dumps(changes, separators=(',', ':'))))
+    connection.execute("UPDATE slots SET saved_at = ?, turn = ?, gold = ?, summary = ? WHERE id = ?",
+                       (time.time(), turn, gold, summary, slot_id))
+
+
+def delete_slot(connection, name):
+    connection.execute("DELETE FROM slots WHERE name = ?", (name,))
+
+
+def apply_changes(save_data, gold, changes):
+    """
+    把一行增量应用到存档数据上。
+    :param save_data: build_save_data()格式的存档数据，原地修改
+    :param gold: 这一回合结束时的金币
+    :param changes: [(队伍编号, 单位下标, 列名, 新值)]，列名为team.COLUMNS之一
+    """
+    save_data["player_gold"] = gold
+    for side, index, column, value in changes:
+        unit = save_data[SIDES[side]][index]
+        if column in ('x', 'y'):
+            position = list(unit["position"])
+            position[column == 'y'] = value
+            unit["position"] = position
+        else:
+            unit[column] = value
+
+
+class SaveWriter:
+    def __init__(self, path):
+        """
+        后台写入线程，独占存档库的写连接。submit()只把写操作放入队列，事务在工作线程中按顺序执行和提交，
+        不占用游戏帧时间。
+        :param path: 数据库文件路径
+        """
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, write, *args):
+        """
+        提交一次写操作。
+        :param write: 函数write(connection, *args)，在一个事务中执行
+        :param args: 参数，必须是游戏线程生成的快照，提交后不再修改
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="SaveWriter", daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)  # 退出程序前写完尚未完成的存档
+        self.queue.put((write, args))
+
+    def run(self):
+        connection = connect(self.path)
+        try:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is None:  # close()发出的结束标记
+                        return
+                    write, args = item
+                    with connection:
+                        write(connection, *args)
+                except Exception as e:
+                    logging.error(f"Failed to write the save database: {e}")  # 写入失败，记录错误日志
+                finally:
+                    self.queue.task_done()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """
+        等待所有已提交的写操作完成。
+        """
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """
+        写完尚未完成的写操作，结束工作线程并关闭写连接。
+        """
+        with self.lock:
+            if self.thread is not None:
+                self.queue.put(None)
+                self.thread.join()
+                self.thread = None
+                atexit.unregister(self.flush)
+
+
+class SaveStore:
+    def __init__(self, path):
+        """
+        打开（或新建）存档数据库。self.connection只在创建它的线程（游戏线程）中读取，写入由self.writer进行。
+        :param path: 数据库文件路径
+        """
+        self.path = path
+        self.connection = connect(path)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self.writer = SaveWriter(path)
+
+    def close(self):
+        self.writer.close()
+        self.connection.close()
+
+    def flush(self):
+        """
+        等待已提交的写操作完成，之后的读取能看到它们。
+        """
+        self.writer.flush()
+
+    def save_slot(self, name, save_data, turn=0):
+        """
+        把完整的存档写入指定的存档槽，覆盖同名存档槽。只把快照交给写入线程，不等待写入完成。
+        :param name: 存档槽名称
+        :param save_data: build_save_data()生成的快照
+        :param turn: 已进行的回合数
+        """
+        self.writer.submit(write_save, name, save_data, turn)
+
+    def list_slots(self, limit=-1):
+        """
+        按保存时间从新到旧列出存档槽的元数据，不读取存档内容。按保存时间的索引倒序读取，只取前limit个时不需要排序。
+        :param limit: 最多列出的数量，-1表示全部
+        :return: SlotInfo列表
+        """
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT name, saved_at, turn, gold, summary FROM slots ORDER BY saved_at DESC LIMIT ?", (limit,))
+        return [SlotInfo(*row) for row in rows]
+
+    def load_slot(self, name):
+        """
+        读取存档槽：按名称索引找到存档槽，再按主键取出内容，与存档槽的数量无关。
+        自动存档槽还要依次应用尚未合并的增量。
+        :param name: 存档槽名称
+        :return: (存档数据, 回合数)，存档槽不存在时抛出KeyError
+        """
+        self.flush()
+        row = self.connection.execute(
+            "SELECT slots.id, slots.turn, slot_data.data FROM slots JOIN slot_data ON slot_data.slot_id = slots.id "
+            "WHERE slots.name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        slot_id, turn, data = row  # 自动存档槽的回合数随每一行增量更新
+        save_data = json.loads(data)
+        version = save_data.setdefault("version", 1)
+        if version > SAVE_VERSION:
+            raise ValueError(f"Unsupported save version {version} (expected at most {SAVE_VERSION})")
+        for gold, changes in self.connection.execute(
+                "SELECT gold, changes FROM journal WHERE slot_id = ? ORDER BY turn", (slot_id,)):
+            apply_changes(save_data, gold, json.loads(changes))
+        return save_data, turn
+
+    def delete_slot(self, name):
+        self.writer.submit(delete_slot, name)
+
+
+class AutosaveJournal:
+    def __init__(self, store, name, player_team, ai_team, player_gold, turn=0):
+        """
+        一场对局的自动存档。创建时写入基准，之后每回合调用record()追加增量。
+        :param store: SaveStore
+        :param name: 自动存档槽名称
+        :param player_team: 玩家队伍（Team）
+        :param ai_team: AI队伍（Team）
+        :param player_gold: 玩家当前的金币
+        :param turn: 已进行的回合数（读档继续的对局不从0开始）
+        """
+        self.store = store
+        self.name = name
+        self.teams = (player_team, ai_team)
+        self.pending = 0  # 尚未合并进基准的增量行数
+        self.write_base(player_gold, turn)
+
+    def snapshot(self):
+        """
+        双方队伍数值的副本，每队一个形状为(列, 单位)的数组。
+        """
+        return tuple(np.stack([getattr(team, column) for column in COLUMNS]) for team in self.teams)
+
+    def write_base(self, player_gold, turn):
+        self.store.writer.submit(write_slot, self.name, build_save_data(*self.teams, player_gold), turn)
+        self.last = self.snapshot()
+        self.pending = 0
+
+    def record(self, turn, player_gold):
+        """
+        记录一回合：比较双方队伍与上一回合的数值，只把发生变化的项目和存档槽的元数据交给写入线程。
+        :param turn: 回合数（从1开始，每次攻击或复活算一回合）
+        :param player_gold: 这一回合结束时的金币
+        """
+        if self.pending >= JOURNAL_COMPACT_TURNS:
+            self.write_base(player_gold, turn)
+            return
+        current = self.snapshot()
+        changes = []
+        for side, (before, after) in enumerate(zip(self.last, current)):
+            for column, index in zip(*np.nonzero(before != after)):
+                changes.append((side, int(index), COLUMNS[column], int(after[column, index])))
+        self.last = current
+        player_team, ai_team = self.teams
+        summary = team_summary(zip(player_team.unit_types, player_team.hp.tolist()),
+                               zip(ai_team.unit_types, ai_team.hp.tolist()))
+        self.store.writer.submit(append_journal, self.name, turn, player_gold, changes, summary)
+        self.pending += 1
+
+    def finish(self):
+        """
+        对局正常结束，删除自动存档。
+        """
+        self.store.delete_slot(self.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List, export or delete save slots.")
+    parser.add_argument('--database', default=None, help="save database (default: settings.SAVE_DB)")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('list', help="list the slots, newest first")
+    export = subparsers.add_parser('export', help="print a slot as JSON")
+    export.add_argument('slot')
+    delete = subparsers.add_parser('delete', help="delete a slot")
+    delete.add_argument('slot')
+    args = parser.parse_args()
+
+    if args.database is None:
+        from settings import SAVE_DB
+        args.database = SAVE_DB
+    store = SaveStore(args.database)
+    try:
+        if args.command == 'export':
+            save_data, turn = store.load_slot(args.slot)
+            print(json.dumps(save_data, indent=2))
+        elif args.command == 'delete':
+            store.delete_slot(args.slot)
+        else:
+            for slot in store.list_slots():
+                saved_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(slot.saved_at))
+                print(f"{slot.name:24s} {saved_at}  turn {slot.turn:4d}  {slot.gold:5d}g  {slot.summary}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
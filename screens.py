@@ -1,23 +1,66 @@
 import pygame
 import logging
+import random
 import sys
-from settings import screen, BLACK, WHITE, font, START_SCREEN_IMG1, START_SCREEN_IMG2, LOAD_IMAGE, SETUP_SCREEN_BACKGROUND
+import time
+from settings import get_screen, BLACK, WHITE, START_SCREEN_IMG1, START_SCREEN_IMG2, LOAD_IMAGE, SETUP_SCREEN_BACKGROUND, \
+    FPS, MENU_EVENT_TIMEOUT_MS
 from unit import Unit
+from text_cache import render_text
+from assets import load_image
+from sound import sound_bank
+
+# 菜单界面（开始、设置、游戏结束）是事件驱动的：没有事件时阻塞在pygame.event.wait中，进程休眠、不占用CPU；
+# 只有界面状态变化或窗口需要重绘（被遮挡后重新露出、恢复最小化等）时才重新绘制，重绘频率不超过FPS。
+menu_clock = pygame.time.Clock()  # 各菜单界面共用的时钟，限制重绘的帧率
+REDRAW_EVENTS = {pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWSHOWN, pygame.WINDOWRESTORED,
+                 pygame.WINDOWSIZECHANGED}  # 需要重新绘制窗口内容的事件
+
+
+def wait_events(timeout=MENU_EVENT_TIMEOUT_MS):
+    """
+    阻塞等待事件，返回到达的所有事件；超过timeout毫秒没有事件时返回空列表。
+    """
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+
+def present():
+    """
+    显示画好的一帧。事件密集时（如连续输入）按FPS限制重绘的频率，空闲一段时间之后的第一帧不会等待。
+    """
+    pygame.display.flip()
+    menu_clock.tick(FPS)
+
 
 def start_screen():
     logging.info("Entered start screen.")
-    # 加载开始界面所需的图像
-    image1 = pygame.image.load(START_SCREEN_IMG1)
-    image2 = pygame.image.load(START_SCREEN_IMG2)
-    load_image = pygame.image.load(LOAD_IMAGE)
+    screen = get_screen()
+    # 加载开始界面所需的图像（由资源管理器缓存，重复进入时不再重新加载）
+    image1 = load_image(START_SCREEN_IMG1)
+    image2 = load_image(START_SCREEN_IMG2)
+    load_button_image = load_image(LOAD_IMAGE)
 
     # 定义图像位置
     image1_rect = image1.get_rect(topleft=(0, 0))
     image2_rect = image2.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
-    load_image_rect = load_image.get_rect(center=(screen.get_width() - 100, screen.get_height() - 100))
+    load_image_rect = load_button_image.get_rect(center=(screen.get_width() - 100, screen.get_height() - 100))
 
+    needs_redraw = True  # 开始界面的内容不变，只在第一次和窗口需要重绘时绘制
     while True:
-        for event in pygame.event.get():
+        if needs_redraw:
+            # 绘制图像
+            screen.fill(BLACK)
+            screen.blit(image1, image1_rect)
+            screen.blit(image2, image2_rect)
+            screen.blit(load_button_image, load_image_rect)
+            present()
+            sound_bank.start_music()  # 第一帧显示之后再加载和播放背景音乐
+            needs_redraw = False
+
+        for event in wait_events():
             if event.type == pygame.QUIT:
                 logging.info("Game quit from start screen.")
                 pygame.quit()
@@ -29,19 +72,15 @@ def start_screen():
                 elif image2_rect.collidepoint(event.pos):
                     logging.info("New game started.")
                     return "new_game"
-
-        # 绘制图像
-        screen.fill(BLACK)
-        screen.blit(image1, image1_rect)
-        screen.blit(image2, image2_rect)
-        screen.blit(load_image, load_image_rect)
-        pygame.display.flip()
+            elif event.type in REDRAW_EVENTS:
+                needs_redraw = True
 
 
-def setup_screen():
+def setup_screen(rng=random):
     logging.info("Entered setup screen.")
+    screen = get_screen()
     # 加载并绘制背景图片
-    background_img = pygame.image.load(SETUP_SCREEN_BACKGROUND)
+    background_img = load_image(SETUP_SCREEN_BACKGROUND)
 
     input_boxes = [pygame.Rect(350, 50 + i * 200, 140, 40) for i in range(3)]
     input_texts = [""] * 3
@@ -56,32 +95,36 @@ def setup_screen():
             pygame.draw.rect(screen, WHITE, (50, 50 + i * 200, 100, 50))
             pygame.draw.rect(screen, WHITE, (200, 50 + i * 200, 100, 50))
             pygame.draw.rect(screen, WHITE, input_boxes[i], 2)
-            name_text = font.render(f"Name {i + 1}", True, WHITE)
-            warrior_text = font.render("Warrior", True, BLACK)
-            tank_text = font.render("Tank", True, BLACK)
+            name_text = render_text(f"Name {i + 1}", WHITE)
+            warrior_text = render_text("Warrior", BLACK)
+            tank_text = render_text("Tank", BLACK)
             screen.blit(name_text, (50, 20 + i * 200))
             screen.blit(warrior_text, (50, 50 + i * 200))
             screen.blit(tank_text, (200, 50 + i * 200))
             if input_texts[i]:
-                name_input = font.render(input_texts[i], True, WHITE)
+                name_input = render_text(input_texts[i], WHITE)
                 screen.blit(name_input, (input_boxes[i].x + 5, input_boxes[i].y + 5))
             if selected_types[i]:
-                type_text = font.render(selected_types[i], True, WHITE)
+                type_text = render_text(selected_types[i], WHITE)
                 screen.blit(type_text, (500, 50 + i * 200))
-        pygame.display.flip()
+        present()
 
     current_input = 0
     input_active = [False] * 3
+    needs_redraw = True  # 只在输入或选择变化时重新绘制
 
     while running and ("" in input_texts or "" in selected_types):
-        draw_setup_screen()
-        for event in pygame.event.get():
+        if needs_redraw:
+            draw_setup_screen()
+            needs_redraw = False
+        for event in wait_events():
             if event.type == pygame.QUIT:
                 logging.info("Game quit during setup screen.")
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_pos = event.pos
+                needs_redraw = True
                 for i in range(3):
                     if input_boxes[i].collidepoint(mouse_pos):
                         input_active[i] = True
@@ -103,38 +146,87 @@ def setup_screen():
                     input_texts[current_input] = input_texts[current_input][:-1]
                 else:
                     input_texts[current_input] += event.unicode
-                draw_setup_screen()
+                needs_redraw = True
+            elif event.type in REDRAW_EVENTS:
+                needs_redraw = True
 
     player_team = []
     for i in range(3):
         position = (150, 100 + i * 200)
-        player_team.append(Unit(input_texts[i], selected_types[i], position))
+        player_team.append(Unit(input_texts[i], selected_types[i], position, rng))
         logging.info(f"Created character {i + 1}: Name={input_texts[i]}, Type={selected_types[i]}.")
 
     return player_team
 
+def load_screen(slots):
+    """
+    读档界面：列出最近的存档槽（只使用存档列表中的元数据，不读取存档内容），点击一行选择该存档。
+    :param slots: 按保存时间从新到旧排列的savestore.SlotInfo列表（最多settings.LOAD_SCREEN_ROWS个）
+    :return: 选中的存档槽名称，点击Back或按Esc时返回None
+    """
+    logging.info("Entered load screen.")
+    screen = get_screen()
+    rows = [pygame.Rect(50, 100 + i * 55, screen.get_width() - 100, 45) for i in range(len(slots))]
+    back_button = pygame.Rect(50, screen.get_height() - 70, 150, 50)
+    needs_redraw = True  # 存档列表不变，只在第一次和窗口需要重绘时绘制
+
+    while True:
+        if needs_redraw:
+            screen.fill(BLACK)
+            screen.blit(render_text("Load Game" if slots else "No saved games", WHITE), (50, 40))
+            for slot, row in zip(slots, rows):
+                pygame.draw.rect(screen, WHITE, row, 2)
+                saved_at = time.strftime('%m-%d %H:%M', time.localtime(slot.saved_at))
+                screen.blit(render_text(f"{slot.name}  {saved_at}  turn {slot.turn}  {slot.gold}g  {slot.summary}",
+                                        WHITE), (row.x + 10, row.y + 10))
+            pygame.draw.rect(screen, WHITE, back_button)
+            screen.blit(render_text("Back", BLACK), (back_button.x + 50, back_button.y + 10))
+            present()
+            needs_redraw = False
+
+        for event in wait_events():
+            if event.type == pygame.QUIT:
+                logging.info("Game quit from load screen.")
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if back_button.collidepoint(event.pos):
+                    return None
+                for slot, row in zip(slots, rows):
+                    if row.collidepoint(event.pos):
+                        logging.info(f"Selected save slot: {slot.name}.")
+                        return slot.name
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                return None
+            elif event.type in REDRAW_EVENTS:
+                needs_redraw = True
+
 # 下面这一部分是cyx的内容1
 def game_over_screen(winner):
     logging.info(f"Displaying game over screen. Winner: {winner}.")
+    screen = get_screen()
     running = True
     retry_button = pygame.Rect(250, 400, 150, 50)
     quit_button = pygame.Rect(450, 400, 150, 50)
+    needs_redraw = True  # 结束界面的内容不变，只在第一次和窗口需要重绘时绘制
 
     while running:
-        screen.fill(BLACK)
-        game_over_text = font.render("Game Over", True, WHITE)
-        winner_text = font.render(f"{winner} Wins!", True, WHITE)
-        screen.blit(game_over_text, (320, 200))
-        screen.blit(winner_text, (320, 250))
-        pygame.draw.rect(screen, (0, 255, 0), retry_button)
-        pygame.draw.rect(screen, (255, 0, 0), quit_button)
-        retry_text = font.render("Retry", True, BLACK)
-        quit_text = font.render("Quit", True, BLACK)
-        screen.blit(retry_text, (retry_button.x + 40, retry_button.y + 10))
-        screen.blit(quit_text, (quit_button.x + 50, quit_button.y + 10))
-        pygame.display.flip()
-
-        for event in pygame.event.get():
+        if needs_redraw:
+            screen.fill(BLACK)
+            game_over_text = render_text("Game Over", WHITE)
+            winner_text = render_text(f"{winner} Wins!", WHITE)
+            screen.blit(game_over_text, (320, 200))
+            screen.blit(winner_text, (320, 250))
+            pygame.draw.rect(screen, (0, 255, 0), retry_button)
+            pygame.draw.rect(screen, (255, 0, 0), quit_button)
+            retry_text = render_text("Retry", BLACK)
+            quit_text = render_text("Quit", BLACK)
+            screen.blit(retry_text, (retry_button.x + 40, retry_button.y + 10))
+            screen.blit(quit_text, (quit_button.x + 50, quit_button.y + 10))
+            present()
+            needs_redraw = False
+
+        for event in wait_events():
             if event.type == pygame.QUIT:
                 logging.info("Game quit from game over screen.")
                 pygame.quit()
@@ -146,4 +238,6 @@ def game_over_screen(winner):
                 elif quit_button.collidepoint(event.pos):
                     logging.info("Quit selected from game over screen.")
                     pygame.quit()
-                    sys.exit()
\ No newline at end of file
+                    sys.exit()
+            elif event.type in REDRAW_EVENTS:
+                needs_redraw = True
\ No newline at end of file
@@ -1,26 +1,31 @@
-import pygame
 import os
 import logging
 
-# 初始化Pygame
-pygame.init()
+# 注意：导入本模块不会初始化Pygame、打开窗口或加载资源。
+# 显示器、字体、混音器和资源在第一次使用时才初始化（见文件末尾的get_screen等函数）。
+
+# 无界面模式：设置环境变量GAME_HEADLESS=1后，使用SDL的dummy显示和音频驱动，并完全跳过混音器和音乐。
+# 用于CI、批量模拟和测试等没有显示器和声卡的环境。
+HEADLESS = os.environ.get('GAME_HEADLESS', '0') not in ('', '0')
+if HEADLESS:
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
 
 # 屏幕设置
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Turn-based Battle Game")
+SCREEN_CAPTION = "Turn-based Battle Game"
 
 # 定义资源文件目录
 BASE_DIR = os.path.dirname(__file__)  # 获取当前文件的目录
 IMAGE_DIR = os.path.join(BASE_DIR, 'images')  # 图片文件夹路径
 SOUND_DIR = os.path.join(BASE_DIR, 'sounds')  # 音效文件夹路径
 
-# 加载图片资源
-background_img = pygame.image.load(os.path.join(IMAGE_DIR, 'battle_background.png'))
+# 预解码的资源包（由assetbundle.py生成）。存在时图片和音效从资源包映射，不存在时从资源目录逐个加载。
+ASSET_BUNDLE = os.path.join(BASE_DIR, 'assets.bundle')
 
-# 加载音效资源
-attack_sound = pygame.mixer.Sound(os.path.join(SOUND_DIR, 'attack_sound.wav'))
+# 战斗界面背景图片路径
+BATTLE_BACKGROUND = os.path.join(IMAGE_DIR, 'battle_background.png')
 
 # 定义选择职业界面的背景图片路径
 SETUP_SCREEN_BACKGROUND = os.path.join(IMAGE_DIR, 'setup_background.png')
@@ -35,7 +40,6 @@ GOLD = (255, 215, 0)
 # 字体设置
 FONT_NAME = 'Arial'
 FONT_SIZE = 25
-font = pygame.font.SysFont(FONT_NAME, FONT_SIZE)
 
 # 图片资源
 START_SCREEN_IMG1 = os.path.join(IMAGE_DIR, 'image1.png')
@@ -68,41 +72,159 @@ class GameState:
     SETUP = 'setup'
     BATTLE = 'battle'
     GAME_OVER = 'game_over'
+    LOAD = 'load'
 
 # FPS设置
 FPS = 60
-
-# 日志设置
+MENU_EVENT_TIMEOUT_MS = 1000  # 菜单界面等待事件的最长时间（毫秒），画面不变时只在事件到达或超时时醒来
+
+# 动画设置
+ATTACK_ANIMATION_DURATION = 500  # 攻击动画时长（毫秒）
+FAST_FORWARD_SPEED = 4  # 快进时的动画速度倍数（战斗中按F键切换）
+
+# AI设置：'search'为在进程池中运行的搜索型AI，'random'为随机选择攻击者和目标
+AI_MODE = 'search'
+AI_TIME_BUDGET_MS = 300  # 搜索型AI每回合的思考时间（毫秒）
+AI_WORKERS = None  # 搜索使用的进程数，None表示使用全部CPU核
+AI_MAX_DEPTH = 8  # 最大搜索深度（攻击次数）
+
+# 胜率提示：战斗中显示双方都随机行动时玩家获胜的精确概率（odds.py）。每帧最多访问ODDS_CHILDREN_PER_FRAME个后继局面
+# （约1毫秒），进度保留到下一帧；一个局面累计超过ODDS_HINT_MAX_CHILDREN个仍未算完时不显示（开局时状态太多，通常在残局时才能算出）。
+# 任何一方存活单位超过ODDS_HINT_MAX_UNITS个时不计算
+ODDS_HINT = True
+ODDS_CHILDREN_PER_FRAME = 2000
+ODDS_HINT_MAX_CHILDREN = 1_000_000
+ODDS_HINT_MAX_UNITS = 4
+
+# 渲染设置：开启后战斗界面只重绘并提交发生变化的区域（脏矩形），适合低性能设备
+DIRTY_RECT_RENDERING = False
+
+# 性能分析设置：战斗中按F3开关逐帧分阶段计时和性能浮层，按F4导出Chrome trace文件（chrome://tracing）
+PROFILE_ENABLED = os.environ.get('GAME_PROFILE', '0') not in ('', '0')  # 启动时即开启分析
+PROFILE_WINDOW = 300  # 统计p50/p99时使用最近多少帧
+PROFILE_MAX_TRACE_EVENTS = 200000  # 保留的trace事件数量上限
+PROFILE_TRACE_FILE = os.path.join(BASE_DIR, 'frame_trace.json')
+
+# 日志设置（日志由game_logging.setup_logging()配置，在后台线程中写入）
 LOG_FILE = os.path.join(BASE_DIR, 'game_log.txt')
 LOG_LEVEL = logging.INFO
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
-
-# 存档设置
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+COMBAT_LOG_FILE = os.path.join(BASE_DIR, 'combat_log.jsonl')  # 结构化战斗事件日志
+LOG_BATCH_SIZE = 64  # 结构化日志每批写入的记录数
+LOG_FLUSH_INTERVAL = 1.0  # 结构化日志两次写入之间的最长间隔（秒）
+# 文本日志轮转：超过LOG_MAX_BYTES字节或距上次轮转超过LOG_ROTATE_INTERVAL秒时，
+# 把game_log.txt压缩为game_log.txt.1.gz（旧的依次改名为.2.gz、.3.gz……），最多保留LOG_BACKUP_COUNT个
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 7 * 24 * 3600
+LOG_BACKUP_COUNT = 20
+
+# 存档设置：存档保存在SQLite数据库的多个存档槽中（见savestore.py），每场对局的手动存档使用各自的存档槽，
+# 自动存档每回合追加一行增量。旧的单一存档文件SAVE_FILE在第一次打开数据库时导入为一个存档槽
 SAVE_FILE = os.path.join(BASE_DIR, 'save_file.json')
+SAVE_DB = os.environ.get('GAME_SAVE_DB') or os.path.join(BASE_DIR, 'saves.db')  # 环境变量GAME_SAVE_DB可指定其他数据库（如基准测试使用临时文件）
+AUTOSAVE_SLOT = 'autosave'  # 自动存档槽的名称，对局没有正常结束（如崩溃）时留在存档列表中，可以继续
+LOAD_SCREEN_ROWS = 8  # 读档界面显示的最近存档数量
+
+# 录像设置：每场对局的操作都记录到REPLAY_DIR下的事件流文件中，可用replay.py回放
+RECORD_REPLAYS = True
+REPLAY_DIR = os.path.join(BASE_DIR, 'replays')
+
+
+# 对局种子：设置环境变量GAME_SEED可复现某一场对局（同样的操作得到同样的结果）
+def parse_match_seed(value):
+    """
+    解析GAME_SEED。未设置时返回None（每局随机生成种子）；不是整数时记录警告并同样返回None，
+    不让settings的导入失败（游戏、基准测试和工具都依赖它）。
+    """
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logging.getLogger(__name__).warning("GAME_SEED must be an integer, got %r; using a random seed instead.", value)
+        return None
+
 
-# 初始化混音器
-pygame.mixer.init()
+MATCH_SEED = parse_match_seed(os.environ.get('GAME_SEED', '').strip())
 
 # 设置音量
 MUSIC_VOLUME = 0.5
 SFX_VOLUME = 0.7
-pygame.mixer.music.set_volume(MUSIC_VOLUME)
-attack_sound.set_volume(SFX_VOLUME)
+
+# 音效设置：音效在音效库（sound.py）中预先解码，并在保留的声道中播放
+SOUND_CHANNELS = 16  # 混音器的声道总数
+SOUND_RESERVED_CHANNELS = 8  # 保留给音效库的声道数
+# 音效名称 -> (文件路径, 优先级, 同时播放的最大数量)；声道不够时，优先级高的音效可以抢占优先级低或相同的音效
+SOUND_EFFECTS = {
+    'attack': (ATTACK_SOUND, 1, 4),
+}
+
+# 延迟初始化的对象，第一次使用时创建
+_screen = None
+_font = None
+_audio_ready = None
+
+
+def get_screen():
+    """
+    返回游戏窗口的屏幕对象，第一次调用时初始化显示器并创建窗口。
+    """
+    global _screen
+    if _screen is None:
+        import pygame
+        pygame.display.init()
+        _screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption(SCREEN_CAPTION)
+    return _screen
+
+
+def get_font():
+    """
+    返回游戏使用的字体，第一次调用时初始化字体模块。
+    """
+    global _font
+    if _font is None:
+        import pygame
+        pygame.font.init()
+        _font = pygame.font.SysFont(FONT_NAME, FONT_SIZE)
+    return _font
+
+
+def get_background_img():
+    """
+    返回战斗界面的背景图片。先初始化显示器，以便图片被转换为显示格式。
+    """
+    from assets import load_image
+    get_screen()
+    return load_image(BATTLE_BACKGROUND)
+
+
+def init_audio():
+    """
+    初始化混音器并设置音量。无界面模式或没有音频设备时返回False。
+    """
+    global _audio_ready
+    if _audio_ready is None:
+        _audio_ready = False
+        if not HEADLESS:
+            import pygame
+            try:
+                pygame.mixer.init()
+                pygame.mixer.music.set_volume(MUSIC_VOLUME)
+                _audio_ready = True
+            except pygame.error as e:
+                logging.error(f"Failed to initialize audio: {e}")
+    return _audio_ready
+
 
 # 播放背景音乐
 def play_background_music():
+    if not init_audio():
+        return
+    import pygame
     try:
         pygame.mixer.music.load(BACKGROUND_MUSIC)
         pygame.mixer.music.play(-1)  # -1 表示循环播放
         logging.info("Background music started playing.")
     except pygame.error as e:
         logging.error(f"Failed to play background music: {e}")
-
-play_background_music()
\ No newline at end of file
@@ -0,0 +1,193 @@
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from combat import UNIT_STATS, UNIT_TYPES, BASE_HP, DAMAGE_VARIANCE, EXP_PER_LEVEL
+
+# 无界面的批量战斗模拟器：用NumPy数组同时模拟大量对局，规则与Unit.attack/Unit.level_up一致，
+# 回合流程与main.py中的game_loop一致（玩家先手，双方轮流各攻击一次，一方全灭即结束）。
+# 双方都按AI的策略行动：随机选择一个存活的攻击者和一个存活的目标。
+
+BatchResult = namedtuple('BatchResult', ['player_wins', 'finished', 'turns', 'player_hp', 'ai_hp',
+                                         'player_level', 'ai_level'])
+
+
+def roll_team(rng, n_matches, unit_types):
+    """
+    为每场对局随机生成一支队伍的攻击力和防御力。
+    :param rng: numpy.random.Generator
+    :param n_matches: 对局数量
+    :param unit_types: 队伍中各单位的类型列表，如['Warrior', 'Warrior', 'Tank']
+    :return: (atk, defense)，形状均为(n_matches, 队伍人数)
+    """
+    atk = np.empty((n_matches, len(unit_types)), dtype=np.int32)
+    defense = np.empty_like(atk)
+    for i, unit_type in enumerate(unit_types):
+        low, high = UNIT_STATS[unit_type]['atk']
+        atk[:, i] = rng.integers(low, high + 1, size=n_matches)
+        low, high = UNIT_STATS[unit_type]['defense']
+        defense[:, i] = rng.integers(low, high + 1, size=n_matches)
+    return atk, defense
+
+
+def pick_alive(rng, alive):
+    """
+    在每场对局的存活单位中等概率随机选择一个，相当于random.choice(alive_team)。
+    :param rng: numpy.random.Generator
+    :param alive: 存活掩码，形状为(n_matches, 队伍人数)
+    :return: 每场对局选中单位的下标
+    """
+    weights = rng.random(alive.shape, dtype=np.float32)
+    weights[~alive] = -1.0
+    return weights.argmax(axis=1)
+
+
+def attack(rng, active, atk, exp, level, attackers, defense, hp, targets):
+    """
+    对所有进行中的对局同时执行一次攻击，规则与Unit.attack相同。
+    数组按行展开后用一维下标访问，比二维花式索引快得多。
+    :param rng: numpy.random.Generator
+    :param active: 进行中的对局掩码，已结束对局的伤害记为0，状态保持不变
+    :param atk, exp, level: 攻击方队伍的数组（exp和level原地更新）
+    :param attackers: 每场对局的攻击者下标
+    :param defense, hp: 防守方队伍的数组（hp原地更新）
+    :param targets: 每场对局的目标下标
+    """
+    attacker_flat = np.arange(0, atk.size, atk.shape[1]) + attackers
+    target_flat = np.arange(0, hp.size, hp.shape[1]) + targets
+    exp_flat = exp.reshape(-1)
+    low, high = DAMAGE_VARIANCE
+    damage = atk.reshape(-1)[attacker_flat] - defense.reshape(-1)[target_flat]
+    damage += rng.integers(low, high + 1, size=damage.size, dtype=np.int32)
+    np.maximum(damage, 0, out=damage)  # 确保伤害值不为负
+    damage *= active
+    hp.reshape(-1)[target_flat] -= damage
+    exp_flat[attacker_flat] += damage
+
+    # 每次攻击最多升一级，与Unit.attack中的检查一致
+    leveled = attacker_flat[exp_flat[attacker_flat] >= EXP_PER_LEVEL]
+    level.reshape(-1)[leveled] += 1
+    exp_flat[leveled] -= EXP_PER_LEVEL
+
+
+def simulate_chunk(rng, n_matches, player_types, ai_types, max_turns):
+    """
+    模拟一批对局，返回BatchResult。
+    已分出胜负的对局不再变化；当结束的对局足够多时，将其移出工作数组，后面的回合只处理仍在进行的对局。
+    """
+    player_atk, player_def = roll_team(rng, n_matches, player_types)
+    ai_atk, ai_def = roll_team(rng, n_matches, ai_types)
+    player_hp = np.full(player_atk.shape, BASE_HP, dtype=np.int32)
+    ai_hp = np.full(ai_atk.shape, BASE_HP, dtype=np.int32)
+    player_exp = np.zeros_like(player_hp)
+    ai_exp = np.zeros_like(ai_hp)
+    player_level = np.ones_like(player_hp)
+    ai_level = np.ones_like(ai_hp)
+
+    # 结果数组，按原始对局顺序保存
+    result = BatchResult(
+        player_wins=np.zeros(n_matches, dtype=bool),
+        finished=np.ones(n_matches, dtype=bool),
+        turns=np.zeros(n_matches, dtype=np.int32),
+        player_hp=player_hp.copy(),
+        ai_hp=ai_hp.copy(),
+        player_level=player_level.copy(),
+        ai_level=ai_level.copy(),
+    )
+    index = np.arange(n_matches)  # 工作数组中每一行对应的原始对局下标
+    active = np.ones(n_matches, dtype=bool)
+
+    for turn in range(max_turns + 1):
+        player_alive = player_hp > 0
+        ai_alive = ai_hp > 0
+        player_any = player_alive.any(axis=1)
+        ai_any = ai_alive.any(axis=1)
+        done = active & ~(player_any & ai_any)
+        if turn == max_turns:
+            done = active
+        if done.any():
+            # 记录本回合结束的对局的结果
+            finished = index[done]
+            result.player_wins[finished] = player_any[done] & ~ai_any[done]
+            result.finished[finished] = ~(player_any[done] & ai_any[done])
+            result.turns[finished] = turn
+            result.player_hp[finished] = player_hp[done]
+            result.ai_hp[finished] = ai_hp[done]
+            result.player_level[finished] = player_level[done]
+            result.ai_level[finished] = ai_level[done]
+            active &= ~done
+            n_active = np.count_nonzero(active)
+            if n_active == 0:
+                break
+            if n_active < len(active) // 2:
+                # 已结束的对局过半时压缩工作数组
+                index = index[active]
+                player_alive, ai_alive = player_alive[active], ai_alive[active]
+                player_atk, player_def, player_hp, player_exp, player_level = (
+                    array[active] for array in (player_atk, player_def, player_hp, player_exp, player_level))
+                ai_atk, ai_def, ai_hp, ai_exp, ai_level = (
+                    array[active] for array in (ai_atk, ai_def, ai_hp, ai_exp, ai_level))
+                active = np.ones(n_active, dtype=bool)
+
+        if turn % 2 == 0:  # 玩家回合
+            attack(rng, active, player_atk, player_exp, player_level, pick_alive(rng, player_alive),
+                   ai_def, ai_hp, pick_alive(rng, ai_alive))
+        else:  # AI回合
+            attack(rng, active, ai_atk, ai_exp, ai_level, pick_alive(rng, ai_alive),
+                   player_def, player_hp, pick_alive(rng, player_alive))
+
+    return result
+
+
+def simulate_battles(n_matches, player_types, ai_types, seed=None, max_turns=1000, chunk_size=65536):
+    """
+    批量模拟对局，不依赖pygame。
+    :param n_matches: 对局数量
+    :param player_types: 玩家队伍的单位类型列表
+    :param ai_types: AI队伍的单位类型列表
+    :param seed: 随机种子，相同的种子得到相同的结果
+    :param max_turns: 每场对局的最大回合数，超过则视为未分胜负
+    :param chunk_size: 每批同时模拟的对局数，用于限制内存占用
+    :return: BatchResult，各字段为按对局排列的数组
+    """
+    for unit_type in list(player_types) + list(ai_types):
+        if unit_type not in UNIT_STATS:
+            raise ValueError(f"Unknown unit type: {unit_type}")
+
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for start in range(0, n_matches, chunk_size):
+        size = min(chunk_size, n_matches - start)
+        chunks.append(simulate_chunk(rng, size, player_types, ai_types, max_turns))
+    if len(chunks) == 1:
+        return chunks[0]
+    return BatchResult(*(np.concatenate(field) for field in zip(*chunks)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch battle simulator.")
+    parser.add_argument('-n', '--matches', type=int, default=1_000_000, help="number of matches to simulate")
+    parser.add_argument('--player', nargs='+', choices=UNIT_TYPES, default=['Warrior', 'Warrior', 'Tank'],
+                        help="player team unit types")
+    parser.add_argument('--ai', nargs='+', choices=UNIT_TYPES, default=['Warrior', 'Warrior', 'Tank'],
+                        help="AI team unit types")
+    parser.add_argument('--seed', type=int, default=None, help="random seed")
+    parser.add_argument('--max-turns', type=int, default=1000, help="turn limit per match")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = simulate_battles(args.matches, args.player, args.ai, seed=args.seed, max_turns=args.max_turns)
+    elapsed = time.perf_counter() - start
+
+    print(f"Player {args.player} vs AI {args.ai}: {args.matches} matches in {elapsed:.2f}s")
+    print(f"Player win rate: {result.player_wins.mean():.4f}")
+    print(f"Unfinished matches: {(~result.finished).sum()}")
+    print(f"Average turns: {result.turns.mean():.2f}")
+    print(f"Average max level: player {result.player_level.max(axis=1).mean():.2f}, "
+          f"AI {result.ai_level.max(axis=1).mean():.2f}")
+
+
+if __name__ == "__main__":
+    main()
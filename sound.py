@@ -0,0 +1,147 @@
+import logging
+import time
+
+import pygame
+
+from assets import assets
+from settings import init_audio, play_background_music, SFX_VOLUME, SOUND_CHANNELS, SOUND_RESERVED_CHANNELS, \
+    SOUND_EFFECTS
+
+# 音效库：所有音效在第一次使用音频时一次性解码到混音器的缓冲区中，之后播放不再读取文件。
+# 音效只在保留的声道中播放，由音效库自己分配声道：
+#   1. 有空闲声道时使用空闲声道；
+#   2. 同一音效正在播放的数量达到上限时，停掉其中最早开始的一个；
+#   3. 没有空闲声道时，抢占优先级不高于新音效的声道中最早开始的一个，否则放弃本次播放。
+# 同一帧内同一个音效只播放一次（快进或大规模战斗中多次攻击同时结算时不会叠加成噪音）。
+# 背景音乐在第一帧画面显示之后才开始加载和播放，不拖慢启动。
+
+
+class SoundEffect:
+    def __init__(self, name, sound, priority, max_voices):
+        self.name = name
+        self.sound = sound
+        self.priority = priority
+        self.max_voices = max_voices
+
+
+class SoundBank:
+    def __init__(self, effects=SOUND_EFFECTS, channels=SOUND_CHANNELS, reserved=SOUND_RESERVED_CHANNELS):
+        """
+        初始化音效库（不会立即初始化混音器）。
+        :param effects: 音效名称 -> (文件路径, 优先级, 同时播放的最大数量)
+        :param channels: 混音器的声道总数
+        :param reserved: 保留给音效库的声道数
+        """
+        self.effect_specs = effects
+        self.channel_count = channels
+        self.reserved = reserved
+        self.ready = None  # None表示尚未初始化，False表示音频不可用
+        self.effects = {}
+        self.channels = []
+        self.voices = []  # 每个声道上正在播放的(音效名称, 优先级, 开始时间)，空闲时为None
+        self.played_this_frame = set()
+        self.music_started = False
+        self.played = 0
+        self.dropped = 0
+        self.stolen = 0
+
+    def init(self):
+        """
+        初始化混音器、保留声道并解码所有音效。音频不可用时返回False。
+        """
+        if self.ready is None:
+            self.ready = init_audio()
+            if self.ready:
+                pygame.mixer.set_num_channels(self.channel_count)
+                pygame.mixer.set_reserved(self.reserved)  # 保留的声道不会被Sound.play()自动占用
+                self.channels = [pygame.mixer.Channel(i) for i in range(self.reserved)]
+                self.voices = [None] * self.reserved
+                for name, (path, priority, max_voices) in self.effect_specs.items():
+                    try:
+                        sound = assets.load_sound(path)
+                    except pygame.error as e:
+                        logging.error(f"Failed to load sound {path}: {e}")
+                        continue
+                    sound.set_volume(SFX_VOLUME)
+                    self.effects[name] = SoundEffect(name, sound, priority, max_voices)
+        return self.ready
+
+    def new_frame(self):
+        """
+        开始新的一帧，重置每帧的播放限制。游戏循环每帧调用一次。
+        """
+        self.played_this_frame.clear()
+
+    def find_channel(self, effect):
+        """
+        按空闲、同音效数量上限、优先级抢占的顺序选择声道，没有可用声道时返回None。
+        """
+        now = time.monotonic()
+        same = []
+        stealable = []
+        free = None
+        for index, channel in enumerate(self.channels):
+            voice = self.voices[index]
+            if voice is None or not channel.get_busy():
+                self.voices[index] = None
+                if free is None:
+                    free = index
+                continue
+            name, priority, started = voice
+            if name == effect.name:
+                same.append((started, index))
+            if priority <= effect.priority:
+                stealable.append((priority, started, index))
+        if len(same) >= effect.max_voices:
+            self.stolen += 1
+            return min(same)[1]
+        if free is not None:
+            return free
+        if stealable:
+            self.stolen += 1
+            return min(stealable)[2]
+        return None
+
+    def play(self, name):
+        """
+        播放音效。音频不可用、本帧已播放过或没有可用声道时不播放。
+        :param name: 音效名称
+        :return: 播放所用的声道，没有播放时返回None
+        """
+        if not self.init():
+            return None
+        effect = self.effects.get(name)
+        if effect is None:
+            return None
+        if name in self.played_this_frame:
+            self.dropped += 1
+            return None
+        index = self.find_channel(effect)
+        if index is None:
+            self.dropped += 1
+            return None
+        channel = self.channels[index]
+        channel.play(effect.sound)
+        self.voices[index] = (name, effect.priority, time.monotonic())
+        self.played_this_frame.add(name)
+        self.played += 1
+        return channel
+
+    def start_music(self):
+        """
+        开始播放背景音乐（只执行一次）。应在第一帧画面显示之后调用。
+        """
+        if self.music_started:
+            return
+        self.music_started = True
+        if self.init():
+            play_background_music()
+
+    def stats(self):
+        """
+        返回播放统计：播放次数、放弃次数和抢占次数。
+        """
+        return {"played": self.played, "dropped": self.dropped, "stolen": self.stolen}
+
+
+sound_bank = SoundBank()  # 游戏使用的全局音效库
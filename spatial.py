@@ -0,0 +1,106 @@
+import math
+
+# 单位位置的均匀网格索引：屏幕按cell_size划分成格子，每个格子记录位于其中的单位。
+# 点击拾取和范围查询只检查附近的几个格子，耗时与单位总数无关。
+# 单位移动、阵亡或复活时调用update()增量更新，不需要每帧重建索引。
+
+UNIT_PICK_RADIUS = 30  # 点击选中单位的半径（像素）
+DEFAULT_CELL_SIZE = 64  # 格子边长，取略大于拾取直径的值，一次拾取最多检查4个格子
+
+
+class SpatialGrid:
+    def __init__(self, units=(), cell_size=DEFAULT_CELL_SIZE):
+        """
+        建立索引，只收录存活（hp>0）的单位。
+        :param units: 初始单位
+        :param cell_size: 格子边长（像素）
+        """
+        self.cell_size = cell_size
+        self.cells = {}  # (格子x, 格子y) -> [单位]
+        self.unit_cells = {}  # 单位 -> 所在格子
+        for unit in units:
+            self.update(unit)
+
+    def __len__(self):
+        return len(self.unit_cells)
+
+    def __contains__(self, unit):
+        return unit in self.unit_cells
+
+    def cell_of(self, position):
+        return int(position[0] // self.cell_size), int(position[1] // self.cell_size)
+
+    def insert(self, unit):
+        cell = self.cell_of(unit.position)
+        self.cells.setdefault(cell, []).append(unit)
+        self.unit_cells[unit] = cell
+
+    def remove(self, unit):
+        cell = self.unit_cells.pop(unit, None)
+        if cell is None:
+            return
+        bucket = self.cells[cell]
+        bucket.remove(unit)
+        if not bucket:
+            del self.cells[cell]
+
+    def update(self, unit):
+        """
+        根据单位当前的位置和生命值更新索引：阵亡的单位被移除，复活的单位被加入，移动的单位换到新的格子。
+        :param unit: 状态可能发生变化的单位
+        """
+        cell = self.unit_cells.get(unit)
+        if unit.hp <= 0:
+            if cell is not None:
+                self.remove(unit)
+        elif cell is None:
+            self.insert(unit)
+        elif cell != self.cell_of(unit.position):
+            self.remove(unit)
+            self.insert(unit)
+
+    def cells_in_rect(self, left, top, right, bottom):
+        """
+        返回与矩形相交的所有非空格子中的单位。
+        """
+        x0, y0 = self.cell_of((left, top))
+        x1, y1 = self.cell_of((right, bottom))
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):  # 矩形很大时直接遍历非空格子
+            for (x, y), bucket in self.cells.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    yield from bucket
+            return
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield from self.cells.get((x, y), ())
+
+    def query_point(self, point, radius=UNIT_PICK_RADIUS):
+        """
+        返回与点的距离不超过radius的所有单位。
+        :param point: (x, y)屏幕坐标
+        :param radius: 半径（像素）
+        """
+        px, py = point
+        return [unit for unit in self.cells_in_rect(px - radius, py - radius, px + radius, py + radius)
+                if (px - unit.position[0]) ** 2 + (py - unit.position[1]) ** 2 <= radius ** 2]
+
+    def query_rect(self, rect):
+        """
+        返回位置在矩形内的所有单位。
+        :param rect: pygame.Rect或(x, y, 宽, 高)
+        """
+        left, top, width, height = rect
+        right, bottom = left + width, top + height
+        return [unit for unit in self.cells_in_rect(left, top, right, bottom)
+                if left <= unit.position[0] < right and top <= unit.position[1] < bottom]
+
+    def pick(self, point, radius=UNIT_PICK_RADIUS):
+        """
+        返回点击位置选中的单位（距离最近的一个），没有时返回None。
+        :param point: 鼠标点击的位置
+        :param radius: 选中半径（像素）
+        """
+        candidates = self.query_point(point, radius)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda unit: math.dist(point, unit.position))
@@ -0,0 +1,11 @@
+# 统计工具：不依赖pygame，游戏内的性能分析器和命令行工具（如负载生成器）共用。
+
+
+def percentile(ordered, q):
+    """
+    已排序样本的第q百分位数（最近秩法）。
+    """
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,247 @@
+import random
+from collections.abc import Sequence
+
+import numpy as np
+
+from combat import BASE_HP, DAMAGE_VARIANCE, EXP_PER_LEVEL, roll_damage
+from game_logging import log_attack, log_level_up
+from unit import Unit, health_bar
+
+# 列式（struct-of-arrays）队伍存储：一支队伍的生命值、属性、经验、等级和位置各存放在一个NumPy数组中，
+# 存活判断、伤害结算和升级可以对整支队伍一次完成。
+# 队伍中的每个单位以UnitView的形式出现，它是Unit的子类，读写的都是队伍数组中的对应元素，
+# 因此Unit.draw、存档和读档等代码不需要修改。
+# 逐个属性读写数组元素比普通属性慢得多，每帧和每次攻击都要执行的代码不经过这些属性：
+# UnitView.attack直接读写数组，Team.draw和Team.unit_states每帧把整列转换为列表后再逐个单位处理。
+
+COLUMNS = ('hp', 'max_hp', 'atk', 'defense', 'exp', 'level', 'x', 'y')
+
+
+def column_property(column):
+    """
+    生成读写队伍数组中某一列的属性，读取时返回Python整数，便于格式化和存档。
+    """
+    def getter(self):
+        return int(getattr(self.team, column)[self.index])
+
+    def setter(self, value):
+        getattr(self.team, column)[self.index] = value
+
+    return property(getter, setter)
+
+
+class UnitView(Unit):
+    def __init__(self, team, index):
+        """
+        队伍中一个单位的视图，数值属性保存在队伍的数组中。
+        :param team: 所属的Team
+        :param index: 单位在队伍中的下标
+        """
+        self.team = team
+        self.index = index
+        self.text_state = None
+        self.text_surfaces = None
+        self.sprite = None
+
+    hp = column_property('hp')
+    max_hp = column_property('max_hp')
+    atk = column_property('atk')
+    defense = column_property('defense')
+    exp = column_property('exp')
+    level = column_property('level')
+
+    @property
+    def name(self):
+        return self.team.names[self.index]
+
+    @property
+    def unit_type(self):
+        return self.team.unit_types[self.index]
+
+    @property
+    def position(self):
+        return int(self.team.x[self.index]), int(self.team.y[self.index])
+
+    @position.setter
+    def position(self, value):
+        self.team.x[self.index], self.team.y[self.index] = value
+
+    def attack(self, target, rng=random):
+        """
+        与Unit.attack相同，但直接读写队伍数组，攻击者和目标的每个数值只读写一次。
+        """
+        if not isinstance(target, UnitView):
+            return super().attack(target, rng)
+        team, index = self.team, self.index
+        target_team, target_index = target.team, target.index
+        damage = roll_damage(team.atk.item(index), target_team.defense.item(target_index), rng)
+        target_hp = target_team.hp.item(target_index) - damage
+        target_team.hp[target_index] = target_hp
+        exp = team.exp.item(index) + damage
+        level = team.level.item(index)
+        if exp >= EXP_PER_LEVEL:  # 升级
+            exp -= EXP_PER_LEVEL
+            level += 1
+            team.level[index] = level
+            team.exp[index] = exp
+            log_level_up(self)
+        else:
+            team.exp[index] = exp
+        log_attack(self, target, damage, level, target_hp)
+        return damage
+
+    def load(self, data):
+        """
+        把Unit.to_dict()格式的数据写入对应的数组元素（名称和类型在建立队伍时已确定）。
+        """
+        for key in ('hp', 'max_hp', 'atk', 'defense', 'exp', 'level'):
+            setattr(self, key, data[key])
+        self.position = data["position"]
+
+
+class Team(Sequence):
+    def __init__(self, names, unit_types):
+        """
+        建立一支空白队伍（生命值满，属性和位置为0），通常使用from_units()或from_dicts()创建。
+        :param names: 单位名称列表
+        :param unit_types: 单位类型列表
+        """
+        self.names = list(names)
+        self.unit_types = list(unit_types)
+        size = len(self.names)
+        for column in COLUMNS:
+            setattr(self, column, np.zeros(size, dtype=np.int32))
+        self.hp[:] = BASE_HP
+        self.max_hp[:] = BASE_HP
+        self.level[:] = 1
+        self.views = [UnitView(self, i) for i in range(size)]
+
+    @classmethod
+    def from_units(cls, units):
+        """
+        用已有的单位（Unit或UnitView）建立队伍，复制它们的全部状态。
+        """
+        units = list(units)
+        team = cls([unit.name for unit in units], [unit.unit_type for unit in units])
+        for i, unit in enumerate(units):
+            team.views[i].load(unit.to_dict())
+        return team
+
+    @classmethod
+    def from_dicts(cls, unit_dicts):
+        """
+        根据Unit.to_dict()格式的数据建立队伍。
+        """
+        unit_dicts = list(unit_dicts)
+        team = cls([data["name"] for data in unit_dicts], [data["type"] for data in unit_dicts])
+        for view, data in zip(team.views, unit_dicts):
+            view.load(data)
+        return team
+
+    def __len__(self):
+        return len(self.views)
+
+    def __getitem__(self, index):
+        return self.views[index]
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def __contains__(self, unit):
+        return isinstance(unit, UnitView) and unit.team is self
+
+    def index(self, unit, *args):
+        if unit in self:
+            return unit.index
+        raise ValueError(f"{unit!r} is not in team")
+
+    def alive_mask(self):
+        return self.hp > 0
+
+    def alive(self):
+        """
+        返回存活单位的列表（按队伍顺序）。
+        """
+        return [self.views[i] for i in np.flatnonzero(self.hp > 0)]
+
+    def dead(self):
+        """
+        返回阵亡单位的列表（按队伍顺序）。
+        """
+        return [self.views[i] for i in np.flatnonzero(self.hp <= 0)]
+
+    def to_dicts(self):
+        """
+        全部单位的Unit.to_dict()格式数据，按列一次取出，不逐个读取视图的属性。
+        """
+        columns = zip(self.names, self.unit_types, self.x.tolist(), self.y.tolist(), self.hp.tolist(),
+                      self.max_hp.tolist(), self.atk.tolist(), self.defense.tolist(), self.level.tolist(),
+                      self.exp.tolist())
+        return [{"name": name, "type": unit_type, "position": [x, y], "hp": hp, "max_hp": max_hp, "atk": atk,
+                 "defense": defense, "level": level, "exp": exp}
+                for name, unit_type, x, y, hp, max_hp, atk, defense, level, exp in columns]
+
+    def unit_states(self):
+        """
+        每个单位的(视图, 绘制状态)，绘制状态与DirtyRectRenderer.set_unit使用的相同，阵亡单位的状态为None。
+        """
+        columns = zip(self.x.tolist(), self.y.tolist(), self.hp.tolist(), self.max_hp.tolist(),
+                      self.level.tolist(), self.exp.tolist(), self.names)
+        return [(view, ((x, y), hp, max_hp, level, exp, name) if hp > 0 else None)
+                for view, (x, y, hp, max_hp, level, exp, name) in zip(self.views, columns)]
+
+    def draw(self, screen):
+        """
+        按队伍顺序绘制全部存活单位，结果与逐个调用Unit.draw相同：每个单位依次绘制生命条、图像和文字，
+        全部合并为一次screen.blits调用。
+        """
+        blits = []
+        x, y, hp, max_hp, level, exp = (getattr(self, column).tolist()
+                                        for column in ('x', 'y', 'hp', 'max_hp', 'level', 'exp'))
+        for i in np.flatnonzero(self.hp > 0).tolist():
+            view = self.views[i]
+            image = view.image
+            width, height = image.get_size()
+            ux, uy = x[i], y[i]
+            hp_text, level_text, exp_text = view.text_surfaces_for((self.names[i], hp[i], level[i], exp[i]))
+            blits += ((health_bar(width, hp[i], max_hp[i]), (ux - width // 2, uy - height // 2 - 10)),
+                      (image, (ux - width // 2, uy - height // 2)),
+                      (hp_text, (ux - 40, uy - 50)),
+                      (level_text, (ux - 40, uy - 70)),
+                      (exp_text, (ux - 40, uy - 90)))
+        screen.blits(blits, doreturn=False)
+
+    def roll_damage(self, attackers, target_team, targets, rng):
+        """
+        同时计算多次攻击的伤害，规则与combat.roll_damage相同。
+        :param attackers: 本队攻击者的下标数组
+        :param target_team: 被攻击的队伍
+        :param targets: 目标在target_team中的下标数组
+        :param rng: numpy.random.Generator
+        """
+        low, high = DAMAGE_VARIANCE
+        damage = self.atk[attackers] - target_team.defense[targets]
+        damage += rng.integers(low, high + 1, size=damage.size, dtype=np.int32)
+        return np.maximum(damage, 0, out=damage)
+
+    def apply_damage(self, attackers, target_team, targets, damage):
+        """
+        结算多次攻击：目标扣除生命值，攻击者获得经验并检查升级，规则与Unit.attack相同。
+        同一个下标出现多次时累加。
+        """
+        np.subtract.at(target_team.hp, targets, damage)
+        np.add.at(self.exp, attackers, damage)
+        self.resolve_level_ups(np.unique(attackers))
+
+    def resolve_level_ups(self, indices=None):
+        """
+        经验值达到100的单位升一级（每次结算最多一级，与Unit.attack一致）。
+        :param indices: 需要检查的单位下标，默认为整支队伍
+        :return: 升级的单位下标
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        leveled = indices[self.exp[indices] >= EXP_PER_LEVEL]
+        self.level[leveled] += 1
+        self.exp[leveled] -= EXP_PER_LEVEL
+        return leveled
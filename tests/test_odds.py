@@ -0,0 +1,29 @@
+import math
+
+from odds import AI, PLAYER, Odds, OddsHint, UnitSpec, win_odds
+from team import Team
+
+
+def test_stalemate_when_neither_side_can_deal_damage():
+    for side in (PLAYER, AI):
+        odds = win_odds([UnitSpec(5, 20, 20)], [UnitSpec(5, 20, 20)], side)
+        assert odds.win == 0.0 and math.isinf(odds.turns)
+
+
+def test_stalemate_reached_after_a_kill():
+    # 玩家的第一个单位能击败AI的第一个单位，之后剩下的单位谁也打不动谁
+    player = [UnitSpec(40, 5, 1), UnitSpec(5, 50, 20)]
+    ai = [UnitSpec(5, 5, 1), UnitSpec(5, 50, 20)]
+    odds = win_odds(player, ai)
+    assert odds.win == 0.0 and math.isinf(odds.turns)
+    assert win_odds(player[:1], ai[:1]) == Odds(1.0, 1.0)
+
+
+def test_hint_reports_a_stalemate():
+    player_team = Team.from_dicts([{"name": "P", "type": "Tank", "position": [0, 0], "hp": 20, "max_hp": 20,
+                                    "atk": 5, "defense": 20, "level": 1, "exp": 0}])
+    ai_team = Team.from_dicts([{"name": "A", "type": "Tank", "position": [0, 0], "hp": 20, "max_hp": 20,
+                                "atk": 5, "defense": 20, "level": 1, "exp": 0}])
+    hint = OddsHint(player_team, ai_team, 2000, 1_000_000, 4)
+    odds = hint.update(PLAYER)
+    assert odds.win == 0.0 and math.isinf(odds.turns)
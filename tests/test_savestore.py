@@ -0,0 +1,129 @@
+import random
+import threading
+
+import pytest
+
+from savefile import build_save_data
+from savestore import JOURNAL_COMPACT_TURNS, AutosaveJournal, SaveStore, apply_changes
+from team import Team
+from unit import Unit
+
+
+def make_teams(seed=0):
+    rng = random.Random(seed)
+    player_team = Team.from_units(Unit(f"P{i}", 'Warrior', (150, 100 + i * 200), rng) for i in range(3))
+    ai_team = Team.from_units(Unit(f"A{i}", 'Tank', (650, 100 + i * 200), rng) for i in range(3))
+    return player_team, ai_team
+
+
+def play_turn(player_team, ai_team, turn):
+    """
+    模拟一回合：改变生命值、经验值和攻击者的位置（脏数据也应能恢复）。
+    """
+    attacker, target = player_team[turn % 3], ai_team[(turn + 1) % 3]
+    target.hp -= 7
+    attacker.exp += 10
+    attacker.position = (attacker.position[0] + turn, attacker.position[1] - 1)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SaveStore(str(tmp_path / 'saves.db'))
+    yield store
+    store.close()
+
+
+def test_apply_changes_updates_stats_position_and_gold():
+    player_team, ai_team = make_teams()
+    save_data = build_save_data(player_team, ai_team, 100)
+    apply_changes(save_data, 250, [(0, 1, 'hp', 42), (1, 2, 'x', 700), (1, 2, 'y', 330), (0, 0, 'level', 3)])
+    assert save_data["player_gold"] == 250
+    assert save_data["player_team"][1]["hp"] == 42
+    assert save_data["ai_team"][2]["position"] == [700, 330]
+    assert save_data["player_team"][0]["level"] == 3
+    assert save_data["ai_team"][0] == build_save_data(player_team, ai_team, 100)["ai_team"][0]
+
+
+def test_journal_replays_every_turn(store):
+    player_team, ai_team = make_teams()
+    autosave = AutosaveJournal(store, 'autosave', player_team, ai_team, 100)
+    for turn in range(1, 11):
+        play_turn(player_team, ai_team, turn)
+        autosave.record(turn, 100 + turn)
+    save_data, turn = store.load_slot('autosave')
+    assert turn == 10
+    assert save_data == build_save_data(player_team, ai_team, 110)
+    store.flush()
+    assert store.connection.execute("SELECT COUNT(*) FROM journal").fetchone()[0] == 10
+
+
+def test_journal_compacts_into_the_base(store):
+    player_team, ai_team = make_teams(1)
+    autosave = AutosaveJournal(store, 'autosave', player_team, ai_team, 100)
+    turns = JOURNAL_COMPACT_TURNS + 5
+    for turn in range(1, turns + 1):
+        play_turn(player_team, ai_team, turn)
+        autosave.record(turn, 100)
+    # 第JOURNAL_COMPACT_TURNS + 1回合合并进基准，之后的回合重新追加增量
+    store.flush()
+    rows = store.connection.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+    assert rows == turns - JOURNAL_COMPACT_TURNS - 1
+    save_data, turn = store.load_slot('autosave')
+    assert turn == turns
+    assert save_data == build_save_data(player_team, ai_team, 100)
+
+
+def test_autosave_survives_a_crash(tmp_path):
+    path = str(tmp_path / 'saves.db')
+    player_team, ai_team = make_teams(2)
+    store = SaveStore(path)
+    autosave = AutosaveJournal(store, 'autosave', player_team, ai_team, 100, turn=4)
+    for turn in range(5, 9):
+        play_turn(player_team, ai_team, turn)
+        autosave.record(turn, 150)
+    expected = build_save_data(player_team, ai_team, 150)
+    store.flush()  # 写入线程写完已提交的回合，之后才"崩溃"（还在队列中的回合会丢失）
+
+    # 没有调用finish()和close()：另一个连接（重新启动的游戏）看到的是已写入的回合
+    reopened = SaveStore(path)
+    try:
+        assert [slot.name for slot in reopened.list_slots()] == ['autosave']
+        save_data, turn = reopened.load_slot('autosave')
+        assert turn == 8
+        assert save_data == expected
+        restored_player, restored_ai = Team.from_dicts(save_data["player_team"]), Team.from_dicts(save_data["ai_team"])
+        assert build_save_data(restored_player, restored_ai, 150) == expected
+    finally:
+        reopened.close()
+        store.close()
+
+
+def test_finish_deletes_the_autosave(store):
+    player_team, ai_team = make_teams()
+    autosave = AutosaveJournal(store, 'autosave', player_team, ai_team, 100)
+    play_turn(player_team, ai_team, 1)
+    autosave.record(1, 100)
+    autosave.finish()
+    assert store.list_slots() == []
+    store.flush()
+    assert store.connection.execute("SELECT COUNT(*) FROM journal").fetchone()[0] == 0
+    with pytest.raises(KeyError):
+        store.load_slot('autosave')
+
+
+def test_writes_run_on_the_writer_thread(store):
+    threads = []
+    store.writer.submit(lambda connection: threads.append(threading.current_thread().name))
+    player_team, ai_team = make_teams()
+    save_data = build_save_data(player_team, ai_team, 100)
+    store.save_slot('manual', save_data, 7)
+    assert store.load_slot('manual') == (save_data, 7)  # 读取前等待已提交的写入完成
+    assert threads == ['SaveWriter']
+
+
+def test_team_snapshot_matches_unit_dicts():
+    player_team, ai_team = make_teams(3)
+    play_turn(player_team, ai_team, 2)
+    ai_team[1].hp = 0
+    for team in (player_team, ai_team):
+        assert build_save_data(team, [], 0)["player_team"] == [unit.to_dict() for unit in team]
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from settings import get_font
+
+# 文本表面缓存：同样的文字和颜色只渲染一次，避免每帧重复调用font.render
+
+
+class TextCache:
+    def __init__(self, font=None, max_size=512):
+        """
+        初始化文本缓存。
+        :param font: 用于渲染文字的Pygame字体对象，为None时在第一次渲染时使用游戏默认字体
+        :param max_size: 最多缓存的表面数量，超出时淘汰最久未使用的表面
+        """
+        self.font = font
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, color):
+        """
+        返回渲染好的文本表面，命中缓存时直接返回已有表面。
+        :param text: 要渲染的字符串
+        :param color: 文字颜色
+        """
+        key = (text, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)  # 标记为最近使用
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        if self.font is None:
+            self.font = get_font()
+        surface = self.font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)  # 淘汰最久未使用的表面
+        return surface
+
+    def clear(self):
+        """
+        清空缓存。
+        """
+        self.surfaces.clear()
+
+
+text_cache = TextCache()
+
+
+def render_text(text, color):
+    """
+    使用全局文本缓存渲染文字。
+    :param text: 要渲染的字符串
+    :param color: 文字颜色
+    """
+    return text_cache.render(text, color)
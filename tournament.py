@@ -0,0 +1,242 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from combat import UNIT_TYPES, Fighter
+from ai import choose_move
+
+# AI对AI的锦标赛：不打开窗口，在进程池中批量进行完整的对局，比较不同的队伍组成和目标选择策略。
+# 每个参赛者是(队伍组成, 策略)，参赛者两两对战，每对进行同样多场，先手轮流交换。
+# 每场对局的结果写入JSONL文件，最后输出各参赛者的胜率和95%置信区间（Wilson区间）。
+# 对局规则与game_loop一致（双方轮流各攻击一次，一方全灭即结束），但没有金币和复活。
+#
+# 对局按固定大小分块交给工作进程，每块的种子由总种子和块号决定，因此结果与进程数无关。
+
+TEAM_SIZE = 3  # 与game_setup一致
+CHUNK_SIZE = 200  # 每个任务进行的对局数
+Z_95 = 1.959964  # 95%置信区间对应的正态分位数
+
+
+# 目标选择策略：参数为己方队伍、对方队伍（均包含阵亡单位）和随机数生成器，返回(攻击者, 目标)
+
+
+def expected_damage(attacker, target):
+    return max(0, attacker.atk - target.defense + 2.5)  # 随机浮动的期望为2.5
+
+
+def random_policy(own, enemies, rng):
+    """
+    与游戏中的AI相同：随机选择一个存活的攻击者和一个存活的目标。
+    """
+    return rng.choice([u for u in own if u.hp > 0]), rng.choice([u for u in enemies if u.hp > 0])
+
+
+def weakest_policy(own, enemies, rng):
+    """
+    集火生命值最低的敌人，由攻击力最高的单位出手。
+    """
+    attacker = max((u for u in own if u.hp > 0), key=lambda u: u.atk)
+    target = min((u for u in enemies if u.hp > 0), key=lambda u: u.hp)
+    return attacker, target
+
+
+def greedy_policy(own, enemies, rng):
+    """
+    能击杀时优先击杀，否则选择期望伤害最高的组合。
+    """
+    pairs = [(a, t) for a in own if a.hp > 0 for t in enemies if t.hp > 0]
+    return max(pairs, key=lambda pair: (expected_damage(*pair) >= pair[1].hp, expected_damage(*pair), -pair[1].hp))
+
+
+def search_policy(own, enemies, rng, budget_ms=5):
+    """
+    使用游戏的期望极大极小搜索（ai.choose_move），每步的时间预算很小。
+    """
+    attacker, target = choose_move(enemies, own, budget_ms)
+    return own[attacker], enemies[target]
+
+
+POLICIES = {
+    'random': random_policy,
+    'weakest': weakest_policy,
+    'greedy': greedy_policy,
+    'search': search_policy,
+}
+
+
+def parse_team(spec):
+    """
+    解析队伍组成：用逗号分隔的单位类型（如Warrior,Warrior,Tank，可简写为W,W,T），
+    或random（与game_setup中的AI队伍一样，每场对局随机选择类型）。
+    """
+    if spec == 'random':
+        return spec
+    types = []
+    for name in spec.split(','):
+        matches = [unit_type for unit_type in UNIT_TYPES if unit_type.lower().startswith(name.strip().lower())]
+        if len(matches) != 1:
+            raise argparse.ArgumentTypeError(f"Unknown unit type: {name}")
+        types.append(matches[0])
+    return ','.join(types)
+
+
+def build_team(spec, rng):
+    if spec == 'random':
+        types = [rng.choice(UNIT_TYPES) for _ in range(TEAM_SIZE)]
+    else:
+        types = spec.split(',')
+    return [Fighter(unit_type, rng) for unit_type in types]
+
+
+def play_match(first, second, rng, max_turns=1000):
+    """
+    进行一场对局。
+    :param first: 先手参赛者(队伍组成, 策略名称)
+    :param second: 后手参赛者
+    :param rng: random.Random
+    :param max_turns: 最大攻击次数，超过则为平局
+    :return: (获胜方0/1，平局为None, 攻击次数)
+    """
+    teams = (build_team(first[0], rng), build_team(second[0], rng))
+    policies = (POLICIES[first[1]], POLICIES[second[1]])
+    side = 0
+    for turn in range(1, max_turns + 1):
+        own, enemies = teams[side], teams[1 - side]
+        attacker, target = policies[side](own, enemies, rng)
+        attacker.attack(target, rng)
+        if all(unit.hp <= 0 for unit in enemies):
+            return side, turn
+        side = 1 - side
+    return None, max_turns
+
+
+def chunk_seed(seed, pairing, chunk):
+    return random.Random(f"{seed}:{pairing}:{chunk}").getrandbits(64)
+
+
+def run_chunk(entrants, pairing, chunk, start, count, seed, max_turns):
+    """
+    在工作进程中进行一对参赛者的一块对局。偶数场由a先手，奇数场由b先手。
+    :return: 每场对局的结果字典列表
+    """
+    a, b = pairing
+    rng = random.Random(chunk_seed(seed, pairing, chunk))
+    results = []
+    for match in range(start, start + count):
+        a_first = match % 2 == 0
+        first, second = (entrants[a], entrants[b]) if a_first else (entrants[b], entrants[a])
+        winner_side, turns = play_match(first, second, rng, max_turns)
+        if winner_side is None:
+            winner = None
+        else:
+            winner = a if (winner_side == 0) == a_first else b
+        results.append({"a": a, "b": b, "match": match, "first": a if a_first else b, "winner": winner,
+                        "turns": turns})
+    return results
+
+
+def wilson_interval(wins, n, z=Z_95):
+    """
+    胜率的Wilson置信区间。
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return center - half, center + half
+
+
+def run_tournament(entrants, matches, seed, workers=None, max_turns=1000, output=None):
+    """
+    参赛者两两进行matches场对局。
+    :param entrants: 参赛者列表[(队伍组成, 策略名称)]
+    :param matches: 每对参赛者的对局数
+    :param seed: 总种子
+    :param workers: 进程数，默认为CPU核数
+    :param output: 打开的JSONL文件，每完成一块就写入其中的对局结果
+    :return: {(a, b): [a胜, b胜, 平局]}
+    """
+    tallies = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = []
+        for pairing in itertools.combinations(range(len(entrants)), 2):
+            tallies[pairing] = [0, 0, 0]
+            for chunk, start in enumerate(range(0, matches, CHUNK_SIZE)):
+                futures.append(executor.submit(run_chunk, entrants, pairing, chunk, start,
+                                               min(CHUNK_SIZE, matches - start), seed, max_turns))
+        for future in as_completed(futures):
+            for result in future.result():
+                tally = tallies[result["a"], result["b"]]
+                if result["winner"] is None:
+                    tally[2] += 1
+                else:
+                    tally[0 if result["winner"] == result["a"] else 1] += 1
+                if output is not None:
+                    output.write(json.dumps(result, separators=(',', ':')) + '\n')
+    return tallies
+
+
+def entrant_label(entrant):
+    return f"{entrant[0]}/{entrant[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless AI-vs-AI tournament between team compositions and "
+                                                 "targeting policies.")
+    parser.add_argument('--teams', nargs='+', type=parse_team,
+                        default=['Warrior,Warrior,Warrior', 'Warrior,Warrior,Tank', 'Warrior,Tank,Tank',
+                                 'Tank,Tank,Tank'],
+                        help="team compositions, e.g. W,W,T or 'random'")
+    parser.add_argument('--policies', nargs='+', choices=sorted(POLICIES), default=['random'],
+                        help="targeting policies; every team plays with every policy")
+    parser.add_argument('-n', '--matches', type=int, default=1000, help="matches per pairing")
+    parser.add_argument('--seed', type=int, default=None, help="tournament seed")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--max-turns', type=int, default=1000, help="turn limit per match (then a draw)")
+    parser.add_argument('--output', default='tournament.jsonl', help="per-match results (JSONL)")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.SystemRandom().randrange(2 ** 32)
+    entrants = [(team, policy) for team in args.teams for policy in args.policies]
+    if len(entrants) < 2:
+        parser.error("need at least two entrants (teams x policies)")
+
+    start = time.perf_counter()
+    with open(args.output, 'w', encoding='utf-8') as output:
+        output.write(json.dumps({"seed": seed, "matches": args.matches,
+                                 "entrants": [list(entrant) for entrant in entrants]}) + '\n')
+        tallies = run_tournament(entrants, args.matches, seed, args.workers, args.max_turns, output)
+    elapsed = time.perf_counter() - start
+    total = sum(sum(tally) for tally in tallies.values())
+    print(f"{len(entrants)} entrants, {total} matches in {elapsed:.2f}s (seed {seed}), results in {args.output}")
+
+    print("\nPairings (win rate of the first entrant, 95% CI):")
+    for (a, b), (a_wins, b_wins, draws) in tallies.items():
+        n = a_wins + b_wins + draws
+        low, high = wilson_interval(a_wins, n)
+        print(f"  {entrant_label(entrants[a]):32s} vs {entrant_label(entrants[b]):32s} "
+              f"{a_wins / n:.3f} [{low:.3f}, {high:.3f}]  draws {draws}")
+
+    print("\nOverall:")
+    rows = []
+    for index, entrant in enumerate(entrants):
+        wins = games = 0
+        for (a, b), (a_wins, b_wins, draws) in tallies.items():
+            if index in (a, b):
+                wins += a_wins if index == a else b_wins
+                games += a_wins + b_wins + draws
+        rows.append((wins / games, wins, games, entrant))
+    for rate, wins, games, entrant in sorted(rows, key=lambda row: row[0], reverse=True):
+        low, high = wilson_interval(wins, games)
+        print(f"  {entrant_label(entrant):32s} {rate:.3f} [{low:.3f}, {high:.3f}]  ({wins}/{games})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,128 @@
 import pygame
+import os
 import random
-import logging
-from settings import WHITE, font, IMAGE_DIR
+from functools import lru_cache
+from settings import WHITE, IMAGE_DIR
+from text_cache import render_text
+from assets import load_sprite
+from game_logging import log_attack, log_level_up
+from combat import BASE_HP, EXP_PER_LEVEL, roll_stat, roll_damage
+
+# 各职业的精灵图片文件
+UNIT_IMAGES = {
+    'Warrior': 'warrior.png',
+    'Tank': 'tank.png',
+}
+
+# 生命条表面，按(宽度, 生命值, 最大生命值)缓存，不必每次绘制两个矩形
+@lru_cache(maxsize=1024)
+def health_bar(width, hp, max_hp):
+    bar = pygame.Surface((width, 5))
+    pygame.draw.rect(bar, (255, 0, 0), (0, 0, width, 5))  # 背景（红色，表示失去的生命值）
+    pygame.draw.rect(bar, (0, 255, 0), (0, 0, width * (hp / max_hp), 5))  # 当前血量的部分（绿色）
+    return bar
 
 class Unit:
-    def __init__(self, name, unit_type, position):
+    def __init__(self, name, unit_type, position, rng=random):
         """
         初始化单位（角色）的属性。
         :param name: 角色名称
         :param unit_type: 角色类型（如Warrior或Tank）
         :param position: 角色在屏幕上的位置
+        :param rng: 随机数生成器，传入对局的random.Random可使属性可复现
         """
         self.name = name
         self.unit_type = unit_type
-        self.hp = 100  # 初始生命值
+        self.hp = BASE_HP  # 初始生命值
         self.exp = 0  # 初始经验值
         self.level = 1  # 初始等级
         self.position = (position[0], position[1] + 30)  # 初始位置的调整
-        self.max_hp = 100  # 最大生命值
+        self.max_hp = BASE_HP  # 最大生命值
+        self.text_state = None  # 上次渲染文字时的(名称, 生命值, 等级, 经验值)
+        self.text_surfaces = None  # 缓存的生命值、等级和经验值文字表面
 
-        # 根据角色类型设置不同的攻击力、防御力和图像
+        self.sprite = None  # 单位图像，第一次绘制时才加载
+
+        # 根据角色类型设置不同的攻击力和防御力
         if unit_type == 'Warrior':
-            self.defense = random.randint(1, 10)
-            self.image = pygame.image.load(f"{IMAGE_DIR}/warrior.png")
+            self.atk = roll_stat('Warrior', 'atk', rng)
+            self.defense = roll_stat('Warrior', 'defense', rng)
         elif unit_type == 'Tank':
-            self.atk = random.randint(20, 30)
-            self.defense = random.randint(5, 15)
-            self.image = pygame.image.load(f"{IMAGE_DIR}/tank.png")
+            self.atk = roll_stat('Tank', 'atk', rng)
+            self.defense = roll_stat('Tank', 'defense', rng)
+
+    def to_dict(self):
+        """
+        返回单位的全部状态，用于存档。
+        """
+        return {
+            "name": self.name,
+            "type": self.unit_type,
+            "position": list(self.position),
+            "hp": self.hp,
+            "max_hp": self.max_hp,
+            "atk": self.atk,
+            "defense": self.defense,
+            "level": self.level,
+            "exp": self.exp,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        根据存档数据恢复单位。不调用__init__，因此不会重新随机生成属性，位置也不会再次偏移。
+        :param data: to_dict()返回的字典
+        """
+        unit = cls.__new__(cls)
+        unit.name = data["name"]
+        unit.unit_type = data["type"]
+        unit.position = tuple(data["position"])
+        unit.hp = data["hp"]
+        unit.max_hp = data["max_hp"]
+        unit.atk = data["atk"]
+        unit.defense = data["defense"]
+        unit.level = data["level"]
+        unit.exp = data["exp"]
+        unit.text_state = None
+        unit.text_surfaces = None
+        unit.sprite = None
+        return unit
+
+    @property
+    def image(self):
+        """
+        单位的图像。第一次访问时从资源管理器获取共享的精灵表面（启用了RLE加速），
+        因此只做战斗计算（不绘制）的单位不会加载任何图片。
+        """
+        if self.sprite is None:
+            self.sprite = load_sprite(os.path.join(IMAGE_DIR, UNIT_IMAGES[self.unit_type]))
+        return self.sprite
 
-    def attack(self, target):
+    def attack(self, target, rng=random):
         """
         执行攻击操作，对目标单位造成伤害，并增加攻击者的经验值。
         :param target: 被攻击的目标单位
+        :param rng: 随机数生成器，传入对局的random.Random可使伤害可复现
+        :return: 造成的伤害
         """
-        damage = self.atk - target.defense + random.randint(-5, 10)
-        damage = max(0, damage)  # 确保伤害值不为负
+        damage = roll_damage(self.atk, target.defense, rng)  # 伤害值不为负
         target.hp -= damage  # 减少目标的生命值
         self.exp += damage  # 增加攻击者的经验值
 
         # 检查攻击者是否升级
-        if self.exp >= 100:
+        if self.exp >= EXP_PER_LEVEL:
             self.level_up()
 
-        logging.info(f"{self.name} attacked {target.name} for {damage} damage.")
+        log_attack(self, target, damage)  # 记录攻击（文本日志和结构化战斗日志）
+        return damage
 
     def level_up(self):
         """
         当经验值达到100时，角色升级，等级提升，经验值清零。
         """
         self.level += 1
-        self.exp -= 100  # 升级后经验值减去100
-        logging.info(f"{self.name} leveled up to {self.level}!")
+        self.exp -= EXP_PER_LEVEL  # 升级后经验值减去100
+        log_level_up(self)  # 记录升级
 
     def draw(self, screen):
         """
@@ -63,17 +135,40 @@ class Unit:
         screen.blit(self.image,
                     (self.position[0] - self.image.get_width() // 2, self.position[1] - self.image.get_height() // 2))
 
-        # 绘制单位的生命值
-        hp_text = font.render(f"{self.name} HP: {self.hp}", True, WHITE)
-        screen.blit(hp_text, (self.position[0] - 40, self.position[1] - 50))
+        hp_text, level_text, exp_text = self.get_text_surfaces()
+        screen.blit(hp_text, (self.position[0] - 40, self.position[1] - 50))  # 绘制单位的生命值
+        screen.blit(level_text, (self.position[0] - 40, self.position[1] - 70))  # 绘制单位的等级
+        screen.blit(exp_text, (self.position[0] - 40, self.position[1] - 90))  # 绘制单位的经验值
 
-        # 绘制单位的等级
-        level_text = font.render(f"Level: {self.level}", True, WHITE)
-        screen.blit(level_text, (self.position[0] - 40, self.position[1] - 70))
+    def get_text_surfaces(self):
+        """
+        返回单位的生命值、等级和经验值文字表面，只有在这些数值变化时才重新渲染。
+        """
+        return self.text_surfaces_for((self.name, self.hp, self.level, self.exp))
 
-        # 绘制单位的经验值
-        exp_text = font.render(f"EXP: {self.exp}", True, WHITE)
-        screen.blit(exp_text, (self.position[0] - 40, self.position[1] - 90))
+    def text_surfaces_for(self, state):
+        """
+        按给定的(名称, 生命值, 等级, 经验值)返回文字表面，与上次相同时直接使用缓存（Team.draw传入整列读出的数值）。
+        """
+        if state != self.text_state:
+            self.text_state = state
+            self.text_surfaces = (
+                render_text(f"{state[0]} HP: {state[1]}", WHITE),
+                render_text(f"Level: {state[2]}", WHITE),
+                render_text(f"EXP: {state[3]}", WHITE),
+            )
+        return self.text_surfaces
+
+    def get_bounds(self):
+        """
+        返回单位绘制时覆盖的屏幕区域（图像、生命条和文字），用于脏矩形渲染。
+        """
+        x, y = self.position
+        width, height = self.image.get_size()
+        bounds = pygame.Rect(x - width // 2, y - height // 2 - 10, width, height + 10)  # 图像和上方的生命条
+        for text, offset in zip(self.get_text_surfaces(), (50, 70, 90)):
+            bounds.union_ip(text.get_rect(topleft=(x - 40, y - offset)))
+        return bounds
 
     def draw_health_bar(self, screen):
         """